@@ -18,10 +18,13 @@ You should have received a copy of the GNU General Public License along with
 RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
 '''
 from workflow import Workflow, WorkflowStage
-from cliutils import all_subclasses
+from cliutils import all_subclasses, ArgFiller
+from checkpoint import Manifest
+from report import RunReport
 
 import logging
 import argparse
+import os
 
 
 def opts():
@@ -46,7 +49,15 @@ def opts():
 
     parser.add_argument(
         '--stages', nargs='*',
-        help='Add stages')
+        help='Add stages.  Each stage reads the output of the one before it, '
+        'unless followed by @ and the comma-separated stages it reads, as in '
+        '"1 2 4.1@1"')
+
+    parser.add_argument(
+        '--stage-workers',
+        type=int,
+        help='The number of stages to run at once when the stages they read '
+        'have finished (default: 1)')
 
     parser.add_argument(
         '--root',
@@ -55,11 +66,41 @@ def opts():
         '--ext',
         help='The file extension to search for')
 
+    parser.add_argument(
+        '--find-workers',
+        type=int,
+        help='The number of directories to search at once (default: 8)')
+
+    parser.add_argument(
+        '--reindex',
+        action='store_true',
+        help='Search every directory under the root directory, instead of '
+        'only those that changed since the last search')
+
     parser.add_argument(
         '--blocksize',
         type=int,
         help='The size of the copy block (in kB) for merge operations')
 
+    parser.add_argument(
+        '--merge-workers',
+        type=int,
+        help='The number of merged files to build at once (default: 1)')
+
+    parser.add_argument(
+        '--gzip-merge',
+        choices=('copy', 'check', 'verify', 'bgzf'),
+        help='How to merge gzipped parts: copy them as they are, check their '
+        'structure without decompressing them, verify the CRC32 and size of '
+        'every member, or write the merged file as block gzip (default: '
+        'copy)')
+
+    parser.add_argument(
+        '--merge-lanes',
+        action='store_true',
+        help='Merge the parts of every lane of a sample into one file, '
+        'ordered by lane and then by part, reading the lanes in parallel')
+
     parser.add_argument(
         '--adapters',
         help='FastA adapters file to use')
@@ -73,11 +114,85 @@ def opts():
         '--fastq_args',
         help='Specify arguments to be passed to fastq-mcf')
 
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        help='The number of fastq-mcf processes to run at once, and of '
+        'threads shared by all stages (default: the number of CPUs this '
+        'process may run on)')
+
+    parser.add_argument(
+        '--shards',
+        type=int,
+        help='The number of pieces to split each large file, or '
+        'pair, into so that it is trimmed on several cores (default: 1)')
+
+    parser.add_argument(
+        '--compress',
+        action='store_true',
+        help='Write merged and trimmed files as block gzip (BGZF), '
+        'compressing on every core')
+
+    parser.add_argument(
+        '--qc-format',
+        choices=('json', 'npz'),
+        help='Write the quality control report of each file as compact JSON '
+        'or as NumPy arrays (default: json)')
+
+    parser.add_argument(
+        '--trim-qc',
+        action='store_true',
+        help='Write the quality control report of each file trimmed by stage '
+        '3.2 from the reads as they are trimmed, without reading the file '
+        'again')
+
+    parser.add_argument(
+        '--cache',
+        help='A directory in which to keep the outputs of fastq-mcf, so that '
+        'trimming the same files with the same arguments again restores them '
+        'instead (default: no cache)')
+
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        help='The size in GB above which the least recently used outputs are '
+        'removed from the cache (default: 100)')
+
     parser.add_argument(
         '--quiet',
         action='store_true',
         help='Silence extraneous console output')
 
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip work completed by an earlier run whose inputs have not '
+        'changed')
+
+    parser.add_argument(
+        '--report',
+        help='The JSON file in which to record the time and resources used '
+        'by each stage and each unit of work (default: '
+        'rnaseqflow_report.json in the root directory)')
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Pass each file to the next stage as soon as it is finished, '
+        'instead of waiting for the whole stage to finish')
+
+    parser.add_argument(
+        '--min-free',
+        type=float,
+        help='The number of GB to keep free on the filesystem of the outputs; '
+        'merge and trim jobs wait until their outputs fit (default: 0)')
+
+    parser.add_argument(
+        '--delete-intermediates',
+        action='store_true',
+        help='Delete the files a stage wrote once every stage reading them '
+        'has finished without failures, keeping those of the last stage')
+
     return parser
 
 
@@ -85,7 +200,10 @@ def main():
     """This method is installed as a console script entry point by setuptools
 
     It uses the command line arguments specified by opts() to generate a
-    Workflow object and adds to it several WorkflowStages.
+    Workflow object and adds to it several WorkflowStages.  Completed work is
+    recorded in a manifest in the root directory, so that a run can be resumed
+    with --resume.  The time and resources used by each stage are written to a
+    JSON report and summarized in a table when the run finishes.
 
     If the needed command line arguments are not passed, the user is asked to
     enter them.
@@ -108,7 +226,11 @@ def main():
         datefmt='%m/%d/%Y %I:%M:%S %p'
     )
 
-    w = Workflow()
+    ArgFiller(args).fill(['stage_workers', 'jobs', 'min_free',
+                          'delete_intermediates'])
+    w = Workflow(stream=args.stream, workers=args.stage_workers,
+                 threads=args.jobs, min_free=int(args.min_free * 1024 ** 3),
+                 delete_intermediates=args.delete_intermediates)
 
     if not args.stages:
         print 'Stages not given with --stages argument'
@@ -121,15 +243,26 @@ def main():
     classmap = {cls.spec: cls for cls in all_subclasses(WorkflowStage)}
 
     for stage_spec in stages:
+        spec, reads, inputs = stage_spec.partition('@')
         try:
-            w.append(classmap[stage_spec](args))
+            w.add(classmap[spec](args),
+                  inputs.split(',') if inputs else [] if reads else None)
         except KeyError as e:
             logging.error(
                 'No valid stage specifier {0} - use "--help stages" to see '
                 'stage specifiers for this software'.format(stage_spec))
             raise
 
+    ArgFiller(args).fill(['root', 'resume', 'report', 'quiet'])
+    w.manifest = Manifest(os.path.join(args.root, Manifest.FILENAME),
+                          args.resume)
+    w.report = RunReport()
+
     w.run()
 
+    w.report.write(args.report)
+    if not args.quiet:
+        print w.report.table()
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,426 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import argparse
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from argparse import Namespace
+
+from cliutils import all_subclasses
+from fileutils import FileIndex
+from workflow import WorkflowStage
+
+logger = logging.getLogger('rnaseqflow.bench')
+"""log4j-style module logger"""
+
+ADAPTER = 'AGATCGGAAGAGCACACGTCTGAACTCCAGTCAC'
+"""The TruSeq adapter, some of which is added to the end of some reads"""
+
+INPUT_OF = {'2': '1', '3.0': '2', '3.1': '2', '3.2': '2', '4.0': '1',
+            '4.1': '1'}
+"""The stage whose output each benchmarked stage is given"""
+
+STUB_FASTQ_MCF = '''#!{python}
+"""A stand-in for fastq-mcf that copies each input file to its output"""
+import os
+import shutil
+import sys
+import time
+
+args = sys.argv[1:]
+if not args:
+    sys.stdout.write('Usage: fastq-mcf [options] <adapters> <reads> ...\\n'
+                     'Version: bench-stub\\n')
+    sys.exit(1)
+
+outputs = [args[i + 1] for i, arg in enumerate(args) if arg == '-o']
+inputs = args[1:1 + len(outputs)]
+
+for infile, outfile in zip(inputs, outputs):
+    shutil.copyfile(infile, outfile)
+
+if {rate!r}:
+    time.sleep(sum(os.path.getsize(f) for f in inputs) / ({rate!r} * 1e6))
+'''
+"""The script written as the fastq-mcf executable, formatted with the path
+of the Python interpreter and a simulated trimming rate in MB/s (0 for none)
+"""
+
+
+def _read(rng, name, direction, barcode, read_length):
+    """Make one FASTQ record, with an adapter in about a fifth of reads"""
+
+    bases = ''.join(rng.choice('ACGT') for _ in xrange(read_length))
+
+    if rng.random() < 0.2:
+        insert = rng.randint(read_length // 2, read_length)
+        bases = (bases[:insert] + ADAPTER)[:read_length]
+
+    quality = ''.join(chr(33 + rng.randint(2, 40))
+                      for _ in xrange(read_length))
+
+    return '@{0} {1}:N:0:{2}\n{3}\n+\n{4}\n'.format(
+        name, direction[1], barcode, bases, quality)
+
+
+def generate_tree(root, samples=4, parts=4, reads=1000, read_length=150,
+                  compress=False, paired=True, lanes=1, seed=0):
+    """Write a folder of split FASTQ files like those from a sequencer
+
+    Files are named like SAMPLE-1_ACGTAC_L001_R1_001.fastq, with one folder
+    per sample
+
+    :param root: the folder to fill
+    :type root: str
+
+    :param samples: the number of samples
+    :type samples: int
+
+    :param parts: the number of parts each file is split into
+    :type parts: int
+
+    :param reads: the number of reads in each part
+    :type reads: int
+
+    :param read_length: the number of bases in each read
+    :type read_length: int
+
+    :param compress: write .fastq.gz files rather than .fastq files
+    :type compress: bool
+
+    :param paired: write R1 and R2 files, rather than R1 files only
+    :type paired: bool
+
+    :param lanes: the number of lanes each sample was sequenced on
+    :type lanes: int
+
+    :param seed: the seed for the random reads, so that trees can be
+        repeated exactly
+    :type seed: int
+
+    :returns: the paths of the files written
+    :rtype: list(str)
+    """
+
+    rng = random.Random(seed)
+    ext = '.fastq.gz' if compress else '.fastq'
+    directions = ('R1', 'R2') if paired else ('R1',)
+    written = []
+
+    for sample in range(1, samples + 1):
+        barcode = ''.join(rng.choice('ACGT') for _ in range(6))
+        folder = os.path.join(root, 'Sample_{0:d}'.format(sample))
+        os.makedirs(folder)
+
+        for lane in range(1, lanes + 1):
+            for direction in directions:
+                for part in range(1, parts + 1):
+                    path = os.path.join(
+                        folder, 'SAMPLE-{0:d}_{1}_L{2:03d}_{3}_{4:03d}{5}'.format(
+                            sample, barcode, lane, direction, part, ext))
+
+                    opener = gzip.open if compress else open
+                    with opener(path, 'wb') as outfile:
+                        for i in xrange(reads):
+                            name = 'BENCH:1:FC:{0:d}:{1:d}:{2:d}:{3:d}'.format(
+                                lane, part, sample, i)
+                            outfile.write(_read(
+                                rng, name, direction, barcode, read_length))
+
+                    written.append(path)
+
+    return written
+
+
+def write_stub(path, rate=0):
+    """Write an executable stand-in for fastq-mcf
+
+    :param path: the path of the script
+    :type path: str
+
+    :param rate: the simulated trimming rate in MB/s, or 0 to only copy
+    :type rate: float
+
+    :returns: path
+    :rtype: str
+    """
+
+    with open(path, 'w') as stub:
+        stub.write(STUB_FASTQ_MCF.format(python=sys.executable, rate=rate))
+
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP |
+             stat.S_IXOTH)
+
+    return path
+
+
+def _clean(root):
+    """Remove the outputs and saved state of earlier stages from root"""
+
+    for name in ('merged', 'trimmed'):
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    index = os.path.join(root, FileIndex.FILENAME)
+    if os.path.exists(index):
+        os.remove(index)
+
+
+def _total_size(paths):
+    """Sum the sizes of the files that exist among paths"""
+
+    return sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+
+
+def run_benchmark(args, specs, repeat=1):
+    """Time each stage on the tree at args.root
+
+    Stage 1 is given no input, and every other stage is given the output of
+    the stage named in INPUT_OF, which must be run before it.  Outputs are
+    removed between repeats, so each repeat starts from the same tree.
+
+    :param args: the arguments for every stage
+    :type args: Namespace
+
+    :param specs: the specifiers of the stages to time, in order
+    :type specs: list(str)
+
+    :param repeat: the number of times to run the stages
+    :type repeat: int
+
+    :returns: for each spec, the stage name, the time of each repeat, the
+        files and bytes read and written, and the throughput of the fastest
+        repeat
+    :rtype: dict
+    """
+
+    classmap = {cls.spec: cls for cls in all_subclasses(WorkflowStage)}
+    results = {}
+
+    for spec in specs:
+        results[spec] = {'stage': classmap[spec].__name__, 'seconds': []}
+
+    for _ in range(repeat):
+        _clean(args.root)
+        outputs = {}
+
+        for spec in specs:
+            stage_input = outputs[INPUT_OF[spec]] if spec in INPUT_OF \
+                else None
+            stage = classmap[spec](args)
+
+            start = time.time()
+            outputs[spec] = stage.run(stage_input)
+            elapsed = time.time() - start
+
+            result = results[spec]
+            result['seconds'].append(elapsed)
+            result['files_in'] = len(stage_input or [])
+            result['files_out'] = len(outputs[spec])
+            result['bytes_in'] = _total_size(stage_input or [])
+            result['bytes_out'] = _total_size(outputs[spec])
+
+            logger.info('{0} {1} took {2:.3f}s'.format(
+                spec, result['stage'], elapsed))
+
+    for result in results.itervalues():
+        best = min(result['seconds'])
+        size = result['bytes_in'] or result['bytes_out']
+        result['best_seconds'] = best
+        result['mb_per_second'] = size / 1e6 / best if best else None
+
+    _clean(args.root)
+
+    return results
+
+
+def opts():
+    parser = argparse.ArgumentParser(
+        description='Time rnaseqflow stages on generated FASTQ files.',
+        prog='python -m rnaseqflow.bench')
+
+    parser.add_argument(
+        '--samples', type=int, default=4,
+        help='The number of samples (default: %(default)s)')
+    parser.add_argument(
+        '--parts', type=int, default=4,
+        help='The number of parts per file (default: %(default)s)')
+    parser.add_argument(
+        '--reads', type=int, default=1000,
+        help='The number of reads per part (default: %(default)s)')
+    parser.add_argument(
+        '--read-length', type=int, default=150,
+        help='The number of bases per read (default: %(default)s)')
+    parser.add_argument(
+        '--gzip', action='store_true',
+        help='Generate .fastq.gz files instead of .fastq files')
+    parser.add_argument(
+        '--single-end', action='store_true',
+        help='Generate R1 files only')
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='The seed for the generated reads (default: %(default)s)')
+
+    parser.add_argument(
+        '--stages', nargs='*', default=['1', '2', '3.0', '3.1'],
+        help='The stages to time, in order (default: %(default)s)')
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='The number of times to run the stages (default: %(default)s)')
+    parser.add_argument(
+        '--stub-rate', type=float, default=0,
+        help='The trimming speed, in MB/s, that the stand-in for fastq-mcf '
+        'simulates, or 0 to only copy (default: %(default)s)')
+    parser.add_argument(
+        '--fastq',
+        help='A fastq-mcf executable to time instead of the stand-in')
+
+    parser.add_argument(
+        '--blocksize', type=int, default=1024,
+        help='The copy block size in kB (default: %(default)s)')
+    parser.add_argument(
+        '--merge-workers', type=int, default=1,
+        help='The number of merged files to build at once '
+        '(default: %(default)s)')
+    parser.add_argument(
+        '--find-workers', type=int, default=8,
+        help='The number of directories to search at once '
+        '(default: %(default)s)')
+    parser.add_argument(
+        '--jobs', type=int, default=multiprocessing.cpu_count(),
+        help='The number of fastq-mcf processes to run at once '
+        '(default: %(default)s)')
+    parser.add_argument(
+        '--shards', type=int, default=1,
+        help='The number of shards to split each large file into '
+        '(default: %(default)s)')
+
+    parser.add_argument(
+        '--dir',
+        help='The folder to generate files in, which is kept (default: a '
+        'temporary folder, removed afterwards)')
+    parser.add_argument(
+        '--output',
+        help='The file to write the JSON results to (default: print them)')
+    parser.add_argument(
+        '--logging',
+        choices=('debug', 'info', 'warning', 'error', 'critical'),
+        default='warning', help='Logging level (default: %(default)s)')
+
+    return parser
+
+
+def main():
+    """Generate a tree of FASTQ files, time the stages on it and report the
+    results as JSON"""
+
+    options = opts().parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, options.logging.upper()),
+        format='%(levelname)s: %(asctime)s in %(name)s - %(message)s',
+        datefmt='%m/%d/%Y %I:%M:%S %p'
+    )
+
+    workdir = options.dir or tempfile.mkdtemp(prefix='rnaseqflow_bench')
+    root = os.path.join(workdir, 'root')
+
+    try:
+        if os.path.isdir(root):
+            shutil.rmtree(root)
+        os.makedirs(root)
+
+        start = time.time()
+        files = generate_tree(
+            root, options.samples, options.parts, options.reads,
+            options.read_length, options.gzip, not options.single_end,
+            seed=options.seed)
+        logger.info('Generated {0} files in {1:.1f}s'.format(
+            len(files), time.time() - start))
+
+        adapters = os.path.join(workdir, 'adapters.fasta')
+        with open(adapters, 'w') as fasta:
+            fasta.write('>TruSeq\n{0}\n'.format(ADAPTER))
+
+        fastq = options.fastq or write_stub(
+            os.path.join(workdir, 'fastq-mcf'), options.stub_rate)
+
+        args = Namespace(
+            root=root, ext='.fastq.gz' if options.gzip else '.fastq',
+            blocksize=options.blocksize, merge_workers=options.merge_workers,
+            find_workers=options.find_workers, reindex=True,
+            gzip_merge='copy', adapters=adapters, fastq=fastq,
+            fastq_args='-q 30 -l 50', quiet=True, jobs=options.jobs,
+            shards=options.shards, cache=None, cache_size=100)
+
+        stages = run_benchmark(args, options.stages, options.repeat)
+
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': multiprocessing.cpu_count(),
+            'fastq': 'stub' if not options.fastq else options.fastq,
+            'tree': {
+                'samples': options.samples,
+                'parts': options.parts,
+                'reads': options.reads,
+                'read_length': options.read_length,
+                'gzip': options.gzip,
+                'paired': not options.single_end,
+                'files': len(files),
+                'bytes': _total_size(files),
+            },
+            'settings': {
+                'blocksize': options.blocksize,
+                'merge_workers': options.merge_workers,
+                'find_workers': options.find_workers,
+                'jobs': options.jobs,
+                'stub_rate': options.stub_rate,
+                'repeat': options.repeat,
+            },
+            'stages': stages,
+        }
+    finally:
+        if not options.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+
+    if options.output:
+        with open(options.output, 'w') as outfile:
+            outfile.write(text + '\n')
+    else:
+        print text
+
+
+if __name__ == '__main__':
+    main()
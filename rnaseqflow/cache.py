@@ -0,0 +1,303 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from fileutils import link_file
+
+
+class TrimCache(object):
+    """A content-addressed store of trimmed files
+
+    Each entry holds the outputs of one fastq-mcf call, and is found by a key
+    hashed from the contents of the input and adapter files, the version of
+    the executable and the arguments passed to it.  A hit is linked into place
+    with link_file, so that restoring it copies no data when the cache and
+    the outputs share a filesystem.
+
+    The cache is kept below a size cap by removing the least recently used
+    entries.  An entry's use is recorded in the modification time of its
+    directory, so several processes can share one cache.
+    """
+
+    logger = logging.getLogger('rnaseqflow.TrimCache')
+    """log4j-style class logger"""
+
+    VERSION_PATTERN = re.compile(r'version:?\s*(\S+)', re.IGNORECASE)
+    """Finds the version in the usage message of an executable"""
+
+    META = 'entry.json'
+    """The name of the file describing the outputs in each entry"""
+
+    def __init__(self, path, max_bytes):
+        """Open a cache, creating its directory if needed
+
+        :param path: the cache directory
+        :type path: str
+
+        :param max_bytes: the size above which old entries are removed
+        :type max_bytes: int
+        """
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._digests = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+        try:
+            os.makedirs(self.path)
+        except OSError:
+            if not os.path.isdir(self.path):
+                raise
+
+    def key(self, inputs, executable, args):
+        """Build the key of the outputs of one call
+
+        :param inputs: the files read by the call, in the order they are
+            passed, including the adapters file
+        :type inputs: list(str)
+
+        :param executable: the program that is called
+        :type executable: str
+
+        :param args: the arguments that change the outputs, split on
+            whitespace so that spacing does not change the key
+        :type args: list(str)
+
+        :returns: a hexadecimal key
+        :rtype: str
+        """
+
+        sha = hashlib.sha1()
+        sha.update(self.program_version(executable) + '\0')
+        sha.update('\0'.join(args) + '\0')
+
+        for path in inputs:
+            sha.update(self.digest(path))
+
+        return sha.hexdigest()
+
+    def digest(self, path):
+        """Hash the contents of a file
+
+        The hash is remembered for as long as the file's size and
+        modification time do not change.
+
+        :param path: the file to hash
+        :type path: str
+
+        :returns: a hexadecimal digest
+        :rtype: str
+        """
+
+        st = os.stat(path)
+        identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+
+        with self._lock:
+            digest = self._digests.get(path)
+        if digest and digest[0] == identity:
+            return digest[1]
+
+        sha = hashlib.sha1()
+        with open(path, 'rb') as infile:
+            for block in iter(lambda: infile.read(1024 * 1024), ''):
+                sha.update(block)
+
+        with self._lock:
+            self._digests[path] = (identity, sha.hexdigest())
+
+        return sha.hexdigest()
+
+    def program_version(self, executable):
+        """Find the version of an executable from its usage message
+
+        If no version can be found, a hash of the whole message is used, so
+        that a different build still gives a different key.
+
+        :param executable: the program to ask
+        :type executable: str
+
+        :returns: the version
+        :rtype: str
+        """
+
+        if executable in self._versions:
+            return self._versions[executable]
+
+        try:
+            with open(os.devnull, 'r+') as fnull:
+                proc = subprocess.Popen(
+                    [executable], stdin=fnull, stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT)
+                output, _ = proc.communicate()
+        except OSError:
+            output = ''
+
+        match = self.VERSION_PATTERN.search(output)
+        version = match.group(1) if match else \
+            hashlib.sha1(output).hexdigest()
+
+        self._versions[executable] = version
+        self.logger.debug('%s version %s', executable, version)
+
+        return version
+
+    def set_version(self, executable, version):
+        """Give the version of a program that cannot be asked for it, such as
+        a trimmer built into this package
+
+        :param executable: the name the program is keyed by
+        :type executable: str
+
+        :param version: the version
+        :type version: str
+        """
+
+        self._versions[executable] = version
+
+    def fetch(self, key, outputs):
+        """Link the stored outputs for key into place
+
+        :param key: the key from self.key
+        :type key: str
+
+        :param outputs: the paths to restore the outputs to
+        :type outputs: list(str)
+
+        :returns: True if the entry was found and restored
+        :rtype: bool
+        """
+
+        entry = os.path.join(self.path, key)
+
+        try:
+            with open(os.path.join(entry, self.META)) as metafile:
+                sizes = json.load(metafile)['sizes']
+
+            stored = [os.path.join(entry, str(i)) for i in range(len(sizes))]
+
+            if len(sizes) != len(outputs) or \
+                    sizes != [os.path.getsize(f) for f in stored]:
+                raise ValueError('Entry does not match its description')
+
+            for src, dst in zip(stored, outputs):
+                link_file(src, dst)
+
+            os.utime(entry, None)
+        except (IOError, OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+
+        return True
+
+    def store(self, key, outputs):
+        """Add the outputs of a successful call to the cache
+
+        The entry is built in a temporary directory and renamed into place,
+        so a partly written entry is never found.  Old entries are then
+        removed to bring the cache below its size cap.
+
+        :param key: the key from self.key
+        :type key: str
+
+        :param outputs: the files written by the call
+        :type outputs: list(str)
+        """
+
+        tmpdir = tempfile.mkdtemp(prefix='.tmp', dir=self.path)
+
+        try:
+            for i, path in enumerate(outputs):
+                link_file(path, os.path.join(tmpdir, str(i)))
+
+            with open(os.path.join(tmpdir, self.META), 'w') as metafile:
+                json.dump({'sizes': [os.path.getsize(f) for f in outputs]},
+                          metafile)
+
+            os.rename(tmpdir, os.path.join(self.path, key))
+        except OSError as e:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                self.logger.warning(
+                    'Could not add {0} to the trim cache: {1}'.format(
+                        ', '.join(outputs), e))
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is no
+        larger than its size cap
+
+        :returns: the number of entries removed
+        :rtype: int
+        """
+
+        entries = []
+        total = 0
+
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, f))
+                           for f in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+            except OSError:
+                continue
+
+            total += size
+
+        removed = 0
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+
+        if removed:
+            self.logger.info(
+                'Removed {0} old entries from the trim cache'.format(removed))
+
+        return removed
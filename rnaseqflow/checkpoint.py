@@ -0,0 +1,200 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import json
+import logging
+import os
+import threading
+import time
+
+
+class Manifest(object):
+    """A record of the units of work a Workflow has completed
+
+    Each unit, such as one merged file or one call to fastq-mcf, is appended
+    to the manifest file as a line of JSON as soon as it finishes.  An entry
+    holds the stage specifier, the inputs with their sizes and modification
+    times, the outputs with their sizes, the arguments and the exit status.
+
+    When resuming, a unit is complete if the manifest holds a successful entry
+    for the same stage and outputs, with the same arguments, whose inputs have
+    not changed and whose outputs still exist with the recorded sizes.
+    """
+
+    logger = logging.getLogger('rnaseqflow.Manifest')
+    """log4j-style class logger"""
+
+    FILENAME = '.rnaseqflow_manifest'
+    """The name of the manifest file in the root directory"""
+
+    def __init__(self, path, resume=False):
+        """Open a manifest
+
+        :param path: the manifest file
+        :type path: str
+
+        :param resume: read the units completed by an earlier run from the
+            file and add to it, rather than starting it again
+        :type resume: bool
+        """
+
+        self.path = path
+        self.resume = resume
+        self.skipped = 0
+
+        self._completed = self._load() if resume else {}
+        self._lock = threading.Lock()
+
+        with open(self.path, 'a' if resume else 'w'):
+            pass
+
+    def completed(self, spec, inputs, outputs, args):
+        """Check whether a unit of work can be skipped
+
+        :param spec: the specifier of the stage doing the work
+        :type spec: str
+
+        :param inputs: the files the unit reads
+        :type inputs: list(str)
+
+        :param outputs: the files the unit writes
+        :type outputs: list(str)
+
+        :param args: the arguments that determine the unit's output
+        :type args: list(str)
+
+        :returns: True if the unit was completed by an earlier run and has not
+            been invalidated since
+        :rtype: bool
+        """
+
+        if not self.resume:
+            return False
+
+        entry = self._completed.get(self._key(spec, outputs))
+
+        if not (entry and entry['status'] == 0 and entry['args'] == args):
+            return False
+
+        try:
+            if entry['inputs'] != self._describe(inputs):
+                return False
+            if [size for _, size in entry['outputs']] != \
+                    [os.path.getsize(f) for f in outputs]:
+                return False
+        except OSError:
+            return False
+
+        with self._lock:
+            self.skipped += 1
+
+        return True
+
+    def record(self, spec, inputs, outputs, args, status):
+        """Append a finished unit of work to the manifest
+
+        The entry is flushed to disk before returning, so that it survives
+        the process being killed.
+
+        :param spec: the specifier of the stage that did the work
+        :type spec: str
+
+        :param inputs: the files the unit read
+        :type inputs: list(str)
+
+        :param outputs: the files the unit wrote
+        :type outputs: list(str)
+
+        :param args: the arguments that determine the unit's output
+        :type args: list(str)
+
+        :param status: the exit status of the unit, 0 for success
+        :type status: int
+        """
+
+        entry = {
+            'stage': spec,
+            'inputs': self._describe(inputs),
+            'outputs': [[f, os.path.getsize(f) if os.path.exists(f) else None]
+                        for f in outputs],
+            'args': args,
+            'status': status,
+            'finished': time.time(),
+        }
+
+        line = json.dumps(entry, sort_keys=True) + '\n'
+
+        with self._lock:
+            with open(self.path, 'a') as manifest:
+                manifest.write(line)
+                manifest.flush()
+                os.fsync(manifest.fileno())
+
+            self._completed[self._key(spec, outputs)] = entry
+
+    def _load(self):
+        """Read the entries of an earlier run
+
+        A partly written last line, left by a crash, is ignored.
+
+        :returns: the latest entry for each stage and set of outputs
+        :rtype: dict
+        """
+
+        completed = {}
+
+        try:
+            with open(self.path) as manifest:
+                for line in manifest:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    outputs = [f for f, _ in entry['outputs']]
+                    completed[self._key(entry['stage'], outputs)] = entry
+        except IOError:
+            pass
+
+        self.logger.info('Loaded {0} completed units from {1}'.format(
+            len(completed), self.path))
+
+        return completed
+
+    @staticmethod
+    def _key(spec, outputs):
+        """Identify a unit of work by its stage and outputs"""
+
+        return spec, tuple(outputs)
+
+    @staticmethod
+    def _describe(paths):
+        """List the path, size and modification time of each file
+
+        :raises OSError: if a file does not exist
+        """
+
+        described = []
+        for path in paths:
+            st = os.stat(path)
+            described.append([path, st.st_size, st.st_mtime])
+
+        return described
@@ -26,6 +26,8 @@ import readline
 import logging
 import glob
 
+from scheduler import available_cpus
+
 
 def trim(docstring):
     """Trim a :pep:`0257` docstring
@@ -230,6 +232,14 @@ class ArgFiller(object):
             self.args.ext = raw_input(
                 "Please provide a file extension (e.g. .fastq, .fastq.gz): ")
 
+    def _fill_find_workers(self):
+        """Fill in self.args.find_workers with a default of 8"""
+
+        if not (hasattr(self.args, 'find_workers') and
+                isinstance(self.args.find_workers, int) and
+                self.args.find_workers > 0):
+            self.args.find_workers = 8
+
     def _fill_blocksize(self):
         """Fill in self.args.blocksize with a valid integer (in kB)"""
 
@@ -241,6 +251,57 @@ class ArgFiller(object):
             self.args.blocksize = self._get_integer_input(
                 'Please provide a blocksize in kB (e.g. 1024): ')
 
+    def _fill_merge_workers(self):
+        """Fill in self.args.merge_workers with a default of 1"""
+
+        if not (hasattr(self.args, 'merge_workers') and
+                isinstance(self.args.merge_workers, int) and
+                self.args.merge_workers > 0):
+            self.args.merge_workers = 1
+
+    def _fill_stage_workers(self):
+        """Fill in self.args.stage_workers with a default of 1"""
+
+        if not (hasattr(self.args, 'stage_workers') and
+                isinstance(self.args.stage_workers, int) and
+                self.args.stage_workers > 0):
+            self.args.stage_workers = 1
+
+    def _fill_gzip_merge(self):
+        """Fill in self.args.gzip_merge with a default of 'copy'"""
+
+        if not (hasattr(self.args, 'gzip_merge') and
+                self.args.gzip_merge in ('copy', 'check', 'verify', 'bgzf')):
+            self.args.gzip_merge = 'copy'
+
+    def _fill_compress(self):
+        """Fill in the compress argument self.args.compress with default
+        False"""
+
+        if not (hasattr(self.args, 'compress') and self.args.compress):
+            self.args.compress = False
+
+    def _fill_merge_lanes(self):
+        """Fill in the merge_lanes argument self.args.merge_lanes with
+        default False"""
+
+        if not (hasattr(self.args, 'merge_lanes') and self.args.merge_lanes):
+            self.args.merge_lanes = False
+
+    def _fill_qc_format(self):
+        """Fill in self.args.qc_format with a default of 'json'"""
+
+        if not (hasattr(self.args, 'qc_format') and
+                self.args.qc_format in ('json', 'npz')):
+            self.args.qc_format = 'json'
+
+    def _fill_trim_qc(self):
+        """Fill in the trim_qc argument self.args.trim_qc with default
+        False"""
+
+        if not (hasattr(self.args, 'trim_qc') and self.args.trim_qc):
+            self.args.trim_qc = False
+
     def _fill_adapters(self):
         """Fill in self.args.adapters with a valid file path"""
 
@@ -267,6 +328,75 @@ class ArgFiller(object):
         if not (hasattr(self.args, 'fastq') and self.args.fastq):
             self.args.fastq = 'fastq-mcf'
 
+    def _fill_jobs(self):
+        """Fill in self.args.jobs with a default of the number of CPUs"""
+
+        if not (hasattr(self.args, 'jobs') and
+                isinstance(self.args.jobs, int) and
+                self.args.jobs > 0):
+            self.args.jobs = available_cpus()
+
+    def _fill_shards(self):
+        """Fill in self.args.shards with a default of 1, which trims each
+        file whole"""
+
+        if not (hasattr(self.args, 'shards') and
+                isinstance(self.args.shards, int) and
+                self.args.shards > 0):
+            self.args.shards = 1
+
+    def _fill_cache(self):
+        """Fill in the trim cache directory self.args.cache with default None,
+        which disables the cache"""
+
+        if not (hasattr(self.args, 'cache') and self.args.cache):
+            self.args.cache = None
+
+    def _fill_cache_size(self):
+        """Fill in self.args.cache_size (in GB) with a default of 100"""
+
+        if not (hasattr(self.args, 'cache_size') and
+                isinstance(self.args.cache_size, int) and
+                self.args.cache_size > 0):
+            self.args.cache_size = 100
+
+    def _fill_min_free(self):
+        """Fill in self.args.min_free (in GB) with a default of 0"""
+
+        if not (hasattr(self.args, 'min_free') and
+                isinstance(self.args.min_free, (int, float)) and
+                self.args.min_free > 0):
+            self.args.min_free = 0
+
+    def _fill_delete_intermediates(self):
+        """Fill in the delete_intermediates argument
+        self.args.delete_intermediates with default False"""
+
+        if not (hasattr(self.args, 'delete_intermediates') and
+                self.args.delete_intermediates):
+            self.args.delete_intermediates = False
+
+    def _fill_reindex(self):
+        """Fill in the reindex argument self.args.reindex with default False"""
+
+        if not (hasattr(self.args, 'reindex') and self.args.reindex):
+            self.args.reindex = False
+
+    def _fill_resume(self):
+        """Fill in the resume argument self.args.resume with default False"""
+
+        if not (hasattr(self.args, 'resume') and self.args.resume):
+            self.args.resume = False
+
+    def _fill_report(self):
+        """Fill in the report file self.args.report with a default of
+        rnaseqflow_report.json in the root directory"""
+
+        if not (hasattr(self.args, 'report') and self.args.report):
+            self._fill_root()
+            self.args.report = os.path.join(self.args.root,
+                                            'rnaseqflow_report.json')
+
     def _fill_quiet(self):
         """Fill in the quiet argument self.args.quiet with default False"""
 
@@ -0,0 +1,812 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import array
+import bisect
+import collections
+import gzip
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from gziputils import GzipReader
+
+logger = logging.getLogger('rnaseqflow.fastqio')
+"""log4j-style module logger"""
+
+FastqRecord = collections.namedtuple('FastqRecord',
+                                     ['name', 'sequence', 'quality'])
+"""One read: its name (the header line without the @), bases and quality
+string, each a zero-copy buffer into the file, or a str"""
+
+CHUNK_BYTES = 4 * 1024 ** 2
+"""The amount of a file read at once by fastq_batches"""
+
+
+class FastqBatch(object):
+    """A run of whole FASTQ records, parsed at once with NumPy
+
+    The lines of every record are found from the offsets of their newlines
+    and checked together.  The bases and qualities are gathered into
+    zero-padded uint8 matrices, one row per read, only when asked for, and
+    the records can be written out again, or only some of them with their
+    reads cut, without a loop over the reads.
+    """
+
+    def __init__(self, path, block, ends, base=0):
+        """Find the lines of the records in a block of bytes
+
+        :param path: the file the records were read from, for errors
+        :type path: str
+
+        :param block: the records
+        :type block: numpy.ndarray(uint8)
+
+        :param ends: the offset in block of the end of each line, four per
+            record; the last may be len(block) if it has no newline
+        :type ends: numpy.ndarray(int)
+
+        :param base: the offset in the file of the start of block, for errors
+        :type base: int
+
+        :raises ValueError: if the records are not valid FASTQ
+        """
+
+        starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.intp)
+        lengths = ends - starts
+        lengths -= (block[np.maximum(ends - 1, 0)] == 13) & (lengths > 0)
+
+        bad = (block[np.minimum(starts[0::4], len(block) - 1)] != 64) | \
+            (block[np.minimum(starts[2::4], len(block) - 1)] != 43) | \
+            (lengths[1::4] != lengths[3::4])
+        if bad.any():
+            raise ValueError('{0} is not valid FASTQ at byte {1}'.format(
+                path, base + int(starts[4 * np.flatnonzero(bad)[0]])))
+
+        self.path = path
+        self.block = block
+        self.base = base
+        self.line_ends = ends
+        self.line_starts = starts
+        self.line_lengths = lengths
+        self.lengths = lengths[1::4]
+
+    def __len__(self):
+        """The number of records"""
+
+        return len(self.lengths)
+
+    def sequences(self):
+        """Gather the bases of each read into a matrix
+
+        :returns: one row per read, padded with zeros
+        :rtype: numpy.ndarray(uint8)
+        """
+
+        return self._gather(self.line_starts[1::4])
+
+    def qualities(self):
+        """Gather the quality characters of each read into a matrix
+
+        :returns: one row per read, padded with zeros
+        :rtype: numpy.ndarray(uint8)
+        """
+
+        return self._gather(self.line_starts[3::4])
+
+    def records(self):
+        """Iterate the records, as FastqRecords of buffers into the block
+
+        :rtype: generator(FastqRecord)
+        """
+
+        starts = self.line_starts.tolist()
+        lengths = self.line_lengths.tolist()
+
+        for i in xrange(0, len(starts), 4):
+            yield FastqRecord(
+                buffer(self.block, starts[i] + 1, lengths[i] - 1),
+                buffer(self.block, starts[i + 1], lengths[i + 1]),
+                buffer(self.block, starts[i + 3], lengths[i + 3]))
+
+    def write(self, outfile, keep=None, starts=None, stops=None):
+        """Write the records, or some of them with their reads cut
+
+        Each record is written as its header, its bases and qualities from
+        start up to stop, and a bare + line, with newline line ends.
+
+        :param outfile: a file opened for binary writing
+        :type outfile: file
+
+        :param keep: whether to write each record, by default all of them
+        :type keep: numpy.ndarray(bool), None
+
+        :param starts: the first base kept of each read, by default 0
+        :type starts: numpy.ndarray(int), None
+
+        :param stops: the base after the last kept of each read, by default
+            its length
+        :type stops: numpy.ndarray(int), None
+        """
+
+        kept = np.arange(len(self)) if keep is None else np.flatnonzero(keep)
+        first = np.zeros(len(kept), np.intp) if starts is None else \
+            starts[kept]
+        last = self.lengths[kept] if stops is None else stops[kept]
+
+        lines = 4 * kept
+        line_starts = self.line_starts
+        ends = self.line_ends
+
+        # the runs of bytes written from each record, in order: the header,
+        # its newline, the bases kept, a newline, the +, a newline, the
+        # qualities kept and a newline
+        runs = np.array([
+            line_starts[lines], ends[lines],
+            line_starts[lines + 1] + first, ends[lines + 1],
+            line_starts[lines + 2], ends[lines + 2],
+            line_starts[lines + 3] + first, ends[lines + 3]]).T
+        lengths = np.array([
+            self.line_lengths[lines], np.ones_like(lines), last - first,
+            np.ones_like(lines), np.ones_like(lines), np.ones_like(lines),
+            last - first, np.ones_like(lines)]).T
+
+        block = self.block
+        if len(ends) and ends[-1] == len(block):
+            block = np.append(block, np.uint8(10))
+
+        runs = runs.ravel()
+        lengths = lengths.ravel()
+        offsets = np.cumsum(lengths) - lengths
+
+        outfile.write(block[np.repeat(runs - offsets, lengths) +
+                            np.arange(int(lengths.sum()))].tostring())
+
+    def _gather(self, line_starts):
+        """Gather the bytes of one line of each record into a matrix"""
+
+        width = int(self.lengths.max()) if len(self) else 0
+        index = line_starts.astype(np.int32)[:, None] + \
+            np.arange(width, dtype=np.int32)
+        np.minimum(index, max(len(self.block) - 1, 0), out=index)
+
+        gathered = self.block[index]
+        gathered[np.arange(width) >= self.lengths[:, None]] = 0
+        return gathered
+
+
+class FastqReader(object):
+    """Read the records of a FASTQ file through a memory map
+
+    Records are yielded as FastqRecords whose fields are buffer objects that
+    point into the map, so no read is copied until it is used; call str on a
+    field to get a copy.  The buffers are only valid until the reader is
+    closed.  Records must be four lines long, and are parsed a FastqBatch at
+    a time when NumPy is available.
+
+    A file whose name ends with .gz is read through a gziputils.GzipReader
+    instead, a block of records at a time, and every offset counts bytes of
+    the decompressed data.
+
+    An index of the byte offset of every record gives the Nth record, or the
+    number of records, at once.  It is built on first use by one pass over
+    the file and saved next to it as path + INDEX_SUFFIX, and used again as
+    long as the file's size and modification time are unchanged.
+    """
+
+    logger = logging.getLogger('rnaseqflow.FastqReader')
+    """log4j-style class logger"""
+
+    INDEX_SUFFIX = '.fqi'
+    """Appended to the path of a FASTQ file to name its index"""
+
+    INDEX_MAGIC = 'RNSQFQI1'
+    """The first bytes of an index file"""
+
+    INDEX_HEADER = struct.Struct('<8sQqQB')
+    """The index header: magic, file size, modification time in nanoseconds,
+    record count and offset width"""
+
+    SCAN_BYTES = 64 * 1024 ** 2
+    """The amount of the file searched for line ends at once"""
+
+    def __init__(self, path, persist=True, executor=None):
+        """Open and map a FASTQ file
+
+        :param path: the file to read
+        :type path: str
+
+        :param persist: save the record index next to the file, and load a
+            saved one
+        :type persist: bool
+
+        :param executor: the threads a gzip file is decompressed on, by
+            default threads started for each read
+        :type executor: scheduler.Executor, None
+
+        :raises IOError: if the file cannot be opened
+        """
+
+        self.path = path
+        self.persist = persist
+
+        self._file = open(path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._file_size = stat.st_size
+        self._mtime = int(stat.st_mtime * 1e9)
+        self._offsets = None
+
+        if path.endswith('.gz'):
+            self._gzip = GzipReader(path, persist=persist,
+                                    executor=executor)
+            self._map = ''
+            return
+
+        self._gzip = None
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access=mmap.ACCESS_READ) \
+            if self._file_size else ''
+
+    @property
+    def size(self):
+        """The size of the file, decompressed; for a gzip file, this needs
+        its index, built by a pass over the file if it has not been
+
+        :rtype: int
+        """
+
+        if self._gzip is not None:
+            return self._gzip.size
+
+        return self._file_size
+
+    def close(self):
+        """Unmap and close the file"""
+
+        if self._map:
+            self._map.close()
+        self._map = ''
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        """Iterate every record, in order, without building the index of an
+        uncompressed file"""
+
+        return self._scan(0, self.size)
+
+    def __len__(self):
+        """The number of records, from the index"""
+
+        return len(self.offsets) - 1
+
+    def __getitem__(self, number):
+        """Get record number, counting from 0, from the index
+
+        :raises IndexError: if there is no such record
+        """
+
+        if number < 0:
+            number += len(self)
+        if not 0 <= number < len(self):
+            raise IndexError('record {0} is out of range'.format(number))
+
+        return next(self._scan(self.offsets[number],
+                               self.offsets[number + 1]))
+
+    def records(self, start=0, stop=None):
+        """Iterate the records numbered from start up to stop
+
+        :param start: the first record
+        :type start: int
+
+        :param stop: the record after the last, by default the end of the file
+        :type stop: int, None
+
+        :rtype: generator(FastqRecord)
+        """
+
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        return self._scan(self.offset(start), self.offset(max(start, stop)))
+
+    def offset(self, number):
+        """Get the byte offset at which record number starts
+
+        :param number: the record, which may be the record count to get the
+            size of the file
+        :type number: int
+
+        :rtype: int
+        """
+
+        return self.offsets[min(number, len(self))]
+
+    def record_at(self, offset):
+        """Number the first record that starts at or after a byte offset
+
+        :param offset: the byte offset
+        :type offset: int
+
+        :rtype: int
+        """
+
+        return bisect.bisect_left(self.offsets, offset, 0, len(self))
+
+    def split(self, shards, min_bytes=1):
+        """Cut the file into up to shards runs of records of about the same
+        size
+
+        :param shards: the largest number of runs
+        :type shards: int
+
+        :param min_bytes: the smallest size of a run
+        :type min_bytes: int
+
+        :returns: the record number starting each run, then the record count
+        :rtype: list(int)
+        """
+
+        count = max(1, min(shards, self.size // max(1, min_bytes)))
+        cuts = set(self.record_at(self.size * i // count)
+                   for i in range(1, count))
+
+        return [0] + sorted(cuts - set([0, len(self)])) + [len(self)]
+
+    @property
+    def offsets(self):
+        """The byte offset of each record, followed by the size of the file
+
+        :rtype: array.array
+        """
+
+        if self._offsets is None:
+            self._offsets = self._load_index()
+
+        if self._offsets is None:
+            self._offsets = self._build_index()
+            if self.persist:
+                self._save_index()
+
+        return self._offsets
+
+    def _scan(self, start, end):
+        """Parse the records between two byte offsets at record starts
+
+        :raises ValueError: if a record is not valid FASTQ
+        """
+
+        if self._gzip is None:
+            return self._parse(self._map, start, end, 0)
+
+        return self._scan_gzip(start, end)
+
+    def _scan_gzip(self, start, end):
+        """Decompress and parse the records between two byte offsets, about
+        SCAN_BYTES at a time, cut at the record starts in the index"""
+
+        while start < end:
+            stop = min(end, self.offset(self.record_at(
+                start + self.SCAN_BYTES)))
+            data = self._gzip.read(start, stop)
+
+            for record in self._parse(data, 0, len(data), start):
+                yield record
+
+            start = stop
+
+    def _parse(self, data, start, end, base):
+        """Parse the records of data between two offsets at record starts,
+        about SCAN_BYTES at a time, as FastqBatches
+
+        :param data: the file's map, or a piece of the decompressed file
+        :type data: mmap.mmap, str
+
+        :param base: the offset in the file of the start of data, for errors
+        :type base: int
+
+        :raises ValueError: if a record is not valid FASTQ
+        """
+
+        if np is None:
+            return self._parse_lines(data, start, end, base)
+
+        return self._parse_batches(data, start, end, base)
+
+    def _parse_batches(self, data, start, end, base):
+        """Parse the records of data with NumPy, a FastqBatch at a time"""
+
+        size = self.SCAN_BYTES
+
+        while start < end:
+            stop = min(end, start + size)
+            batches, used = _cut(
+                self.path, np.frombuffer(data, np.uint8, stop - start, start),
+                base + start, final=stop == end)
+
+            for batch in batches:
+                for record in batch.records():
+                    yield record
+
+            if stop == end:
+                break
+
+            # a record longer than the window makes it grow
+            size = self.SCAN_BYTES if used else 2 * size
+            start += used
+
+    def _parse_lines(self, data, start, end, base):
+        """Parse the records of data a line at a time, without NumPy"""
+
+        position = start
+
+        while position < end:
+            lines = []
+            for _ in range(4):
+                newline = data.find('\n', position, end)
+                if newline < 0:
+                    newline = end
+                lines.append((position, newline))
+                position = newline + 1
+
+            (h0, h1), (s0, s1), (p0, _), (q0, q1) = lines
+            if data[h0] != '@' or p0 >= end or data[p0] != '+':
+                raise ValueError('{0} is not valid FASTQ at byte {1}'.format(
+                    self.path, base + h0))
+
+            yield FastqRecord(buffer(data, h0 + 1, h1 - h0 - 1),
+                              buffer(data, s0, s1 - s0),
+                              buffer(data, q0, q1 - q0))
+
+    def _line_ends(self):
+        """Find the offset of the end of every line, a block at a time
+
+        The end of the file counts as a line end if the last line has no
+        newline
+
+        :returns: the offsets of each block, as a list or a numpy array
+        :rtype: generator
+        """
+
+        if self._gzip is not None:
+            for ends in self._gzip_line_ends():
+                yield ends
+            return
+
+        for start in xrange(0, self.size, self.SCAN_BYTES):
+            stop = min(start + self.SCAN_BYTES, self.size)
+
+            if np is not None:
+                block = np.frombuffer(self._map, np.uint8, stop - start, start)
+                yield np.flatnonzero(block == 10) + start
+                continue
+
+            ends = []
+            position = self._map.find('\n', start, stop)
+            while position >= 0:
+                ends.append(position)
+                position = self._map.find('\n', position + 1, stop)
+            yield ends
+
+        if self.size and self._map[self.size - 1] != '\n':
+            yield [self.size]
+
+    def _gzip_line_ends(self):
+        """Find the offset of the end of every line of a gzip file, a piece
+        of the decompressed data at a time"""
+
+        start = 0
+        last = '\n'
+
+        for data in self._gzip.chunks():
+            if np is not None:
+                block = np.frombuffer(data, np.uint8)
+                yield np.flatnonzero(block == 10) + start
+            else:
+                ends = []
+                position = data.find('\n')
+                while position >= 0:
+                    ends.append(start + position)
+                    position = data.find('\n', position + 1)
+                yield ends
+
+            start += len(data)
+            last = data[-1:] or last
+
+        if self.size and last != '\n':
+            yield [self.size]
+
+    def _build_index(self):
+        """Find the offset of every record by one pass over the file
+
+        :raises ValueError: if the file does not hold whole four line records
+        """
+
+        offsets = array.array('L', [0])
+        lines = 0
+
+        for ends in self._line_ends():
+            # the line ends that end a record, each followed by the next one
+            starts = ends[(3 - lines) % 4::4]
+            lines += len(ends)
+
+            if isinstance(starts, list):
+                offsets.extend(start + 1 for start in starts)
+            else:
+                offsets.fromstring((starts + 1).astype('L').tostring())
+
+        if lines % 4:
+            raise ValueError('{0} has {1} lines, which is not a whole number '
+                             'of records'.format(self.path, lines))
+
+        # a last line without a newline ends one byte past the end
+        if offsets[-1] > self.size:
+            offsets[-1] = self.size
+        elif offsets[-1] != self.size:
+            offsets.append(self.size)
+
+        # the records of a gzip file are checked as they are parsed
+        if self._gzip is not None:
+            valid = True
+        elif np is not None and len(offsets) > 1:
+            data = np.frombuffer(self._map, np.uint8)
+            valid = (data[np.frombuffer(offsets, 'L')[:-1]] == 64).all()
+        else:
+            valid = all(self._map[start] == '@' for start in offsets[:-1])
+
+        if not valid:
+            raise ValueError('{0} is not valid FASTQ'.format(self.path))
+
+        self.logger.debug('Indexed %d records in %s', len(offsets) - 1,
+                          self.path)
+
+        return offsets
+
+    def _load_index(self):
+        """Load the saved index, if there is one and it is up to date
+
+        :returns: the offsets, or None
+        :rtype: array.array, None
+        """
+
+        if not self.persist:
+            return None
+
+        offsets = array.array('L')
+
+        try:
+            with open(self.path + self.INDEX_SUFFIX, 'rb') as index:
+                magic, size, mtime, count, width = self.INDEX_HEADER.unpack(
+                    index.read(self.INDEX_HEADER.size))
+                if (magic, size, mtime, width) != (
+                        self.INDEX_MAGIC, self._file_size, self._mtime,
+                        offsets.itemsize):
+                    return None
+                offsets.fromfile(index, count + 1)
+        except (IOError, EOFError, struct.error):
+            return None
+
+        return offsets
+
+    def _save_index(self):
+        """Save the index next to the file, if the folder is writable"""
+
+        folder = os.path.dirname(os.path.abspath(self.path))
+
+        try:
+            fd, tmp = tempfile.mkstemp(prefix='.fqi', dir=folder)
+        except (IOError, OSError) as e:
+            self.logger.debug('Not saving an index of %s: %s', self.path, e)
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as index:
+                index.write(self.INDEX_HEADER.pack(
+                    self.INDEX_MAGIC, self._file_size, self._mtime,
+                    len(self._offsets) - 1, self._offsets.itemsize))
+                self._offsets.tofile(index)
+            os.rename(tmp, self.path + self.INDEX_SUFFIX)
+        except (IOError, OSError) as e:
+            self.logger.debug('Not saving an index of %s: %s', self.path, e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def split_fastq(paths, shards, min_bytes=1, executor=None):
+    """Split a FASTQ file, or the files of a pair, into byte ranges that hold
+    the same records
+
+    The first file is cut into up to shards runs of records of about the
+    same size, each at least min_bytes long, and the other files are cut
+    after the same records, so each shard of a pair holds matching mates.
+    The record index of each file is used, and built if needed.  The ranges
+    of a gzip file count bytes of the decompressed data.
+
+    :param paths: the file, or the files of a pair
+    :type paths: list(str)
+
+    :param shards: the largest number of ranges to make
+    :type shards: int
+
+    :param min_bytes: the smallest size of a range of the first file
+    :type min_bytes: int
+
+    :param executor: the threads gzip files are decompressed on while they
+        are indexed, by default threads of their own
+    :type executor: scheduler.Executor, None
+
+    :returns: for each shard in order, the (path, start, end) range of each
+        file
+    :rtype: list(list(tuple(str, int, int)))
+
+    :raises ValueError: if a file is not valid FASTQ, or the files of a pair
+        hold different numbers of records
+    :raises IOError: if a gzip file is not valid
+    """
+
+    readers = [FastqReader(p, executor=executor) for p in paths]
+
+    try:
+        if len(set(len(r) for r in readers)) > 1:
+            raise ValueError('The files of a pair hold different numbers of '
+                             'records: {0}'.format(', '.join(paths)))
+
+        cuts = readers[0].split(shards, min_bytes)
+
+        return [[(r.path, r.offset(start), r.offset(stop)) for r in readers]
+                for start, stop in zip(cuts, cuts[1:])]
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def fastq_batches(source, batch_size=None, workers=None):
+    """Parse a FASTQ file, or a byte range of one, into FastqBatches
+
+    The file is read CHUNK_BYTES at a time, and the whole records read so
+    far are parsed at once.  The range of a gzip file counts bytes of the
+    decompressed data.
+
+    :param source: a path, or a (path, start, end) byte range that starts
+        and ends at record boundaries
+    :type source: str, tuple(str, int, int)
+
+    :param batch_size: the number of records in each batch but the last, or
+        None for batches of whatever whole records each read holds
+    :type batch_size: int, None
+
+    :param workers: the number of threads decompressing a gzip file at once,
+        by default the number of CPUs
+    :type workers: int, None
+
+    :rtype: generator(FastqBatch)
+
+    :raises ValueError: if the file is not valid FASTQ
+    """
+
+    path = source[0] if isinstance(source, tuple) else source
+    rest = ''
+    base = 0
+
+    for data in _chunks(source, workers):
+        data = rest + data
+        batches, used = _cut(path, np.frombuffer(data, np.uint8), base,
+                             batch_size)
+        for batch in batches:
+            yield batch
+        rest = data[used:]
+        base += used
+
+    batches, _ = _cut(path, np.frombuffer(rest, np.uint8), base, batch_size,
+                      final=True)
+    for batch in batches:
+        yield batch
+
+
+def _cut(path, block, base, batch_size=None, final=False):
+    """Parse the whole records at the start of a block into FastqBatches
+
+    :param final: whether the block ends the file or range, so that a last
+        line without a newline ends a record and anything but whitespace
+        after the last whole record is an error
+    :type final: bool
+
+    :returns: the batches, and the number of bytes of block they hold
+    :rtype: tuple(list(FastqBatch), int)
+
+    :raises ValueError: if the records are not valid FASTQ
+    """
+
+    if final and len(block) and block[-1] != 10:
+        block = np.append(block, np.uint8(10))
+
+    ends = np.flatnonzero(block == 10)
+    records = len(ends) // 4
+    if batch_size and not final:
+        records -= records % batch_size
+    step = batch_size or records or 1
+
+    batches = []
+    used = 0
+
+    for first in xrange(0, records, step):
+        last = min(records, first + step)
+        stop = int(ends[4 * last - 1]) + 1
+        batches.append(FastqBatch(path, block[used:stop],
+                                  ends[4 * first:4 * last] - used,
+                                  base + used))
+        used = stop
+
+    if final and block[used:].tostring().strip():
+        raise ValueError('{0} ends with an incomplete record'.format(path))
+
+    return batches, used
+
+
+def _chunks(source, workers=None):
+    """Read a file, or a byte range of one, in pieces of about CHUNK_BYTES,
+    decompressing a .gz file
+
+    A .gz file is read with gzip.open only if a GzipReader cannot be made
+    for it; an error once it is being read is raised, since pieces have
+    already been yielded.
+
+    :rtype: generator(str)
+    """
+
+    path, start, end = source if isinstance(source, tuple) else \
+        (source, 0, None)
+
+    if path.endswith('.gz'):
+        try:
+            reader = GzipReader(path, workers=workers)
+        except OSError as e:
+            logger.debug('Reading %s with gzip: %s', path, e)
+        else:
+            for data in reader.chunks(start, end):
+                yield data
+            return
+
+    opener = gzip.open if path.endswith('.gz') else open
+
+    with opener(path, 'rb') as infile:
+        infile.seek(start)
+        position = start
+        while end is None or position < end:
+            data = infile.read(CHUNK_BYTES if end is None else
+                               min(CHUNK_BYTES, end - position))
+            if not data:
+                break
+            position += len(data)
+            yield data
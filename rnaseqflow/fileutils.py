@@ -0,0 +1,959 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import collections
+import ctypes
+import ctypes.util
+import errno
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+from gziputils import BgzfWriter, GzipReader
+from scheduler import Executor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
+logger = logging.getLogger('rnaseqflow.fileutils')
+"""log4j-style module logger"""
+
+FILENAME_PATTERN = re.compile(
+    r'(?P<sequence_id>.*[ACTG]{6})'
+    r'(?:.*?_L(?P<lane>\d{3}))?'
+    r'(?:.*?(?P<direction>R\d))?'
+    r'(?:.*?_(?P<part>\d{3}))?')
+"""Matches Illumina-style names like NIK1-2_TGACCA_L001_R1_001.fastq
+
+The sequence ID is everything up to and including the six-letter barcode,
+followed by an optional lane (L001), direction (R1) and part number (001)
+"""
+
+_parsed = {}
+"""The FastqName of every path parsed since forget_files was last called"""
+
+_sizes = {}
+"""The size of every file found or written since forget_files was last
+called"""
+
+FICLONE = 0x40049409
+"""The Linux ioctl that makes a file share the blocks of another (a reflink)"""
+
+_FALLBACK_ERRNOS = frozenset(
+    getattr(errno, name) for name in
+    ('ENOSYS', 'EOPNOTSUPP', 'ENOTSUP', 'EXDEV', 'EINVAL', 'EBADF', 'ENOTTY',
+     'ETXTBSY')
+    if hasattr(errno, name))
+"""Errors meaning a copy method cannot be used here, rather than that the
+copy has failed"""
+
+_MAX_KERNEL_COPY = 1 << 30
+"""The largest number of bytes to ask the kernel to copy in one call"""
+
+
+class FastqName(object):
+    """The fields of an RNAseq file name
+
+    :ivar sequence_id: the sample name and barcode, e.g. NIK1-2_TGACCA, or an
+        empty string if the name has no six-letter barcode
+    :ivar sample: the sample name, e.g. NIK1-2
+    :ivar barcode: the six-letter barcode, e.g. TGACCA
+    :ivar lane: the lane number, or 0 if there is none
+    :ivar direction: the direction, R1 or R2, or an empty string
+    :ivar part: the part number, or 0 if there is none
+    """
+
+    __slots__ = ('sequence_id', 'sample', 'barcode', 'lane', 'direction',
+                 'part')
+
+    def __init__(self, sequence_id='', lane=0, direction='', part=0):
+        self.sequence_id = sequence_id
+        self.sample = sequence_id[:-6].rstrip('_')
+        self.barcode = sequence_id[-6:]
+        self.lane = lane
+        self.direction = direction
+        self.part = part
+
+    def __repr__(self):
+        return 'FastqName({0!r}, lane={1!r}, direction={2!r}, part={3!r})'.format(
+            self.sequence_id, self.lane, self.direction, self.part)
+
+
+def parse_filename(path):
+    """Extract the sample, barcode, lane, direction and part from a file path
+
+    Only the basename is examined, with a single match of FILENAME_PATTERN.
+    Results are remembered, so each path is only ever parsed once.
+
+    :param path: the path of an RNAseq file
+    :type path: str
+
+    :returns: the fields of the file name
+    :rtype: FastqName
+    """
+
+    try:
+        return _parsed[path]
+    except KeyError:
+        pass
+
+    m = FILENAME_PATTERN.match(os.path.basename(path))
+
+    if m is None:
+        name = FastqName()
+    else:
+        name = FastqName(m.group('sequence_id'),
+                         int(m.group('lane') or 0),
+                         m.group('direction') or '',
+                         int(m.group('part') or 0))
+
+    _parsed[path] = name
+
+    return name
+
+
+def remember_size(path, size):
+    """Record the size of a file, so that file_size need not stat it
+
+    :param path: the path of the file
+    :type path: str
+
+    :param size: the size of the file in bytes
+    :type size: int
+    """
+
+    _sizes[path] = size
+
+
+def file_size(path):
+    """Get the size of a file, using the size recorded when it was found or
+    written if there is one
+
+    The recorded size may be out of date, so it is only fit for scheduling
+    and reporting.  Anything that must be exact, such as where bytes are
+    written or whether a file was copied whole, should stat the file.
+
+    :param path: the path of the file
+    :type path: str
+
+    :returns: the size of the file in bytes
+    :rtype: int
+    """
+
+    try:
+        return _sizes[path]
+    except KeyError:
+        size = os.path.getsize(path)
+        _sizes[path] = size
+        return size
+
+
+def forget_files():
+    """Forget every parsed file name and recorded file size
+
+    Workflow.run calls this when it starts and ends, so that nothing
+    remembered about a file outlives the run that found it.
+    """
+
+    _parsed.clear()
+    _sizes.clear()
+
+
+class FileIndex(object):
+    """A record of the contents of every directory under a root directory
+
+    The index is kept in a gzipped JSON file in the root directory.  For each
+    directory it stores the modification time, the subdirectories and the
+    files with the indexed extensions, with their sizes.  A directory whose
+    modification time has not changed since it was indexed does not need to
+    be listed again.
+
+    Modifying a file in place does not change its directory's modification
+    time, so sizes from the index may be out of date for such files.
+    """
+
+    logger = logging.getLogger('rnaseqflow.FileIndex')
+    """log4j-style class logger"""
+
+    FILENAME = '.rnaseqflow_index'
+    """The name of the index file in the root directory"""
+
+    VERSION = 1
+    """Indexes written with a different version are ignored"""
+
+    RACY_SECONDS = 2.0
+    """Directories modified this recently are not indexed, since a change in
+    the same clock tick would not change their modification time"""
+
+    def __init__(self, root, exts, reindex=False):
+        """Load the index of root, if there is one
+
+        :param root: the directory whose contents are indexed
+        :type root: str
+
+        :param exts: the file extensions to index; an index of other
+            extensions is ignored
+        :type exts: tuple(str)
+
+        :param reindex: ignore any existing index, so that every directory is
+            listed again
+        :type reindex: bool
+        """
+
+        self.root = root
+        self.exts = tuple(exts)
+        self.path = os.path.join(root, self.FILENAME)
+        self.hits = 0
+        self.misses = 0
+
+        self._dirs = {} if reindex else self._load()
+        self._current = {}
+
+    def lookup(self, path, mtime):
+        """Get the indexed contents of a directory if it has not changed
+
+        :param path: the directory
+        :type path: str
+
+        :param mtime: the directory's current modification time
+        :type mtime: float
+
+        :returns: the subdirectories and (path, size) for each file, or None
+            if the directory must be listed again
+        :rtype: tuple(list(str), list(tuple(str, int))), None
+        """
+
+        key = os.path.relpath(path, self.root)
+        entry = self._dirs.get(key)
+
+        if entry is None or entry[0] != mtime:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._current[key] = entry
+
+        return ([os.path.join(path, name) for name in entry[1]],
+                [(os.path.join(path, name), size) for name, size in entry[2]])
+
+    def update(self, path, mtime, subdirs, files):
+        """Record the contents of a directory that has just been listed
+
+        :param path: the directory
+        :type path: str
+
+        :param mtime: the directory's modification time before it was listed
+        :type mtime: float
+
+        :param subdirs: the directory's subdirectories
+        :type subdirs: list(str)
+
+        :param files: (path, size) for each file in the directory
+        :type files: list(tuple(str, int))
+        """
+
+        if time.time() - mtime < self.RACY_SECONDS:
+            return
+
+        self._current[os.path.relpath(path, self.root)] = (
+            mtime,
+            [os.path.basename(d) for d in subdirs],
+            [(os.path.basename(f), size) for f, size in files])
+
+    def save(self):
+        """Write the directories seen since the index was loaded to disk
+
+        Directories that were not seen, because they have been removed, are
+        dropped from the index.  The file is replaced atomically, and failure
+        to write it is logged but not raised.
+        """
+
+        tmp_path = self.path + '.tmp'
+        try:
+            with gzip.open(tmp_path, 'wb') as indexfile:
+                json.dump({'version': self.VERSION, 'exts': self.exts,
+                           'dirs': self._current},
+                          indexfile, separators=(',', ':'))
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            self.logger.warning(
+                'Cannot write file index {0}: {1}'.format(self.path, e))
+        else:
+            self.logger.info(
+                'Reused {0} of {1} directory listings from {2}'.format(
+                    self.hits, self.hits + self.misses, self.path))
+
+    def _load(self):
+        """Read the index file
+
+        :returns: the indexed directories, or an empty dict if there is no
+            usable index
+        :rtype: dict
+        """
+
+        try:
+            with gzip.open(self.path, 'rb') as indexfile:
+                contents = json.load(indexfile)
+        except (IOError, OSError, ValueError, EOFError):
+            return {}
+
+        if (contents.get('version') != self.VERSION or
+                tuple(contents.get('exts', ())) != self.exts):
+            return {}
+
+        return dict((key, (entry[0], entry[1], [tuple(f) for f in entry[2]]))
+                    for key, entry in contents['dirs'].iteritems())
+
+
+def walk_files(root, exts, workers=1, index=None, executor=None):
+    """Recursively find the files under root that end with one of exts
+
+    Directories are listed with scandir, which gives file types without an
+    extra stat call.  With more than one worker, directories are listed
+    concurrently on the threads of a scheduler.Executor, which hides the
+    latency of network filesystems.  Like os.walk, symbolic links to
+    directories are not followed and directories that cannot be listed are
+    skipped.
+
+    If an index is given, directories that have not changed since they were
+    indexed are not listed again, and the index is updated with the
+    directories that are listed.  The caller is responsible for saving it.
+
+    The size of every file found is recorded for file_size.
+
+    :param root: the directory to search
+    :type root: str
+
+    :param exts: the file extensions to search for
+    :type exts: tuple(str)
+
+    :param workers: the number of directories to list at once
+    :type workers: int
+
+    :param index: an index of the contents of root
+    :type index: FileIndex, None
+
+    :param executor: the threads to list directories on, by default threads
+        of its own
+    :type executor: scheduler.Executor, None
+
+    :returns: (path, size) for each file found, in no particular order
+    :rtype: generator
+    """
+
+    def found(path, listing):
+        subdirs, files, mtime = listing
+
+        if index is not None and mtime is not None:
+            index.update(path, mtime, subdirs, files)
+
+        for filepath, size in files:
+            remember_size(filepath, size)
+            yield filepath, size
+
+    if workers <= 1:
+        pending = [root]
+        while pending:
+            path = pending.pop()
+            listing = _scan_dir(path, exts, index)
+            pending.extend(listing[0])
+            for result in found(path, listing):
+                yield result
+        return
+
+    def scan(path):
+        return path, _scan_dir(path, exts, index)
+
+    owned = executor is None
+    if owned:
+        executor = Executor(workers)
+
+    waiting = [root]
+    pending = collections.deque()
+
+    try:
+        while waiting or pending:
+            while waiting and len(pending) < workers:
+                pending.append(executor.submit(scan, waiting.pop()))
+
+            path, listing = executor.next_result(pending)
+            waiting.extend(listing[0])
+
+            for result in found(path, listing):
+                yield result
+    finally:
+        executor.cancel(pending)
+        if owned:
+            executor.close()
+
+
+def _scan_dir(path, exts, index=None):
+    """List one directory, or get its contents from an index
+
+    :param path: the directory to list
+    :type path: str
+
+    :param exts: the file extensions to search for
+    :type exts: tuple(str)
+
+    :param index: an index to consult before listing the directory
+    :type index: FileIndex, None
+
+    :returns: the subdirectories to descend into, (path, size) for each
+        matching file, and the directory's modification time if it was listed and should be
+        indexed (otherwise None)
+    :rtype: tuple(list(str), list(tuple(str, int)), float)
+    """
+
+    subdirs = []
+    files = []
+    mtime = None
+
+    try:
+        if index is not None:
+            mtime = os.stat(path).st_mtime
+            indexed = index.lookup(path, mtime)
+            if indexed is not None:
+                return indexed + (None,)
+
+        entries = list(scandir(path))
+    except OSError as e:
+        logger.warning('Cannot list directory {0}: {1}'.format(path, e))
+        return subdirs, files, None
+
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+
+        if is_dir:
+            if not entry.is_symlink():
+                subdirs.append(entry.path)
+        elif entry.name.endswith(exts):
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                size = 0
+            files.append((entry.path, size))
+
+    return subdirs, files, mtime
+
+
+def _load_libc():
+    """Find the C library functions used for copying inside the kernel
+
+    :returns: a list of (name, function) pairs, best first.  Each function
+        takes an input file descriptor, an output file descriptor and a byte
+        count, copies at most count bytes between the descriptors' current
+        positions, and returns the number of bytes copied.
+    :rtype: list(tuple(str, callable))
+    """
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    except (OSError, TypeError):
+        return []
+
+    def checked(result):
+        if result < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        return result
+
+    methods = []
+
+    if hasattr(libc, 'copy_file_range'):
+        libc.copy_file_range.argtypes = [
+            ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p,
+            ctypes.c_size_t, ctypes.c_uint]
+        libc.copy_file_range.restype = ctypes.c_ssize_t
+
+        methods.append(('copy_file_range', lambda in_fd, out_fd, count: checked(
+            libc.copy_file_range(in_fd, None, out_fd, None, count, 0))))
+
+    if hasattr(libc, 'sendfile'):
+        libc.sendfile.argtypes = [
+            ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t]
+        libc.sendfile.restype = ctypes.c_ssize_t
+
+        methods.append(('sendfile', lambda in_fd, out_fd, count: checked(
+            libc.sendfile(out_fd, in_fd, None, count))))
+
+    return methods
+
+
+_kernel_copies = _load_libc()
+
+
+def _reflink(in_fd, out_fd):
+    """Make the file out_fd share the blocks of in_fd, if the filesystem can
+
+    :returns: True if the file was cloned
+    :rtype: bool
+    """
+
+    if fcntl is None:
+        return False
+
+    try:
+        fcntl.ioctl(out_fd, FICLONE, in_fd)
+    except (IOError, OSError) as e:
+        if e.errno not in _FALLBACK_ERRNOS:
+            raise
+        return False
+
+    return True
+
+
+def _kernel_copy(in_fd, out_fd, size):
+    """Copy size bytes between the current positions of two descriptors
+    without passing them through Python
+
+    :returns: the method used and the number of bytes copied, which is less
+        than size if no method could copy everything
+    :rtype: tuple(str, int)
+    """
+
+    for name, method in list(_kernel_copies):
+        copied = 0
+        try:
+            while copied < size:
+                count = method(in_fd, out_fd,
+                               min(size - copied, _MAX_KERNEL_COPY))
+                if not count:
+                    break
+                copied += count
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS:
+                raise
+            if e.errno == errno.ENOSYS:
+                _kernel_copies.remove((name, method))
+
+        if copied:
+            return name, copied
+
+    return None, 0
+
+
+def append_file(outfile, inpath, blocksize=1024 * 1024):
+    """Append the contents of the file at inpath to the open file outfile
+
+    The fastest method the platform and filesystem allow is used.  If outfile
+    is empty, the file is first cloned with a reflink, which copies no data at
+    all.  Otherwise the data is copied inside the kernel with copy_file_range
+    or sendfile.  If neither can be used, the data is copied through a Python
+    buffer of blocksize bytes.
+
+    :param outfile: a file opened for binary writing, positioned at its end
+    :type outfile: file
+
+    :param inpath: the path of the file to append
+    :type inpath: str
+
+    :param blocksize: the buffer size for a buffered copy
+    :type blocksize: int
+
+    :returns: the name of the method used
+    :rtype: str
+    """
+
+    outfile.flush()
+    out_fd = outfile.fileno()
+
+    with open(inpath, 'rb') as infile:
+        in_fd = infile.fileno()
+        size = os.fstat(in_fd).st_size
+
+        if os.lseek(out_fd, 0, os.SEEK_END) == 0 and size and \
+                _reflink(in_fd, out_fd):
+            method, copied = 'reflink', size
+        else:
+            method, copied = _kernel_copy(in_fd, out_fd, size)
+
+        outfile.seek(0, os.SEEK_END)
+
+        if copied < size:
+            infile.seek(copied)
+            shutil.copyfileobj(infile, outfile, blocksize)
+            method = 'buffered'
+
+    return method
+
+
+def write_file_at(outfile, offset, inpath, blocksize=1024 * 1024,
+                  limit=None):
+    """Write the contents of the file at inpath into the open file outfile,
+    starting at offset
+
+    Several threads may fill separate regions of one file at once, each
+    through its own open file.  The data is copied inside the kernel where
+    possible, as in append_file, but never cloned with a reflink.
+
+    :param outfile: a file opened for binary writing, not for appending
+    :type outfile: file
+
+    :param offset: the position in outfile of the first byte written
+    :type offset: int
+
+    :param inpath: the path of the file to write
+    :type inpath: str
+
+    :param blocksize: the buffer size for a buffered copy
+    :type blocksize: int
+
+    :param limit: the most bytes to write, such as the size of the region
+        of outfile set aside for the file, by default the whole file
+    :type limit: int, None
+
+    :returns: the name of the method used and the size of the file when it
+        was opened, which is more than was written if it exceeds limit
+    :rtype: tuple(str, int)
+    """
+
+    outfile.seek(offset)
+    out_fd = outfile.fileno()
+
+    with open(inpath, 'rb') as infile:
+        in_fd = infile.fileno()
+        size = os.fstat(in_fd).st_size
+        count = size if limit is None else min(size, limit)
+
+        # seeking a file opened for update may read ahead of offset
+        os.lseek(out_fd, offset, os.SEEK_SET)
+        method, copied = _kernel_copy(in_fd, out_fd, count)
+
+        outfile.seek(offset + copied)
+
+        if copied < count:
+            infile.seek(copied)
+            while copied < count:
+                data = infile.read(min(blocksize, count - copied))
+                if not data:
+                    break
+                outfile.write(data)
+                copied += len(data)
+            method = 'buffered'
+
+    return method, size
+
+
+def copy_range(outfile, path, start, end, blocksize=1024 * 1024):
+    """Write the bytes from start up to end of the file at path to outfile
+
+    A file whose name ends with .gz is decompressed, and start and end count
+    bytes of the decompressed data.
+
+    :param outfile: a file opened for binary writing
+    :type outfile: file
+
+    :param path: the file to copy from
+    :type path: str
+
+    :param start: the offset of the first byte copied
+    :type start: int
+
+    :param end: the offset after the last byte copied
+    :type end: int
+
+    :param blocksize: the size of each read
+    :type blocksize: int
+    """
+
+    if path.endswith('.gz'):
+        GzipReader(path, workers=1).copy_range(outfile, start, end)
+        return
+
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        remaining = end - start
+
+        while remaining > 0:
+            data = infile.read(min(blocksize, remaining))
+            if not data:
+                break
+            outfile.write(data)
+            remaining -= len(data)
+
+
+def link_file(src, dst):
+    """Make dst a copy of src that shares its data where possible
+
+    A hard link is tried first, then a reflink, and the data is only copied if
+    neither can be made, for instance across filesystems.  An existing dst is
+    replaced.
+
+    :param src: the path of the file to copy
+    :type src: str
+
+    :param dst: the path of the copy
+    :type dst: str
+
+    :returns: the name of the method used: 'hardlink', 'reflink' or 'copy'
+    :rtype: str
+    """
+
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError:
+        pass
+
+    with open(src, 'rb') as infile:
+        with open(dst, 'wb') as outfile:
+            if _reflink(infile.fileno(), outfile.fileno()):
+                return 'reflink'
+            shutil.copyfileobj(infile, outfile, 1024 * 1024)
+
+    return 'copy'
+
+
+class FifoFeeder(object):
+    """Stream the concatenation of several files, or byte ranges of files,
+    into a named pipe
+
+    The pipe is created by start, and a thread writes the files into it in
+    order once a reader opens it.  The pipe is removed as soon as it has been
+    opened, so a reader that tries to open it a second time, for example to
+    read its input twice, fails at once instead of waiting forever.
+    """
+
+    logger = logging.getLogger('rnaseqflow.FifoFeeder')
+    """log4j-style class logger"""
+
+    POLL_SECONDS = 0.05
+    """How often to check whether a reader has opened the pipe"""
+
+    def __init__(self, path, files, blocksize=1024 * 1024):
+        """Prepare to feed a pipe
+
+        :param path: the path of the named pipe to create
+        :type path: str
+
+        :param files: the files to write into the pipe, in order, each a
+            path or a (path, start, end) byte range
+        :type files: list(str, tuple(str, int, int))
+
+        :param blocksize: the size of each write
+        :type blocksize: int
+        """
+
+        self.path = path
+        self.files = files
+        self.blocksize = blocksize
+
+        self.complete = False
+        self.error = None
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._feed)
+        self._thread.daemon = True
+
+    def start(self):
+        """Create the pipe and wait in the background for a reader"""
+
+        if os.path.lexists(self.path):
+            os.remove(self.path)
+
+        os.mkfifo(self.path)
+        self._thread.start()
+
+    def stop(self):
+        """Stop waiting for a reader, and remove the pipe
+
+        Call this once the reader has exited, so that a write blocked on a
+        reader that is gone returns.
+        """
+
+        self._stopped.set()
+        self._thread.join()
+
+        if os.path.lexists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _open(self):
+        """Open the pipe for writing once a reader has opened it
+
+        :returns: the file descriptor, or None if stop was called first
+        :rtype: int, None
+        """
+
+        while not self._stopped.is_set():
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+                self._stopped.wait(self.POLL_SECONDS)
+                continue
+
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+
+            return fd
+
+        return None
+
+    def _feed(self):
+        """Write every file into the pipe, recording any error"""
+
+        try:
+            fd = self._open()
+            if fd is None:
+                return
+
+            os.remove(self.path)
+
+            with os.fdopen(fd, 'wb') as pipe:
+                for item in self.files:
+                    if isinstance(item, tuple):
+                        copy_range(pipe, *item, blocksize=self.blocksize)
+                        continue
+
+                    with open(item, 'rb') as infile:
+                        shutil.copyfileobj(infile, pipe, self.blocksize)
+
+            self.complete = True
+        except (IOError, OSError) as e:
+            self.error = e
+            self.logger.debug('Stopped feeding %s: %s', self.path, e)
+
+
+class FifoCompressor(object):
+    """Compress everything written into a named pipe into a BGZF file
+
+    The pipe is created by start, and a thread reads it once a writer opens
+    it, compressing blocks on several threads with gziputils.BgzfWriter.
+    A program given the pipe in place of its output file writes it
+    uncompressed, and the compressed file is written as it goes.
+    """
+
+    logger = logging.getLogger('rnaseqflow.FifoCompressor')
+    """log4j-style class logger"""
+
+    POLL_SECONDS = 0.05
+    """How often stop tries to release a thread still waiting for a writer"""
+
+    def __init__(self, path, outfile_path, workers=1,
+                 blocksize=1024 * 1024, executor=None):
+        """Prepare to compress a pipe
+
+        :param path: the path of the named pipe to create
+        :type path: str
+
+        :param outfile_path: the BGZF file to write
+        :type outfile_path: str
+
+        :param workers: the number of blocks to compress at once
+        :type workers: int
+
+        :param blocksize: the size of each read from the pipe
+        :type blocksize: int
+
+        :param executor: the threads to compress on, by default threads of
+            the BgzfWriter's own
+        :type executor: scheduler.Executor, None
+        """
+
+        self.path = path
+        self.outfile_path = outfile_path
+        self.workers = workers
+        self.blocksize = blocksize
+        self.executor = executor
+
+        self.complete = False
+        self.error = None
+
+        self._thread = threading.Thread(target=self._drain)
+        self._thread.daemon = True
+
+    def start(self):
+        """Create the pipe and wait in the background for a writer"""
+
+        if os.path.lexists(self.path):
+            os.remove(self.path)
+
+        os.mkfifo(self.path)
+        self._thread.start()
+
+    def stop(self):
+        """Wait for the compressed file to be finished, and remove the pipe
+
+        Call this once the writer has exited.  If it never opened the pipe,
+        the pipe is opened and closed here so the waiting thread returns.
+        """
+
+        while self._thread.is_alive():
+            try:
+                os.close(os.open(self.path, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError as e:
+                if e.errno not in (errno.ENXIO, errno.ENOENT):
+                    raise
+            self._thread.join(self.POLL_SECONDS)
+
+        if os.path.lexists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _drain(self):
+        """Compress everything read from the pipe, recording any error"""
+
+        try:
+            with open(self.path, 'rb') as pipe:
+                with BgzfWriter.open(self.outfile_path,
+                                     workers=self.workers,
+                                     executor=self.executor) as bgzf:
+                    for data in iter(lambda: pipe.read(self.blocksize), ''):
+                        bgzf.write(data)
+
+            self.complete = True
+        except (IOError, OSError) as e:
+            self.error = e
+            self.logger.debug('Stopped compressing %s: %s', self.path, e)
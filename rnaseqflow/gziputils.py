@@ -0,0 +1,1023 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import collections
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import tempfile
+import zlib
+
+from scheduler import Executor, ordered_map, available_cpus
+
+logger = logging.getLogger('rnaseqflow.gziputils')
+"""log4j-style module logger"""
+
+GZIP_MAGIC = '\x1f\x8b'
+"""The first two bytes of every gzip member"""
+
+FTEXT, FHCRC, FEXTRA, FNAME, FCOMMENT = 1, 2, 4, 8, 16
+
+BGZF_BLOCK_SIZE = 0xff00
+"""The most uncompressed bytes put in one BGZF block, as in htslib"""
+
+BGZF_EOF = ('\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00\x42\x43'
+            '\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00')
+"""The empty block that ends every BGZF file"""
+
+
+class _Stream(object):
+    """A file read in large blocks, with bytes that can be pushed back"""
+
+    def __init__(self, fileobj, blocksize):
+        self.fileobj = fileobj
+        self.blocksize = blocksize
+        self.buffer = ''
+
+    def read(self):
+        """Read the buffered bytes, or the next block if there are none"""
+
+        data, self.buffer = self.buffer, ''
+        return data or self.fileobj.read(self.blocksize)
+
+    def read_exact(self, size):
+        """Read exactly size bytes
+
+        :raises IOError: if the file ends first
+        """
+
+        while len(self.buffer) < size:
+            data = self.fileobj.read(self.blocksize)
+            if not data:
+                raise IOError('Unexpected end of gzip file')
+            self.buffer += data
+
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def unread(self, data):
+        """Push data back to be read again"""
+
+        self.buffer = data + self.buffer
+
+    def at_end(self):
+        """Check whether only zero padding is left, as some tools add"""
+
+        while True:
+            data = self.read()
+            if not data:
+                return True
+            if data.strip('\x00'):
+                self.unread(data.lstrip('\x00'))
+                return False
+
+
+def _read_header(read_exact):
+    """Read and check one gzip member header
+
+    :param read_exact: a function returning exactly the number of bytes asked
+        for, or raising IOError
+    :type read_exact: callable
+
+    :returns: the header's length and the BGZF block size (BSIZE + 1), or
+        None if the member is not a BGZF block
+    :rtype: tuple(int, int)
+
+    :raises IOError: if the header is not valid
+    """
+
+    fixed = read_exact(10)
+    magic, method, flags = fixed[:2], ord(fixed[2]), ord(fixed[3])
+
+    if magic != GZIP_MAGIC:
+        raise IOError('Not a gzipped file')
+    if method != 8:
+        raise IOError('Unknown compression method {0}'.format(method))
+    if flags & 0xe0:
+        raise IOError('Reserved gzip header flags are set')
+
+    header = fixed
+    block_size = None
+
+    if flags & FEXTRA:
+        xlen_bytes = read_exact(2)
+        extra = read_exact(struct.unpack('<H', xlen_bytes)[0])
+        header += xlen_bytes + extra
+
+        pos = 0
+        while pos + 4 <= len(extra):
+            subfield, length = extra[pos:pos + 2], \
+                struct.unpack('<H', extra[pos + 2:pos + 4])[0]
+            if subfield == 'BC' and length == 2:
+                block_size = struct.unpack(
+                    '<H', extra[pos + 4:pos + 6])[0] + 1
+            pos += 4 + length
+
+    for flag in (FNAME, FCOMMENT):
+        if flags & flag:
+            byte = None
+            while byte != '\x00':
+                byte = read_exact(1)
+                header += byte
+
+    if flags & FHCRC:
+        header_crc = struct.unpack('<H', read_exact(2))[0]
+        if zlib.crc32(header) & 0xffff != header_crc:
+            raise IOError('Incorrect gzip header CRC')
+        header += '\x00\x00'
+
+    return len(header), block_size
+
+
+def check_gzip(path):
+    """Check the structure of a gzip file without decompressing it
+
+    The header of the first member is checked.  If the file is block gzipped
+    (BGZF), the header and trailer of every block are checked by following
+    the block sizes, which also finds truncated files.  The CRC32 in a trailer
+    covers the uncompressed data, so it is only checked by verify_gzip.
+
+    :param path: the file to check
+    :type path: str
+
+    :returns: the number of BGZF blocks, or None if the file is not BGZF
+    :rtype: int, None
+
+    :raises IOError: if the file is not a valid gzip file
+    """
+
+    size = os.path.getsize(path)
+
+    with open(path, 'rb') as infile:
+        def read_exact(count):
+            data = infile.read(count)
+            if len(data) < count:
+                raise IOError('Unexpected end of gzip file')
+            return data
+
+        header_length, block_size = _read_header(read_exact)
+
+        if block_size is None:
+            if size < header_length + 2 + 8:
+                raise IOError('gzip file is too short to hold any data')
+            return None
+
+        blocks = 0
+        offset = 0
+        last_isize = None
+
+        while offset < size:
+            infile.seek(offset)
+            header_length, block_size = _read_header(read_exact)
+
+            if block_size is None:
+                raise IOError(
+                    'Member at byte {0} is not a BGZF block'.format(offset))
+            if offset + block_size > size:
+                raise IOError('Unexpected end of BGZF file')
+
+            infile.seek(offset + block_size - 4)
+            last_isize = struct.unpack('<I', read_exact(4))[0]
+            if last_isize > 0x10000:
+                raise IOError('BGZF block at byte {0} is too large'.format(
+                    offset))
+
+            offset += block_size
+            blocks += 1
+
+        if last_isize != 0:
+            logger.warning(
+                '{0} has no BGZF end-of-file block, it may have been '
+                'truncated'.format(path))
+
+        return blocks
+
+
+def verify_gzip(path, sink=None, blocksize=1024 * 1024):
+    """Decompress every member of a gzip file, checking its CRC32 and size
+
+    :param path: the file to check
+    :type path: str
+
+    :param sink: a function to call with each piece of decompressed data
+    :type sink: callable, None
+
+    :param blocksize: the number of compressed bytes to read at a time
+    :type blocksize: int
+
+    :returns: the number of members and the total decompressed size
+    :rtype: tuple(int, int)
+
+    :raises IOError: if the file is not a valid gzip file, is truncated, or
+        holds data that does not match its trailer
+    """
+
+    members = 0
+    total = 0
+
+    with open(path, 'rb') as infile:
+        stream = _Stream(infile, blocksize)
+
+        while not (members and stream.at_end()):
+            _read_header(stream.read_exact)
+
+            inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            crc = 0
+            size = 0
+
+            while not inflater.unused_data:
+                compressed = stream.read()
+                if not compressed:
+                    raise IOError('Unexpected end of gzip file')
+
+                try:
+                    data = inflater.decompress(compressed)
+                except zlib.error as e:
+                    raise IOError('Invalid compressed data: {0}'.format(e))
+
+                crc = zlib.crc32(data, crc)
+                size += len(data)
+                if sink is not None and data:
+                    sink(data)
+
+            stream.unread(inflater.unused_data)
+
+            expected_crc, expected_size = struct.unpack(
+                '<II', stream.read_exact(8))
+
+            if crc & 0xffffffff != expected_crc:
+                raise IOError('CRC check failed for member {0:d}'.format(
+                    members + 1))
+            if size & 0xffffffff != expected_size:
+                raise IOError('Size check failed for member {0:d}'.format(
+                    members + 1))
+
+            members += 1
+            total += size
+
+    return members, total
+
+
+class BgzfWriter(object):
+    """Write data to a file as block gzip (BGZF)
+
+    BGZF is a series of small gzip members, each recording its own length,
+    so a BGZF file is a valid gzip file that also allows random access and
+    parallel decompression.
+
+    Each block is compressed on its own, so with more than one worker the
+    blocks are compressed on the threads of a scheduler.Executor, zlib
+    releasing the GIL while it works, and written in order as they are done.
+    """
+
+    def __init__(self, fileobj, level=6, workers=1, executor=None):
+        """Start writing to fileobj
+
+        :param fileobj: a file opened for binary writing
+        :type fileobj: file
+
+        :param level: the zlib compression level
+        :type level: int
+
+        :param workers: the number of blocks to compress at once
+        :type workers: int
+
+        :param executor: the threads to compress on, by default threads of
+            the writer's own
+        :type executor: scheduler.Executor, None
+        """
+
+        self.fileobj = fileobj
+        self.level = level
+        self.workers = workers
+        self.blocks = 0
+
+        self._pending = []
+        self._pending_size = 0
+        self._owns_file = False
+
+        self._executor = None
+        self._owns_executor = False
+        if workers > 1:
+            self._executor = executor or Executor(workers)
+            self._owns_executor = executor is None
+        self._compressing = collections.deque()
+
+    @classmethod
+    def open(cls, path, level=6, workers=1, executor=None):
+        """Create the file at path and write it as BGZF
+
+        Closing the writer closes the file
+
+        :param path: the file to write
+        :type path: str
+
+        :rtype: BgzfWriter
+        """
+
+        writer = cls(open(path, 'wb'), level, workers, executor)
+        writer._owns_file = True
+
+        return writer
+
+    def write(self, data):
+        """Compress data, writing each block as it fills
+
+        :param data: the uncompressed data
+        :type data: str
+        """
+
+        self._pending.append(data)
+        self._pending_size += len(data)
+
+        if self._pending_size >= BGZF_BLOCK_SIZE:
+            data = ''.join(self._pending)
+            end = len(data) - len(data) % BGZF_BLOCK_SIZE
+
+            for start in xrange(0, end, BGZF_BLOCK_SIZE):
+                self._write_block(data[start:start + BGZF_BLOCK_SIZE])
+
+            self._pending = [data[end:]]
+            self._pending_size = len(data) - end
+
+    def close(self):
+        """Write the remaining data and the end-of-file block
+
+        The underlying file is not closed, unless it was opened by open
+        """
+
+        try:
+            if self._pending_size:
+                self._write_block(''.join(self._pending))
+
+            self._pending = []
+            self._pending_size = 0
+
+            while self._compressing:
+                self.fileobj.write(
+                    self._executor.next_result(self._compressing))
+
+            self.fileobj.write(BGZF_EOF)
+        finally:
+            self._stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._stop()
+
+    def _stop(self):
+        """Drop the blocks not yet compressed, stop the writer's own
+        threads, and close a file opened by open"""
+
+        Executor.cancel(self._compressing)
+        self._compressing.clear()
+
+        if self._owns_executor:
+            self._executor.close()
+        self._executor = None
+
+        if self._owns_file:
+            self.fileobj.close()
+
+    def _write_block(self, data):
+        """Compress data into one BGZF block and write it, or queue it to be
+        compressed on the executor"""
+
+        self.blocks += 1
+
+        if self._executor is None:
+            self.fileobj.write(self._compress(data))
+            return
+
+        self._compressing.append(self._executor.submit(self._compress, data))
+
+        # keep a few blocks queued for each thread, but no more
+        while len(self._compressing) > 2 * self.workers:
+            self.fileobj.write(
+                self._executor.next_result(self._compressing))
+
+    def _compress(self, data):
+        """Compress data into one BGZF block
+
+        :rtype: str
+        """
+
+        compressor = zlib.compressobj(
+            self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush()
+
+        header = struct.pack(
+            '<2sBBIBBHccHH', GZIP_MAGIC, 8, FEXTRA, 0, 0, 0xff, 6,
+            'B', 'C', 2, len(compressed) + 25)
+        trailer = struct.pack(
+            '<II', zlib.crc32(data) & 0xffffffff, len(data))
+
+        return header + compressed + trailer
+
+
+Z_OK, Z_STREAM_END, Z_NEED_DICT, Z_BUF_ERROR = 0, 1, 2, -5
+Z_NO_FLUSH, Z_BLOCK = 0, 5
+
+WINDOW_SIZE = 32768
+"""The largest distance a deflate stream refers back, and so the amount of
+output that must be known to start decompressing in the middle of one"""
+
+
+class _ZStream(ctypes.Structure):
+    """zlib's z_stream"""
+
+    _fields_ = [('next_in', ctypes.c_void_p),
+                ('avail_in', ctypes.c_uint),
+                ('total_in', ctypes.c_ulong),
+                ('next_out', ctypes.c_void_p),
+                ('avail_out', ctypes.c_uint),
+                ('total_out', ctypes.c_ulong),
+                ('msg', ctypes.c_char_p),
+                ('state', ctypes.c_void_p),
+                ('zalloc', ctypes.c_void_p),
+                ('zfree', ctypes.c_void_p),
+                ('opaque', ctypes.c_void_p),
+                ('data_type', ctypes.c_int),
+                ('adler', ctypes.c_ulong),
+                ('reserved', ctypes.c_ulong)]
+
+
+def _load_libz():
+    """Find the zlib functions that Python's zlib module does not expose
+
+    :returns: the library, or None if it cannot be loaded
+    :rtype: ctypes.CDLL, None
+    """
+
+    try:
+        libz = ctypes.CDLL(ctypes.util.find_library('z'))
+        stream = ctypes.POINTER(_ZStream)
+
+        libz.zlibVersion.restype = ctypes.c_char_p
+        libz.inflateInit2_.argtypes = [stream, ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_int]
+        libz.inflate.argtypes = [stream, ctypes.c_int]
+        libz.inflateEnd.argtypes = [stream]
+        libz.inflateReset.argtypes = [stream]
+        libz.inflateReset2.argtypes = [stream, ctypes.c_int]
+        libz.inflatePrime.argtypes = [stream, ctypes.c_int, ctypes.c_int]
+        libz.inflateSetDictionary.argtypes = [stream, ctypes.c_char_p,
+                                              ctypes.c_uint]
+    except (OSError, TypeError, AttributeError):
+        return None
+
+    return libz
+
+
+_libz = _load_libz()
+
+
+class _Inflater(object):
+    """A zlib inflate stream driven through ctypes, so that it can be started
+    in the middle of a deflate stream and runs without holding the GIL"""
+
+    def __init__(self, wbits):
+        if _libz is None:
+            raise OSError('zlib could not be loaded')
+
+        self.stream = _ZStream()
+        self._input = None
+
+        self._check(_libz.inflateInit2_(
+            ctypes.byref(self.stream), wbits, _libz.zlibVersion(),
+            ctypes.sizeof(_ZStream)))
+
+    def feed(self, data):
+        """Make data the next input"""
+
+        self._input = ctypes.create_string_buffer(data, len(data))
+        self.stream.next_in = ctypes.addressof(self._input)
+        self.stream.avail_in = len(data)
+
+    def unused(self):
+        """Get the input not yet consumed"""
+
+        if not self.stream.avail_in:
+            return ''
+        return ctypes.string_at(self.stream.next_in, self.stream.avail_in)
+
+    def inflate(self, flush):
+        """Decompress into the current output, returning zlib's status
+
+        :raises IOError: if the data is not valid
+        """
+
+        ret = _libz.inflate(ctypes.byref(self.stream), flush)
+
+        if ret == Z_NEED_DICT or (ret < 0 and ret != Z_BUF_ERROR):
+            raise IOError('Invalid compressed data: {0}'.format(
+                self.stream.msg or ret))
+
+        return ret
+
+    def close(self):
+        _libz.inflateEnd(ctypes.byref(self.stream))
+
+    @staticmethod
+    def _check(ret):
+        if ret != Z_OK:
+            raise IOError('zlib error {0}'.format(ret))
+
+
+def _next_member(inflater, infile, trailer):
+    """Move an inflater that has finished a gzip member onto the next one
+
+    :param inflater: the inflater, at the end of a member
+    :type inflater: _Inflater
+
+    :param infile: the gzip file, positioned after the inflater's input
+    :type infile: file
+
+    :param trailer: the number of trailer bytes still to skip
+    :type trailer: int
+
+    :returns: True if there is another member, False at the end of the file
+        or of the data before zero padding
+    :rtype: bool
+    """
+
+    rest = inflater.unused()
+    while len(rest) < trailer + 2:
+        data = infile.read(1024 * 1024)
+        if not data:
+            break
+        rest += data
+
+    rest = rest[trailer:]
+    if rest[:2] != GZIP_MAGIC:
+        return False
+
+    inflater.feed(rest)
+    return True
+
+
+Checkpoint = collections.namedtuple('Checkpoint',
+                                    ['out', 'offset', 'bits', 'window'])
+"""A place to start decompressing: the uncompressed offset, the compressed
+offset of the first whole byte, the number of bits of the byte before it
+still to be read, and the WINDOW_SIZE bytes of output before it"""
+
+
+class GzipIndex(object):
+    """Checkpoints from which a gzip file can be decompressed at random
+
+    Built by one pass over the file, in the manner of zlib's zran example,
+    with a checkpoint at the first deflate block boundary after every span
+    bytes of output.  Files of several members, such as BGZF, are supported.
+    The pass also checks each member's CRC.
+    """
+
+    logger = logging.getLogger('rnaseqflow.GzipIndex')
+    """log4j-style class logger"""
+
+    MAGIC = 'RNSQZIX1'
+    """The first bytes of a saved index"""
+
+    HEADER = struct.Struct('<8sQqQQ')
+    """The saved header: magic, file size, modification time in nanoseconds,
+    uncompressed size and checkpoint count"""
+
+    POINT = struct.Struct('<QQBI')
+    """A saved checkpoint: uncompressed offset, compressed offset, bits, and
+    the length of the compressed window that follows"""
+
+    def __init__(self, size, points):
+        """
+        :param size: the uncompressed size of the file
+        :type size: int
+
+        :param points: the checkpoints, in order
+        :type points: list(Checkpoint)
+        """
+
+        self.size = size
+        self.points = points
+
+    @classmethod
+    def build(cls, path, span):
+        """Decompress a gzip file once, recording checkpoints
+
+        :param path: the gzip file
+        :type path: str
+
+        :param span: the least uncompressed distance between checkpoints
+        :type span: int
+
+        :rtype: GzipIndex
+
+        :raises IOError: if the file is not valid gzip, or is truncated
+        :raises OSError: if zlib cannot be loaded
+        """
+
+        built = []
+        for _ in cls.scan(path, span, built.append):
+            pass
+
+        return built[0]
+
+    @classmethod
+    def scan(cls, path, span, done):
+        """Decompress a gzip file once, recording checkpoints, and yield the
+        data as it is decompressed
+
+        :param path: the gzip file
+        :type path: str
+
+        :param span: the least uncompressed distance between checkpoints
+        :type span: int
+
+        :param done: called with the GzipIndex once the whole file is read
+        :type done: callable
+
+        :returns: the decompressed data, in pieces of up to WINDOW_SIZE bytes
+        :rtype: generator(str)
+
+        :raises IOError: if the file is not valid gzip, or is truncated
+        :raises OSError: if zlib cannot be loaded
+        """
+
+        inflater = _Inflater(32 + zlib.MAX_WBITS)
+        stream = inflater.stream
+        window = ctypes.create_string_buffer(WINDOW_SIZE)
+        points = []
+        total_in = total_out = last = 0
+
+        try:
+            with open(path, 'rb') as infile:
+                while True:
+                    if not stream.avail_in:
+                        data = infile.read(1024 * 1024)
+                        if not data:
+                            raise IOError(
+                                '{0} is truncated'.format(path))
+                        inflater.feed(data)
+
+                    if not stream.avail_out:
+                        stream.next_out = ctypes.addressof(window)
+                        stream.avail_out = WINDOW_SIZE
+
+                    filled = WINDOW_SIZE - stream.avail_out
+                    total_in += stream.avail_in
+                    total_out += stream.avail_out
+                    ret = inflater.inflate(Z_BLOCK)
+                    total_in -= stream.avail_in
+                    total_out -= stream.avail_out
+
+                    if WINDOW_SIZE - stream.avail_out > filled:
+                        yield ctypes.string_at(
+                            ctypes.addressof(window) + filled,
+                            WINDOW_SIZE - stream.avail_out - filled)
+
+                    if ret == Z_STREAM_END:
+                        if not _next_member(inflater, infile, 0):
+                            break
+                        _libz.inflateReset(ctypes.byref(stream))
+                        continue
+
+                    # at the end of a block that is not the last one
+                    if stream.data_type & 128 and \
+                            not stream.data_type & 64 and \
+                            (not points or total_out - last > span):
+                        left = stream.avail_out
+                        points.append(Checkpoint(
+                            total_out, total_in, stream.data_type & 7,
+                            window.raw[WINDOW_SIZE - left:] +
+                            window.raw[:WINDOW_SIZE - left]))
+                        last = total_out
+        finally:
+            inflater.close()
+
+        cls.logger.debug('Indexed %s with %d checkpoints', path, len(points))
+
+        done(cls(total_out, points))
+
+    @classmethod
+    def load(cls, path, stat):
+        """Load a saved index, if it matches the file
+
+        :param path: the saved index
+        :type path: str
+
+        :param stat: the os.stat of the gzip file
+        :type stat: os.stat_result
+
+        :returns: the index, or None if it is missing or out of date
+        :rtype: GzipIndex, None
+        """
+
+        try:
+            with open(path, 'rb') as saved:
+                magic, size, mtime, total, count = cls.HEADER.unpack(
+                    saved.read(cls.HEADER.size))
+                if (magic, size, mtime) != (cls.MAGIC, stat.st_size,
+                                            int(stat.st_mtime * 1e9)):
+                    return None
+
+                points = []
+                for _ in xrange(count):
+                    out, offset, bits, length = cls.POINT.unpack(
+                        saved.read(cls.POINT.size))
+                    points.append(Checkpoint(out, offset, bits,
+                                             zlib.decompress(
+                                                 saved.read(length))))
+        except (IOError, struct.error, zlib.error):
+            return None
+
+        return cls(total, points)
+
+    def save(self, path, stat):
+        """Save the index, if its folder is writable
+
+        :param path: where to save the index
+        :type path: str
+
+        :param stat: the os.stat of the gzip file
+        :type stat: os.stat_result
+        """
+
+        folder = os.path.dirname(os.path.abspath(path))
+
+        try:
+            fd, tmp = tempfile.mkstemp(prefix='.zidx', dir=folder)
+        except (IOError, OSError) as e:
+            self.logger.debug('Not saving %s: %s', path, e)
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as saved:
+                saved.write(self.HEADER.pack(
+                    self.MAGIC, stat.st_size, int(stat.st_mtime * 1e9),
+                    self.size, len(self.points)))
+                for point in self.points:
+                    window = zlib.compress(point.window)
+                    saved.write(self.POINT.pack(point.out, point.offset,
+                                                point.bits, len(window)))
+                    saved.write(window)
+            os.rename(tmp, path)
+        except (IOError, OSError) as e:
+            self.logger.debug('Not saving %s: %s', path, e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class GzipReader(object):
+    """Read any byte range of a gzip file, decompressing pieces of it on
+    several threads at once
+
+    A GzipIndex is built by the first pass over the file and saved next to
+    it as path + INDEX_SUFFIX, then used again as long as the file's size
+    and modification time are unchanged.  The range between two checkpoints is
+    decompressed on its own, through zlib called by ctypes, which releases
+    the GIL, so the pieces of a range are decompressed in parallel.
+    """
+
+    INDEX_SUFFIX = '.zidx'
+    """Appended to the path of a gzip file to name its index"""
+
+    SPAN = 4 * 1024 ** 2
+    """The default uncompressed distance between checkpoints"""
+
+    def __init__(self, path, span=SPAN, workers=None, persist=True,
+                 executor=None):
+        """Load the saved index of a gzip file, if there is one
+
+        :param path: the gzip file
+        :type path: str
+
+        :param span: the uncompressed distance between checkpoints, used if
+            the index is built
+        :type span: int
+
+        :param workers: the number of pieces decompressed at once, by
+            default the number of threads of executor, or of CPUs
+        :type workers: int, None
+
+        :param persist: save the index next to the file, and load a saved
+            one
+        :type persist: bool
+
+        :param executor: the threads to decompress on, by default threads
+            started for each call of chunks
+        :type executor: scheduler.Executor, None
+
+        :raises IOError: if the file is not valid gzip
+        :raises OSError: if zlib cannot be loaded
+        """
+
+        self.path = path
+        self.span = span
+        self.persist = persist
+        self.executor = executor
+        self.workers = workers or (executor.threads if executor else
+                                   available_cpus())
+
+        self._stat = os.stat(path)
+        self.index = GzipIndex.load(path + self.INDEX_SUFFIX,
+                                    self._stat) if persist else None
+
+        if self.index is None:
+            with open(path, 'rb') as infile:
+                if infile.read(2) != GZIP_MAGIC:
+                    raise IOError('Not a gzipped file')
+            if _libz is None:
+                raise OSError('zlib could not be loaded')
+
+    @property
+    def size(self):
+        """The uncompressed size of the file, from the index, which is built
+        by a pass over the file if it has not been
+
+        :rtype: int
+        """
+
+        if self.index is None:
+            self._indexed(GzipIndex.build(self.path, self.span))
+
+        return self.index.size
+
+    def read(self, start=0, end=None):
+        """Decompress the bytes from start up to end
+
+        :rtype: str
+        """
+
+        return ''.join(self.chunks(start, end))
+
+    def chunks(self, start=0, end=None):
+        """Decompress the bytes from start up to end, in pieces that end at
+        checkpoints, several pieces at a time
+
+        Without an index, the file is instead decompressed in one pass from
+        its start, and the index is built and saved as the pass goes, so a
+        file read once is only decompressed once.
+
+        :param start: the uncompressed offset of the first byte
+        :type start: int
+
+        :param end: the uncompressed offset after the last byte, by default
+            the end of the file
+        :type end: int, None
+
+        :returns: the pieces, in order
+        :rtype: generator(str)
+        """
+
+        if self.index is None:
+            return self._scan(start, end)
+
+        end = self.size if end is None else min(end, self.size)
+        points = self.index.points
+
+        pieces = []
+        for i, point in enumerate(points):
+            stop = points[i + 1].out if i + 1 < len(points) else self.size
+            if stop > start and point.out < end:
+                pieces.append((point, max(start, point.out), min(end, stop)))
+
+        if self.executor is not None:
+            return self.executor.imap(self._inflate, pieces, self.workers)
+
+        return ordered_map(self._inflate, pieces, self.workers)
+
+    def copy_range(self, outfile, start, end):
+        """Write the decompressed bytes from start up to end to outfile
+
+        :param outfile: a file opened for binary writing
+        :type outfile: file
+        """
+
+        for piece in self.chunks(start, end):
+            outfile.write(piece)
+
+    def _scan(self, start, end):
+        """Decompress the bytes from start up to end in one pass from the
+        start of the file, in pieces of about span bytes, keeping the index
+        if the pass reaches the end of the file
+
+        :rtype: generator(str)
+        """
+
+        position = 0
+        parts = []
+        size = 0
+
+        for data in GzipIndex.scan(self.path, self.span, self._indexed):
+            first = max(0, start - position)
+            last = len(data) if end is None else min(len(data),
+                                                     end - position)
+            position += len(data)
+
+            if last > first:
+                parts.append(data[first:last])
+                size += last - first
+            if size >= self.span:
+                yield ''.join(parts)
+                parts = []
+                size = 0
+            if end is not None and position >= end:
+                break
+
+        if parts:
+            yield ''.join(parts)
+
+    def _indexed(self, index):
+        """Keep an index built by a pass over the file, and save it"""
+
+        self.index = index
+
+        if self.persist:
+            index.save(self.path + self.INDEX_SUFFIX, self._stat)
+
+    def _inflate(self, piece):
+        """Decompress the bytes from start up to end from one checkpoint
+
+        :param piece: the checkpoint, start and end
+        :type piece: tuple(Checkpoint, int, int)
+
+        :rtype: str
+        """
+
+        point, start, end = piece
+        inflater = _Inflater(-zlib.MAX_WBITS)
+        stream = inflater.stream
+        output = ctypes.create_string_buffer(256 * 1024)
+        position = point.out
+        pieces = []
+
+        # the checkpoint's member is inflated raw, so its trailer is skipped
+        # here; later members are inflated in gzip mode, which reads it
+        trailer = 8
+
+        try:
+            with open(self.path, 'rb') as infile:
+                infile.seek(point.offset - (1 if point.bits else 0))
+                if point.bits:
+                    _libz.inflatePrime(
+                        ctypes.byref(stream), point.bits,
+                        ord(infile.read(1)) >> (8 - point.bits))
+                _libz.inflateSetDictionary(ctypes.byref(stream),
+                                           point.window, WINDOW_SIZE)
+
+                while position < end:
+                    if not stream.avail_in:
+                        data = infile.read(1024 * 1024)
+                        if not data:
+                            raise IOError(
+                                '{0} is truncated'.format(self.path))
+                        inflater.feed(data)
+
+                    stream.next_out = ctypes.addressof(output)
+                    stream.avail_out = len(output)
+                    ret = inflater.inflate(Z_NO_FLUSH)
+
+                    produced = len(output) - stream.avail_out
+                    first = max(start, position) - position
+                    last = min(end, position + produced) - position
+                    if last > first:
+                        pieces.append(ctypes.string_at(
+                            ctypes.addressof(output) + first, last - first))
+                    position += produced
+
+                    if ret == Z_STREAM_END and position < end:
+                        if not _next_member(inflater, infile, trailer):
+                            raise IOError(
+                                '{0} ends {1:d} bytes before its index '
+                                'does'.format(self.path, end - position))
+                        _libz.inflateReset2(ctypes.byref(stream),
+                                            16 + zlib.MAX_WBITS)
+                        trailer = 0
+        finally:
+            inflater.close()
+
+        return ''.join(pieces)
@@ -0,0 +1,293 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import json
+import logging
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from fastqio import fastq_batches
+
+logger = logging.getLogger('rnaseqflow.qc')
+"""log4j-style module logger"""
+
+BASES = 'ACGTN'
+"""The bases counted at each position; any other letter counts as N"""
+
+if np is not None:
+    _BASE_INDEX = np.full(256, 4, np.uint8)
+    for _code, _base in enumerate('ACGT'):
+        _BASE_INDEX[ord(_base)] = _BASE_INDEX[ord(_base.lower())] = _code
+    _BASE_INDEX[0] = 5
+
+
+class QualityStats(object):
+    """Quality control statistics of a set of reads, added a batch at a time
+
+    For each position in a read, the sum of the qualities and the count of
+    each base are kept, and for the reads as a whole, a histogram of their
+    lengths and of their GC content in whole percent.  The number of reads
+    covering a position is the sum of its base counts.
+    """
+
+    def __init__(self, phred=33):
+        """Start with no reads
+
+        :param phred: the offset of the quality characters
+        :type phred: int
+        """
+
+        self.phred = phred
+        self.reads = 0
+        self.quality_sums = np.zeros(0, np.int64)
+        self.base_counts = np.zeros((0, len(BASES)), np.int64)
+        self.lengths = np.zeros(1, np.int64)
+        self.gc = np.zeros(101, np.int64)
+
+    def add(self, sequences, qualities, lengths):
+        """Add a batch of reads
+
+        :param sequences: the bases of each read, one row per read, padded
+            with zeros
+        :type sequences: numpy.ndarray(uint8)
+
+        :param qualities: the quality characters of each read, the same shape
+            as sequences and padded with zeros
+        :type qualities: numpy.ndarray(uint8)
+
+        :param lengths: the length of each read
+        :type lengths: numpy.ndarray(int)
+        """
+
+        if not len(lengths):
+            return
+
+        width = sequences.shape[1]
+        self._grow(width)
+
+        length_counts = np.bincount(lengths, minlength=width + 1)
+        covering = len(lengths) - np.cumsum(length_counts)[:width]
+
+        self.quality_sums[:width] += \
+            qualities.sum(0, dtype=np.int64) - self.phred * covering
+
+        codes = _BASE_INDEX[sequences]
+        found = [codes == i for i in range(len(BASES))]
+        for i, base in enumerate(found):
+            self.base_counts[:width, i] += base.sum(0)
+
+        gc = (found[1] | found[2]).sum(1)
+        percent = (200 * gc + lengths) // (2 * np.maximum(lengths, 1))
+        self.gc += np.bincount(percent, minlength=101)
+
+        self.lengths[:len(length_counts)] += length_counts
+        self.reads += len(lengths)
+
+    def add_trimmed(self, sequences, qualities, starts, stops, keep):
+        """Add the part of each read of a batch that a trim keeps
+
+        The statistics are those of the trimmed reads, as if they had been
+        written out and read back in.  See trimming.Trimmer.trim_batch
+
+        :param sequences: the bases of each read, one row per read, padded
+            with zeros
+        :type sequences: numpy.ndarray(uint8)
+
+        :param qualities: the quality characters of each read, the same shape
+            as sequences and padded with zeros
+        :type qualities: numpy.ndarray(uint8)
+
+        :param starts: the first base kept of each read
+        :type starts: numpy.ndarray(int)
+
+        :param stops: the end of the bases kept of each read
+        :type stops: numpy.ndarray(int)
+
+        :param keep: whether each read is kept at all
+        :type keep: numpy.ndarray(bool)
+        """
+
+        rows = np.flatnonzero(keep)
+        if not len(rows):
+            return
+
+        starts = starts[rows]
+        lengths = stops[rows] - starts
+        width = int(lengths.max())
+
+        inside = np.arange(width) < lengths[:, None]
+        cols = np.where(inside, starts[:, None] + np.arange(width), 0)
+        rows = rows[:, None]
+
+        self.add(np.where(inside, sequences[rows, cols], 0),
+                 np.where(inside, qualities[rows, cols], 0), lengths)
+
+    def update(self, other):
+        """Add the reads counted by another QualityStats
+
+        :param other: the statistics to add
+        :type other: QualityStats
+        """
+
+        self._grow(len(other.quality_sums))
+        width = len(other.quality_sums)
+
+        self.quality_sums[:width] += other.quality_sums
+        self.base_counts[:width] += other.base_counts
+        self.lengths[:len(other.lengths)] += other.lengths
+        self.gc += other.gc
+        self.reads += other.reads
+
+    def summary(self):
+        """Summarize the statistics
+
+        :returns: the read and base counts, the mean quality, the fraction
+            of each base and the N rate at each position, the mean GC
+            content and N rate, and the length and GC content histograms
+        :rtype: dict
+        """
+
+        covering = self.base_counts.sum(1)
+        bases = int(covering.sum())
+        divisor = np.maximum(covering, 1)
+        composition = self.base_counts / divisor[:, None].astype(float)
+
+        gc_bases = int(self.base_counts[:, 1:3].sum())
+        called = bases - int(self.base_counts[:, 4].sum())
+
+        return {
+            'reads': self.reads,
+            'bases': bases,
+            'mean_quality': _rounded(self.quality_sums / divisor.astype(
+                float)),
+            'composition': dict((base, _rounded(composition[:, i]))
+                                for i, base in enumerate(BASES)),
+            'n_rate': float(self.base_counts[:, 4].sum()) / max(bases, 1),
+            'gc_content': float(gc_bases) / max(called, 1),
+            'gc_histogram': self.gc.tolist(),
+            'length_histogram': dict(
+                (str(length), int(count))
+                for length, count in enumerate(self.lengths) if count),
+        }
+
+    def write(self, path, fmt='json'):
+        """Write the statistics to a file
+
+        :param path: the file to write
+        :type path: str
+
+        :param fmt: 'json' for the summary as compact JSON, or 'npz' for the
+            counts as compressed NumPy arrays
+        :type fmt: str
+        """
+
+        if fmt == 'npz':
+            with open(path, 'wb') as outfile:
+                np.savez_compressed(
+                    outfile, reads=self.reads, phred=self.phred,
+                    quality_sums=self.quality_sums,
+                    base_counts=self.base_counts, lengths=self.lengths,
+                    gc=self.gc)
+            return
+
+        with open(path, 'w') as outfile:
+            json.dump(self.summary(), outfile, separators=(',', ':'),
+                      sort_keys=True)
+
+    def _grow(self, width):
+        """Make room for reads of up to width bases"""
+
+        extra = width - len(self.quality_sums)
+
+        if extra > 0:
+            self.quality_sums = np.concatenate(
+                (self.quality_sums, np.zeros(extra, np.int64)))
+            self.base_counts = np.concatenate(
+                (self.base_counts, np.zeros((extra, len(BASES)), np.int64)))
+
+        extra = width + 1 - len(self.lengths)
+
+        if extra > 0:
+            self.lengths = np.concatenate(
+                (self.lengths, np.zeros(extra, np.int64)))
+
+
+def _rounded(values, digits=4):
+    """Convert an array to a list of rounded floats, to keep JSON compact"""
+
+    return [round(v, digits) for v in values.tolist()]
+
+
+def report_name(path, fmt='json'):
+    """Name the report of a file
+
+    :param path: the file checked
+    :type path: str
+
+    :param fmt: the format of the report, 'json' or 'npz'
+    :type fmt: str
+
+    :returns: the file name of the report, without a directory
+    :rtype: str
+    """
+
+    return '{0}.qc.{1}'.format(os.path.basename(path), fmt)
+
+
+def qc_file(path, phred=33, workers=None):
+    """Compute the quality control statistics of a FASTQ file
+
+    :param path: the FASTQ file, which may be gzipped
+    :type path: str
+
+    :param phred: the offset of the quality characters
+    :type phred: int
+
+    :param workers: the number of pieces of a gzip file decompressed at
+        once, by default the number of CPUs
+    :type workers: int, None
+
+    :rtype: QualityStats
+
+    :raises ValueError: if the file is not valid FASTQ
+    """
+
+    stats = QualityStats(phred)
+
+    for batch in fastq_batches(path, workers=workers):
+        stats.add(batch.sequences(), batch.qualities(), batch.lengths)
+
+    return stats
+
+
+def qc_job(path, outfile_path, fmt, workers=1):
+    """Write the statistics of a file and return their summary; a module
+    function, so that a process pool can run it"""
+
+    stats = qc_file(path, workers=workers)
+    stats.write(outfile_path, fmt)
+
+    return stats.summary()
@@ -0,0 +1,354 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from fileutils import file_size
+
+
+def _rusage(children=False):
+    """Get the resource usage of this process or of its finished children,
+    or None if the platform does not report it"""
+
+    if resource is None:
+        return None
+
+    return resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+
+
+def _used(name, pairs):
+    """Sum the increase in one field of resource usage over (after, before)
+    pairs of usages, where a missing usage counts as none"""
+
+    return sum(getattr(after, name) -
+               (getattr(before, name) if before is not None else 0)
+               for after, before in pairs if after is not None)
+
+
+def _rss_bytes(usage):
+    """Convert ru_maxrss to bytes; Linux reports kilobytes, OS X bytes"""
+
+    return usage.ru_maxrss if sys.platform == 'darwin' \
+        else usage.ru_maxrss * 1024
+
+
+def _total_size(items):
+    """Sum the sizes of the items that are paths of existing files"""
+
+    total = 0
+
+    for item in items:
+        if isinstance(item, basestring):
+            try:
+                total += file_size(item)
+            except OSError:
+                pass
+
+    return total
+
+
+class _Counter(object):
+    """Pass the items of an iterable through, keeping each one"""
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.items = []
+
+    def __iter__(self):
+        for item in self.iterable:
+            self.items.append(item)
+            yield item
+
+
+class RunReport(object):
+    """Measurements of the stages of a Workflow and their units of work
+
+    For each stage, the wall time, the number and total size of the files it
+    was given and produced, the CPU time of the workflow process and of its
+    child processes, and the blocks they read from and wrote to disk are
+    recorded.  For each unit of work, such as one merged file or one call to
+    fastq-mcf, the wall time, the bytes read and written and the exit status
+    are recorded, with the CPU time and peak memory of the child process that
+    did the work if there was one.
+
+    In a streaming Workflow, or one running several stages at once, the
+    stages overlap, so CPU and disk figures of a stage include work done by
+    other stages at the same time.
+    """
+
+    logger = logging.getLogger('rnaseqflow.RunReport')
+    """log4j-style class logger"""
+
+    def __init__(self):
+        """Start an empty report"""
+
+        self.stages = []
+        self.units = []
+
+        self._start = time.time()
+        self._lock = threading.Lock()
+
+    def begin(self, stage):
+        """Start measuring a stage
+
+        :param stage: the stage about to run
+        :type stage: WorkflowStage
+
+        :returns: the stage's entry, to be passed to finish
+        :rtype: dict
+        """
+
+        entry = {
+            'stage': type(stage).__name__,
+            'spec': stage.spec,
+            'units': 0,
+            'failed_units': 0,
+            'child_max_rss_mb': None,
+        }
+
+        entry['_start'] = time.time()
+        entry['_self'] = _rusage()
+        entry['_children'] = _rusage(children=True)
+        entry['_executor'] = getattr(stage, 'executor', None)
+        entry['_pooled'] = entry['_executor'].usage() \
+            if entry['_executor'] is not None else None
+
+        with self._lock:
+            self.stages.append(entry)
+
+        return entry
+
+    def finish(self, entry, stage_input, stage_output):
+        """Finish measuring a stage
+
+        :param entry: the entry returned by begin
+        :type entry: dict
+
+        :param stage_input: the input the stage was given
+        :type stage_input: iterable, None
+
+        :param stage_output: the output the stage produced
+        :type stage_output: iterable
+        """
+
+        stage_input = list(stage_input or [])
+        stage_output = list(stage_output or [])
+        seconds = time.time() - entry.pop('_start')
+
+        entry['seconds'] = seconds
+        entry['items_in'] = len(stage_input)
+        entry['items_out'] = len(stage_output)
+        entry['bytes_in'] = _total_size(stage_input)
+        entry['bytes_out'] = _total_size(stage_output)
+
+        size = entry['bytes_in'] or entry['bytes_out']
+        entry['mb_per_second'] = size / 1e6 / seconds if seconds else None
+
+        before_self = entry.pop('_self')
+        before_children = entry.pop('_children')
+        executor = entry.pop('_executor')
+        before_pooled = entry.pop('_pooled')
+
+        if before_self is not None:
+            after_self = _rusage()
+
+            # the executor's processes outlive the stage, so the calls they
+            # made are counted as well as the children that have exited
+            children = [(_rusage(children=True), before_children)]
+            if executor is not None:
+                children.append((executor.usage(), before_pooled))
+
+            entry['cpu_seconds'] = \
+                after_self.ru_utime - before_self.ru_utime + \
+                after_self.ru_stime - before_self.ru_stime
+            entry['child_cpu_seconds'] = \
+                _used('ru_utime', children) + _used('ru_stime', children)
+            entry['cores_used'] = \
+                (entry['cpu_seconds'] + entry['child_cpu_seconds']) / \
+                seconds if seconds else None
+            entry['blocks_read'] = \
+                after_self.ru_inblock - before_self.ru_inblock + \
+                _used('ru_inblock', children)
+            entry['blocks_written'] = \
+                after_self.ru_oublock - before_self.ru_oublock + \
+                _used('ru_oublock', children)
+
+    def stream(self, stage, stage_input):
+        """Run a stage with run_stream, measuring it until its output is
+        exhausted
+
+        The stage is entered in the report at once, so that stages appear in
+        Workflow order even though their generators start in reverse order
+
+        :param stage: the stage to run
+        :type stage: WorkflowStage
+
+        :param stage_input: the stage's input
+        :type stage_input: iterable, None
+
+        :returns: the stage's output
+        :rtype: generator
+        """
+
+        entry = self.begin(stage)
+        counted = _Counter(stage_input) if stage_input is not None else None
+
+        def measured():
+            entry['_start'] = time.time()
+            outputs = []
+
+            for result in stage.run_stream(counted):
+                outputs.append(result)
+                yield result
+
+            self.finish(entry, counted.items if counted else None, outputs)
+
+        return measured()
+
+    def unit(self, spec, inputs, outputs, status, seconds=None, usage=None):
+        """Record one unit of work
+
+        :param spec: the specifier of the stage that did the work
+        :type spec: str
+
+        :param inputs: the files the unit read
+        :type inputs: list(str)
+
+        :param outputs: the files the unit wrote
+        :type outputs: list(str)
+
+        :param status: the exit status of the unit, 0 for success
+        :type status: int
+
+        :param seconds: the wall time of the unit
+        :type seconds: float, None
+
+        :param usage: the resources used by the child process that did the
+            work, if there was one
+        :type usage: resource.struct_rusage, None
+        """
+
+        entry = {
+            'spec': spec,
+            'outputs': list(outputs),
+            'status': status,
+            'seconds': seconds,
+            'bytes_in': _total_size(inputs),
+            'bytes_out': sum(os.path.getsize(f) for f in outputs
+                             if os.path.isfile(f)),
+        }
+
+        if usage is not None:
+            entry['child_cpu_seconds'] = usage.ru_utime + usage.ru_stime
+            entry['child_max_rss_mb'] = _rss_bytes(usage) / 1e6
+            entry['blocks_read'] = usage.ru_inblock
+            entry['blocks_written'] = usage.ru_oublock
+
+        with self._lock:
+            self.units.append(entry)
+
+            for stage in reversed(self.stages):
+                if stage['spec'] == spec:
+                    stage['units'] += 1
+                    stage['failed_units'] += 1 if status else 0
+                    if usage is not None:
+                        stage['child_max_rss_mb'] = max(
+                            stage['child_max_rss_mb'],
+                            entry['child_max_rss_mb'])
+                    break
+
+    def to_dict(self):
+        """Collect the report in a form that can be written as JSON
+
+        :rtype: dict
+        """
+
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': time.time() - self._start,
+            'stages': self.stages,
+            'units': self.units,
+        }
+
+    def write(self, path):
+        """Write the report to a JSON file
+
+        :param path: the file to write
+        :type path: str
+        """
+
+        with open(path, 'w') as outfile:
+            json.dump(self.to_dict(), outfile, indent=2, sort_keys=True)
+            outfile.write('\n')
+
+        self.logger.info('Wrote a report of this run to {0}'.format(path))
+
+    def table(self):
+        """Summarize the stages as a table
+
+        :returns: the table, one line per stage
+        :rtype: str
+        """
+
+        columns = [('Stage', '{0:<24}'), ('Files in', '{0:>9}'),
+                   ('Files out', '{0:>10}'), ('Seconds', '{0:>9}'),
+                   ('MB in', '{0:>9}'), ('MB out', '{0:>9}'),
+                   ('MB/s', '{0:>8}'), ('CPU s', '{0:>8}'),
+                   ('Child CPU s', '{0:>12}'), ('Cores', '{0:>6}'),
+                   ('Units', '{0:>6}'), ('Failed', '{0:>7}')]
+
+        def number(value, digits=1):
+            return '-' if value is None else '{0:.{1}f}'.format(value, digits)
+
+        lines = [''.join(fmt.format(name) for name, fmt in columns)]
+
+        for entry in self.stages:
+            if 'seconds' not in entry:
+                continue
+
+            values = [
+                '{0} {1}'.format(entry['spec'], entry['stage']),
+                entry['items_in'], entry['items_out'],
+                number(entry['seconds'], 2),
+                number(entry['bytes_in'] / 1e6),
+                number(entry['bytes_out'] / 1e6),
+                number(entry['mb_per_second']),
+                number(entry.get('cpu_seconds'), 2),
+                number(entry.get('child_cpu_seconds'), 2),
+                number(entry.get('cores_used'), 2),
+                entry['units'], entry['failed_units']]
+
+            lines.append(''.join(fmt.format(value) for value, (_, fmt) in
+                                 zip(values, columns)))
+
+        return '\n'.join(lines)
@@ -0,0 +1,988 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import collections
+import errno
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import Queue
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger('rnaseqflow.scheduler')
+"""log4j-style module logger"""
+
+
+def available_cpus():
+    """Count the CPUs this process may run on
+
+    The CPU affinity of the process is used where the platform reports it,
+    so a job confined to some of a machine's cores by a batch scheduler or
+    taskset does not start a worker for every core.
+
+    :returns: the number of CPUs, at least 1
+    :rtype: int
+    """
+
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('Cpus_allowed_list:'):
+                    return max(1, _count_cpu_list(line.split(':')[1]))
+    except (IOError, ValueError):
+        pass
+
+    return multiprocessing.cpu_count()
+
+
+def _count_cpu_list(cpus):
+    """Count the CPUs in a Linux CPU list, like 0-3,8,10-11
+
+    :param cpus: the list
+    :type cpus: str
+
+    :returns: the number of CPUs listed
+    :rtype: int
+
+    :raises ValueError: if cpus is not a CPU list
+    """
+
+    count = 0
+
+    for span in cpus.strip().split(','):
+        first, _, last = span.partition('-')
+        count += int(last or first) - int(first) + 1
+
+    return count
+
+
+def parallel_map(func, items, workers):
+    """Apply func to every item, running up to workers calls at once
+
+    Work is done in a pool of threads, which suits calls that spend their time
+    waiting on the disk or on a child process.  With one worker (or fewer) the
+    calls are made in order in the calling thread and no pool is created.
+
+    :param func: a function of one argument
+    :type func: callable
+
+    :param items: the arguments to call func with
+    :type items: iterable
+
+    :param workers: the maximum number of calls to run at once
+    :type workers: int
+
+    :returns: the results of func, in the order the calls finish
+    :rtype: generator
+    """
+
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    executor = Executor(workers)
+    try:
+        for result in executor.map(func, items, workers):
+            yield result
+    finally:
+        executor.close()
+
+
+def ordered_map(func, items, workers):
+    """Apply func to every item, running up to workers calls at once, and
+    yield the results in the order of items
+
+    No more than twice workers calls are run ahead of the consumer, so a
+    slow consumer does not let the results pile up in memory.  With one
+    worker (or fewer) the calls are made in order in the calling thread.
+
+    :param func: a function of one argument
+    :type func: callable
+
+    :param items: the arguments to call func with
+    :type items: iterable
+
+    :param workers: the maximum number of calls to run at once
+    :type workers: int
+
+    :returns: the results of func, in the order of items
+    :rtype: generator
+    """
+
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    executor = Executor(workers)
+    try:
+        for result in executor.imap(func, items, workers):
+            yield result
+    finally:
+        executor.close()
+
+
+def largest_first(items, sizes):
+    """Order items by descending size
+
+    Starting the largest jobs first (longest-processing-time-first
+    scheduling) keeps one large job from starting last and running alone
+    after every other worker has finished.
+
+    :param items: the items to be ordered
+    :type items: list
+
+    :param sizes: the size of each item, in the same order as items
+    :type sizes: list(int)
+
+    :returns: the items and their sizes, both ordered largest first
+    :rtype: tuple(list, list(int))
+    """
+
+    order = sorted(range(len(items)), key=lambda i: sizes[i], reverse=True)
+
+    return [items[i] for i in order], [sizes[i] for i in order]
+
+
+def predict_makespan(sizes, workers):
+    """Predict the total work done by the busiest of several workers
+
+    Jobs are handed out in order, each to the least loaded worker, the way a
+    pool of workers takes jobs from a queue.
+
+    :param sizes: the size of each job, in the order the jobs are started
+    :type sizes: list(int)
+
+    :param workers: the number of workers
+    :type workers: int
+
+    :returns: the sum of the sizes of the jobs given to the busiest worker
+    :rtype: int
+    """
+
+    loads = [0] * max(1, min(workers, len(sizes)))
+
+    for size in sizes:
+        heapq.heapreplace(loads, loads[0] + size)
+
+    return max(loads)
+
+
+def combine_usage(usages):
+    """Add up the resources used by several processes
+
+    :param usages: the resource usage of each process
+    :type usages: list(resource.struct_rusage)
+
+    :returns: the totals, with the largest of the maximum resident set sizes,
+        or None if usages is empty
+    :rtype: resource.struct_rusage, None
+    """
+
+    if not usages or resource is None:
+        return None
+
+    totals = [max(values) if name == 'ru_maxrss' else sum(values)
+              for name, values in zip(_RUSAGE_FIELDS, zip(*usages))]
+
+    return resource.struct_rusage(totals)
+
+
+_RUSAGE_FIELDS = ('ru_utime', 'ru_stime', 'ru_maxrss', 'ru_ixrss',
+                  'ru_idrss', 'ru_isrss', 'ru_minflt', 'ru_majflt',
+                  'ru_nswap', 'ru_inblock', 'ru_oublock', 'ru_msgsnd',
+                  'ru_msgrcv', 'ru_nsignals', 'ru_nvcsw', 'ru_nivcsw')
+
+
+def _measured(func, args):
+    """Call func in a pooled process, measuring the resources the call used
+
+    :returns: the result of func, and the increase in the process's resource
+        usage, with its maximum resident set size, or None
+    :rtype: tuple(object, resource.struct_rusage)
+    """
+
+    before = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+    result = func(*args)
+
+    if before is None:
+        return result, None
+
+    after = resource.getrusage(resource.RUSAGE_SELF)
+
+    return result, resource.struct_rusage(
+        [getattr(after, name) if name == 'ru_maxrss'
+         else getattr(after, name) - getattr(before, name)
+         for name in _RUSAGE_FIELDS])
+
+
+class _Task(object):
+    """One call of a function, run by whichever thread claims it first"""
+
+    __slots__ = ('func', 'item', 'done', 'finished', 'result', 'exc_info',
+                 '_claimed')
+
+    _claim_lock = threading.Lock()
+
+    def __init__(self, func, item, done=None):
+        self.func = func
+        self.item = item
+        self.done = done
+        self.finished = threading.Event()
+        self.result = None
+        self.exc_info = None
+        self._claimed = False
+
+    @property
+    def claimed(self):
+        """True once a thread has taken the task"""
+
+        return self._claimed
+
+    def claim(self):
+        """Take the task to run it
+
+        :returns: False if another thread has already taken it
+        :rtype: bool
+        """
+
+        with self._claim_lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+    def execute(self):
+        """Call the function, keeping its result or exception"""
+
+        try:
+            self.result = self.func(self.item)
+        except Exception:
+            self.exc_info = sys.exc_info()
+        finally:
+            self.finished.set()
+            if self.done is not None:
+                self.done.put(self)
+
+    def get(self):
+        """Get the result of the call
+
+        :returns: the function's result
+
+        :raises: the function's exception, if it raised one
+        """
+
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.result
+
+
+class Executor(object):
+    """A pool of threads and a pool of processes, kept for a whole run
+
+    Threads suit calls that wait on the disk or on a child process, and
+    processes suit calls that need a core of their own.  Each pool is started
+    when it is first used and kept until close, so later work does not pay
+    to start it again, and its size holds for the whole run however many
+    stages are at work at once.  A thread pool that is started and stopped
+    for every call of map also spends a tenth of a second stopping.
+
+    map may be called from inside a call that map is running.  A caller
+    waiting for its results runs its own calls that no thread has taken yet,
+    so nested calls finish even when every thread is busy.
+    """
+
+    logger = logging.getLogger('rnaseqflow.Executor')
+    """log4j-style class logger"""
+
+    def __init__(self, threads=None, processes=None):
+        """Prepare the pools, without starting them
+
+        :param threads: the number of threads, by default the number of CPUs
+            this process may run on
+        :type threads: int, None
+
+        :param processes: the number of processes, by default the number of
+            CPUs this process may run on
+        :type processes: int, None
+        """
+
+        self.threads = threads or available_cpus()
+        self.processes = processes or available_cpus()
+
+        self._tasks = Queue.Queue()
+        self._workers = []
+        self._pool = None
+        self._usage = None
+        self._lock = threading.Lock()
+
+    def map(self, func, items, workers):
+        """Apply func to every item in the threads, running up to workers
+        calls at once
+
+        :param func: a function of one argument
+        :type func: callable
+
+        :param items: the arguments to call func with
+        :type items: iterable
+
+        :param workers: the maximum number of calls to run at once; with one
+            (or fewer) the calls are made in order in the calling thread
+        :type workers: int
+
+        :returns: the results of func, in the order the calls finish
+        :rtype: generator
+        """
+
+        if workers is None or workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+
+        done = Queue.Queue()
+        pending = collections.deque()
+        items = iter(items)
+        running = 0
+
+        try:
+            while True:
+                for item in itertools.islice(items, workers - running):
+                    pending.append(self._submit(func, item, done))
+                    running += 1
+
+                if not running:
+                    return
+
+                while pending and pending[0].claimed:
+                    pending.popleft()
+
+                if done.empty():
+                    self._help(pending)
+
+                task = done.get()
+                running -= 1
+                yield task.get()
+        finally:
+            self.cancel(pending)
+
+    def imap(self, func, items, workers):
+        """Apply func to every item in the threads, running up to workers
+        calls at once, and yield the results in the order of items
+
+        No more than twice workers calls are run ahead of the consumer, so a
+        slow consumer does not let the results pile up in memory.
+
+        :param func: a function of one argument
+        :type func: callable
+
+        :param items: the arguments to call func with
+        :type items: iterable
+
+        :param workers: the maximum number of calls to run at once; with one
+            (or fewer) the calls are made in order in the calling thread
+        :type workers: int
+
+        :returns: the results of func, in the order of items
+        :rtype: generator
+        """
+
+        if workers is None or workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+
+        pending = collections.deque()
+
+        try:
+            for item in items:
+                pending.append(self._submit(func, item))
+                if len(pending) > 2 * workers:
+                    yield self._wait(pending)
+
+            while pending:
+                yield self._wait(pending)
+        finally:
+            self.cancel(pending)
+
+    def submit(self, func, item):
+        """Queue one call of func for the threads
+
+        The results of submitted calls are collected with next_result, in
+        the order the calls were submitted.
+
+        :param func: a function of one argument
+        :type func: callable
+
+        :param item: the argument to call func with
+
+        :returns: the queued call
+        :rtype: _Task
+        """
+
+        return self._submit(func, item)
+
+    def next_result(self, pending):
+        """Wait for the first of pending calls made with submit and remove
+        it, running it or the calls after it in this thread if no thread has
+        taken them
+
+        :param pending: the calls, in the order their results are wanted
+        :type pending: collections.deque(_Task)
+
+        :returns: the result of the first call
+
+        :raises: the call's exception, if it raised one
+        """
+
+        return self._wait(pending)
+
+    def apply(self, func, args=()):
+        """Call func in the process pool and wait for its result
+
+        The resources the call used are added to those returned by usage
+
+        :param func: a function that can be pickled
+        :type func: callable
+
+        :param args: the arguments to call func with
+        :type args: tuple
+
+        :returns: the result of func
+        """
+
+        result, usage = self.process_pool().apply(_measured, (func, args))
+
+        if usage is not None:
+            with self._lock:
+                self._usage = combine_usage(
+                    [u for u in (self._usage, usage) if u is not None])
+
+        return result
+
+    def usage(self):
+        """Get the resources used by the calls made through apply so far
+
+        The processes are only counted among the finished children of this
+        process once they have exited, at close.
+
+        :returns: the totals, with the largest of the maximum resident set
+            sizes, or None if no call has finished or the platform does not
+            report them
+        :rtype: resource.struct_rusage, None
+        """
+
+        with self._lock:
+            return self._usage
+
+    def process_pool(self):
+        """Get the pool of processes, starting it if it has not been
+
+        The processes are forked from the calling process, so start the pool
+        before other threads run: a lock one of them holds at the fork stays
+        held in every child.
+
+        :returns: the pool
+        :rtype: multiprocessing.pool.Pool
+        """
+
+        with self._lock:
+            if self._pool is None:
+                self.logger.debug('Starting %d processes', self.processes)
+                self._pool = multiprocessing.Pool(self.processes)
+            return self._pool
+
+    def close(self):
+        """Stop the threads and processes once the calls they are making
+        have finished"""
+
+        with self._lock:
+            workers, self._workers = self._workers, []
+            pool, self._pool = self._pool, None
+
+        for _ in workers:
+            self._tasks.put(None)
+        for thread in workers:
+            thread.join()
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def _submit(self, func, item, done=None):
+        """Queue one call for the threads, starting them if they have not
+        been
+
+        :returns: the queued call
+        :rtype: _Task
+        """
+
+        with self._lock:
+            if not self._workers:
+                self.logger.debug('Starting %d threads', self.threads)
+                for _ in range(self.threads):
+                    thread = threading.Thread(target=self._work)
+                    thread.daemon = True
+                    thread.start()
+                    self._workers.append(thread)
+
+        task = _Task(func, item, done)
+        self._tasks.put(task)
+
+        return task
+
+    def _work(self):
+        """Run queued calls until close"""
+
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            if task.claim():
+                task.execute()
+
+    def _wait(self, pending):
+        """Wait for the first of pending to finish, running it or the calls
+        after it in this thread if no thread has taken them
+
+        :param pending: calls, in the order their results are wanted
+        :type pending: collections.deque(_Task)
+
+        :returns: the result of the first call
+        """
+
+        task = pending.popleft()
+
+        if task.claim():
+            task.execute()
+
+        while not task.finished.is_set():
+            later = next((t for t in pending if t.claim()), None)
+            if later is None:
+                task.finished.wait()
+            else:
+                later.execute()
+
+        return task.get()
+
+    @staticmethod
+    def _help(pending):
+        """Run one of pending in this thread, if no thread has taken it
+
+        :param pending: calls made by this thread; calls that have been
+            taken are removed
+        :type pending: collections.deque(_Task)
+        """
+
+        while pending:
+            task = pending.popleft()
+            if task.claim():
+                task.execute()
+                return
+
+    @staticmethod
+    def cancel(pending):
+        """Keep the threads from running calls whose results are no longer
+        wanted
+
+        :param pending: the calls
+        :type pending: iterable(_Task)
+        """
+
+        for task in pending:
+            task.claim()
+
+
+class MakespanTimer(object):
+    """Time a set of jobs and compare the elapsed time with a prediction
+
+    The prediction converts predict_makespan's result from bytes to seconds
+    using the average time per byte of the jobs that were run.
+    """
+
+    def __init__(self, sizes, workers, unordered_sizes=None):
+        """Start the timer
+
+        :param sizes: the size of each job, in the order the jobs are started
+        :type sizes: list(int)
+
+        :param workers: the number of jobs run at once
+        :type workers: int
+
+        :param unordered_sizes: the sizes in the order the jobs were found, to
+            show the makespan that order would have given
+        :type unordered_sizes: list(int), None
+        """
+
+        self.sizes = sizes
+        self.workers = workers or 1
+        self.unordered_sizes = unordered_sizes
+        self.busy = 0.0
+
+        self._lock = threading.Lock()
+        self._start = time.time()
+
+    def timed(self, func):
+        """Wrap func so that the time spent in each call is recorded
+
+        :param func: a function of one argument
+        :type func: callable
+
+        :returns: the wrapped function
+        :rtype: callable
+        """
+
+        def wrapper(job):
+            start = time.time()
+            try:
+                return func(job)
+            finally:
+                with self._lock:
+                    self.busy += time.time() - start
+
+        return wrapper
+
+    def log(self, log):
+        """Log the predicted and the actual makespan
+
+        :param log: the logger to write to
+        :type log: logging.Logger
+        """
+
+        elapsed = time.time() - self._start
+        total = sum(self.sizes)
+
+        if not total:
+            return
+
+        rate = self.busy / total
+        predicted = predict_makespan(self.sizes, self.workers) * rate
+
+        message = ('Predicted makespan {0:.1f}s for {1:d} jobs on {2:d} '
+                   'workers, actual {3:.1f}s'.format(
+                       predicted, len(self.sizes), self.workers, elapsed))
+
+        if self.unordered_sizes is not None:
+            message += ' (discovery order would predict {0:.1f}s)'.format(
+                predict_makespan(self.unordered_sizes, self.workers) * rate)
+
+        log.info(message)
+
+
+class DiskSpaceGate(object):
+    """Hold back jobs until the filesystem they write to has room for their
+    outputs
+
+    A job is admitted when the free space on its filesystem covers its
+    estimated output, the space the running jobs there have yet to write,
+    and a reserve kept free.  A running job's share shrinks as its outputs
+    grow, so the space is not counted twice.  Free space is checked again
+    whenever a job finishes, and every POLL_SECONDS while jobs wait, since
+    files may be deleted meanwhile.  If no admitted job is running on the
+    filesystem, waiting cannot help, and the job is started with a warning.
+    """
+
+    logger = logging.getLogger('rnaseqflow.DiskSpaceGate')
+    """log4j-style class logger"""
+
+    POLL_SECONDS = 5.0
+    """How often waiting jobs check the free space again"""
+
+    def __init__(self, reserve=0):
+        """Prepare a gate with no jobs running
+
+        :param reserve: the number of bytes to keep free on each filesystem
+        :type reserve: int
+        """
+
+        self.reserve = reserve
+
+        self._running = []
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def free_bytes(path):
+        """Get the space available to this user on the filesystem of path
+
+        :param path: an existing file or directory
+        :type path: str
+
+        :returns: the number of bytes, or None if the platform cannot tell
+        :rtype: int, None
+        """
+
+        if not hasattr(os, 'statvfs'):
+            return None
+
+        stat = os.statvfs(path)
+
+        return stat.f_bavail * stat.f_frsize
+
+    def admit(self, outputs, size):
+        """Wait until there is room to write size bytes of outputs
+
+        :param outputs: the files the job will write, in existing folders
+        :type outputs: list(str)
+
+        :param size: the estimated size of the outputs in bytes
+        :type size: int
+
+        :returns: the job's reservation, to be released when the job has
+            finished; it is a context manager that releases itself
+        :rtype: DiskSpaceReservation
+        """
+
+        folder = os.path.dirname(os.path.abspath(outputs[0]))
+        device = os.stat(folder).st_dev
+        reservation = DiskSpaceReservation(self, device, outputs, size)
+        waited = False
+
+        with self._condition:
+            while True:
+                free = self.free_bytes(folder)
+                running = [r for r in self._running if r.device == device]
+                needed = size + self.reserve + sum(
+                    r.remaining() for r in running)
+
+                if free is None or free >= needed:
+                    break
+
+                if not running:
+                    self.logger.warning(
+                        'Starting a job that needs {0:.1f} MB with {1:.1f} '
+                        'MB free in {2}; it may run out of space'.format(
+                            needed / 1e6, free / 1e6, folder))
+                    break
+
+                if not waited:
+                    self.logger.info(
+                        'Waiting for space in {0}: {1:.1f} MB needed, '
+                        '{2:.1f} MB free'.format(folder, needed / 1e6,
+                                                 free / 1e6))
+                    waited = True
+
+                self._condition.wait(self.POLL_SECONDS)
+
+            self._running.append(reservation)
+
+        return reservation
+
+    def release(self, reservation):
+        """Forget a finished job, letting waiting jobs check the space again
+
+        :param reservation: the job's reservation, from admit
+        :type reservation: DiskSpaceReservation
+        """
+
+        with self._condition:
+            if reservation in self._running:
+                self._running.remove(reservation)
+            self._condition.notify_all()
+
+
+class DiskSpaceReservation(object):
+    """The space a running job admitted by a DiskSpaceGate has yet to write"""
+
+    def __init__(self, gate, device, outputs, size):
+        self.gate = gate
+        self.device = device
+        self.outputs = outputs
+        self.size = size
+
+    def remaining(self):
+        """Estimate the bytes the job has yet to write
+
+        :returns: the estimated size less the current size of the outputs
+        :rtype: int
+        """
+
+        written = 0
+        for path in self.outputs:
+            try:
+                written += os.path.getsize(path)
+            except OSError:
+                pass
+
+        return max(0, self.size - written)
+
+    def release(self):
+        """Release the reservation"""
+
+        self.gate.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class JobScheduler(object):
+    """Run external commands several at a time
+
+    Each command's output is collected while it runs and written to the
+    console in one piece when it finishes, so the output of concurrent
+    commands is never interleaved.  Exit codes are collected and non-zero
+    ones are logged.
+    """
+
+    logger = logging.getLogger('rnaseqflow.JobScheduler')
+    """log4j-style class logger"""
+
+    def __init__(self, jobs=None, quiet=False):
+        """Prepare a scheduler
+
+        :param jobs: the maximum number of commands to run at once, by
+            default the number of CPUs
+        :type jobs: int, None
+
+        :param quiet: discard the output of the commands
+        :type quiet: bool
+        """
+
+        self.jobs = jobs or available_cpus()
+        self.quiet = quiet
+        self.exit_codes = []
+
+        self._output_lock = threading.Lock()
+        self._local = threading.local()
+
+    def map(self, func, jobs):
+        """Apply func to each job, running up to self.jobs calls at once
+
+        :param func: a function of one argument, usually one that ends up
+            calling self.call
+        :type func: callable
+
+        :param jobs: the arguments to call func with
+        :type jobs: iterable
+
+        :returns: the results of func, in the order the calls finish
+        :rtype: generator
+        """
+
+        return parallel_map(func, jobs, self.jobs)
+
+    def call(self, cmd):
+        """Run a command and wait for it to finish
+
+        The resources used by the command are kept for last_usage
+
+        :param cmd: the command and its arguments
+        :type cmd: list(str)
+
+        :returns: the command's exit code
+        :rtype: int
+        """
+
+        output = None
+
+        if self.quiet:
+            with open(os.devnull, 'w') as nullfile:
+                proc = subprocess.Popen(cmd, stdout=nullfile, stderr=nullfile)
+                returncode, usage = self._wait(proc)
+        elif self.jobs <= 1:
+            proc = subprocess.Popen(cmd)
+            returncode, usage = self._wait(proc)
+        else:
+            proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            output = proc.stdout.read()
+            proc.stdout.close()
+            returncode, usage = self._wait(proc)
+
+        if output is not None:
+            with self._output_lock:
+                sys.stdout.write(output)
+                sys.stdout.flush()
+
+        self._local.usage = usage
+        self.exit_codes.append(returncode)
+
+        if returncode:
+            self.logger.warning(
+                '{0} exited with status {1}: {2}'.format(
+                    cmd[0], returncode, ' '.join(cmd)))
+
+        return returncode
+
+    def last_usage(self):
+        """Get the resources used by the last command this thread ran
+
+        :returns: the command's resource usage, or None if the platform does
+            not report it
+        :rtype: resource.struct_rusage, None
+        """
+
+        return getattr(self._local, 'usage', None)
+
+    @staticmethod
+    def _wait(proc):
+        """Wait for a process to exit, collecting its resource usage
+
+        :param proc: the process
+        :type proc: subprocess.Popen
+
+        :returns: the exit code, negative if the process was killed by a
+            signal, and the resource usage or None
+        :rtype: tuple(int, resource.struct_rusage)
+        """
+
+        if not hasattr(os, 'wait4'):
+            return proc.wait(), None
+
+        while True:
+            try:
+                _, status, usage = os.wait4(proc.pid, 0)
+                break
+            except OSError as e:
+                if e.errno != errno.EINTR:
+                    raise
+
+        if os.WIFSIGNALED(status):
+            proc.returncode = -os.WTERMSIG(status)
+        else:
+            proc.returncode = os.WEXITSTATUS(status)
+
+        return proc.returncode, usage
+
+    def failures(self):
+        """Count the commands that have exited with a non-zero status
+
+        :returns: the number of failed commands
+        :rtype: int
+        """
+
+        return sum(1 for code in self.exit_codes if code)
@@ -0,0 +1,463 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+
+import gzip
+import itertools
+import logging
+import shlex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from fastqio import fastq_batches
+from gziputils import BgzfWriter
+from qc import QualityStats
+
+logger = logging.getLogger('rnaseqflow.trimming')
+"""log4j-style module logger"""
+
+VERSION = '3'
+"""Changed whenever the trimmed output of the same input would change"""
+
+if np is not None:
+    _BASE_CODES = np.full(256, -1, np.int64)
+    for _code, _base in enumerate('ACGT'):
+        _BASE_CODES[ord(_base)] = _code
+
+
+def read_adapters(path):
+    """Read the sequences from a FASTA file
+
+    :param path: the FASTA file
+    :type path: str
+
+    :returns: the sequences, upper case
+    :rtype: list(str)
+    """
+
+    sequences = []
+    current = []
+
+    with open(path) as fasta:
+        for line in fasta:
+            line = line.strip()
+            if line.startswith('>'):
+                if current:
+                    sequences.append(''.join(current).upper())
+                current = []
+            elif line:
+                current.append(line)
+
+    if current:
+        sequences.append(''.join(current).upper())
+
+    return sequences
+
+
+def _open(path, mode, workers=1):
+    """Open a file, through gzip if its name ends with .gz
+
+    A .gz file opened for writing is written as BGZF, compressing up to
+    workers blocks at once
+    """
+
+    if path.endswith('.gz'):
+        if 'w' in mode:
+            return BgzfWriter.open(path, workers=workers)
+        return gzip.open(path, mode)
+
+    return open(path, mode)
+
+
+def _encode(strings):
+    """Pack strings into the rows of a zero-padded array of bytes
+
+    :param strings: the strings to pack
+    :type strings: list(str)
+
+    :returns: the array, one row per string, and the length of each string
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+
+    lengths = np.fromiter((len(s) for s in strings), np.intp, len(strings))
+    width = int(lengths.max()) if len(strings) else 0
+    flat = np.frombuffer(''.join(strings), np.uint8)
+
+    if len(strings) and (lengths == width).all():
+        return flat.reshape(len(strings), width).copy(), lengths
+
+    packed = np.zeros((len(strings), width), np.uint8)
+    rows = np.repeat(np.arange(len(strings)), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    packed[rows, np.arange(len(flat)) - starts] = flat
+
+    return packed, lengths
+
+
+class Trimmer(object):
+    """Clip adapters from the 3' end of reads and trim low quality bases,
+    working on many reads at once
+
+    The settings follow those of fastq-mcf.  A read is clipped at the
+    leftmost position where the rest of the read matches the start of an
+    adapter, with at least min_clip bases of overlap and at most
+    max_difference percent of them mismatched.  Bases below quality are then
+    trimmed from both ends, and reads left shorter than min_length are
+    dropped.  In paired-end mode a pair is only kept if both reads are.
+    """
+
+    OPTIONS = {'-q': 'quality', '-l': 'min_length', '-L': 'max_length',
+               '-m': 'min_clip', '-p': 'max_difference', '-P': 'phred'}
+    """The fastq-mcf options understood, and the settings they change"""
+
+    SEED = 10
+    """The number of bases at the start of an adapter that must match exactly
+    for a longer match to be found"""
+
+    def __init__(self, adapters, quality=10, min_length=19, max_length=None,
+                 min_clip=3, max_difference=10, phred=33):
+        """Prepare to trim reads
+
+        :param adapters: the adapter sequences
+        :type adapters: list(str)
+
+        :param quality: the lowest quality kept at the ends of a read
+        :type quality: int
+
+        :param min_length: the shortest read kept after trimming
+        :type min_length: int
+
+        :param max_length: the length reads are cut down to, if any
+        :type max_length: int, None
+
+        :param min_clip: the fewest bases of an adapter that are clipped.
+            fastq-mcf scales its default from a sample of reads; 3 is used
+            here unless -m is given
+        :type min_clip: int
+
+        :param max_difference: the percentage of the overlap with an adapter
+            that may be mismatched
+        :type max_difference: int
+
+        :param phred: the offset of the quality scores
+        :type phred: int
+        """
+
+        if np is None:
+            raise ImportError('numpy is needed to trim reads with Trimmer')
+
+        self.adapters = [np.frombuffer(a, np.uint8).copy()
+                         for a in adapters if a]
+        self.quality = quality
+        self.min_length = min_length
+        self.max_length = max_length
+        self.min_clip = max(1, min_clip)
+        self.max_difference = max_difference
+        self.phred = phred
+
+    @classmethod
+    def from_args(cls, adapters, fastq_args):
+        """Make a Trimmer from a fastq-mcf argument string
+
+        Options that are not understood are logged and ignored
+
+        :param adapters: the adapter sequences
+        :type adapters: list(str)
+
+        :param fastq_args: the arguments, e.g. "-q 30 -l 50"
+        :type fastq_args: str
+
+        :rtype: Trimmer
+
+        :raises ValueError: if an understood option has no integer value
+        """
+
+        settings = {}
+        words = shlex.split(fastq_args or '')
+
+        i = 0
+        while i < len(words):
+            option = words[i]
+            if option in cls.OPTIONS:
+                try:
+                    settings[cls.OPTIONS[option]] = int(words[i + 1])
+                except (IndexError, ValueError):
+                    raise ValueError(
+                        '{0} must be followed by an integer'.format(option))
+                i += 2
+            else:
+                logger.warning(
+                    'Ignoring fastq-mcf option {0}, which the built-in '
+                    'trimmer does not support'.format(option))
+                i += 1
+
+        return cls(adapters, **settings)
+
+    def clip_points(self, bases, lengths):
+        """Find where each read should be clipped to remove an adapter
+
+        Matches that overlap the adapter by SEED bases or more are found from
+        exact matches of the adapter's first SEED bases, then checked in
+        full; shorter overlaps at the end of a read are checked directly
+
+        :param bases: the reads, one per row, zero padded
+        :type bases: numpy.ndarray
+
+        :param lengths: the length of each read
+        :type lengths: numpy.ndarray
+
+        :returns: the number of bases to keep from each read
+        :rtype: numpy.ndarray
+        """
+
+        cut = lengths.copy()
+        rows = np.arange(len(lengths))
+        widest = max([len(a) for a in self.adapters] or [0])
+
+        # overlaps at least as long as the seed
+        codes, valid = self._kmer_codes(bases, self.SEED)
+        seeds = self._kmer_codes(
+            np.array([a[:self.SEED] for a in self.adapters
+                      if len(a) >= self.SEED], np.uint8).reshape(
+                -1, self.SEED), self.SEED)[0].ravel()
+
+        hits, starts = np.nonzero(valid & np.isin(codes, seeds))
+        hit_codes = codes[hits, starts]
+
+        padded = np.zeros((len(lengths), bases.shape[1] + widest), np.uint8)
+        padded[:, :bases.shape[1]] = bases
+
+        for adapter, seed in zip(
+                [a for a in self.adapters if len(a) >= self.SEED], seeds):
+            which = hit_codes == seed
+            windows = padded[hits[which, None],
+                             starts[which, None] + np.arange(len(adapter))]
+
+            self._clip(cut, hits[which], starts[which],
+                       lengths[hits[which]] - starts[which], windows, adapter)
+
+        # overlaps shorter than the seed, at the end of the read
+        for overlap in xrange(self.min_clip, min(self.SEED, widest + 1)):
+            starts = lengths - overlap
+            ends = np.flatnonzero(starts >= 0)
+            windows = bases[ends[:, None],
+                            starts[ends, None] + np.arange(overlap)]
+            overlaps = np.repeat(overlap, len(ends))
+
+            for adapter in self.adapters:
+                if len(adapter) >= overlap:
+                    self._clip(cut, rows[ends], starts[ends], overlaps,
+                               windows, adapter)
+
+        return cut
+
+    def _clip(self, cut, hits, starts, overlaps, windows, adapter):
+        """Clip reads where a window matches an adapter closely enough
+
+        :param cut: the number of bases to keep from each read, updated
+        :type cut: numpy.ndarray
+
+        :param hits: the read of each window
+        :type hits: numpy.ndarray
+
+        :param starts: the position of each window in its read
+        :type starts: numpy.ndarray
+
+        :param overlaps: the number of bases of each window inside its read
+        :type overlaps: numpy.ndarray
+
+        :param windows: the bases of each window, one per row
+        :type windows: numpy.ndarray
+
+        Windows overlapping the adapter by fewer than min_clip bases are
+        never clipped, however well they match
+        """
+
+        overlaps = np.minimum(overlaps, windows.shape[1])
+        matches = (windows == adapter[:windows.shape[1]]).sum(1)
+
+        good = ((overlaps - matches) * 100 <= self.max_difference * overlaps) \
+            & (overlaps >= self.min_clip)
+        np.minimum.at(cut, hits[good], starts[good])
+
+    @staticmethod
+    def _kmer_codes(bases, k):
+        """Encode every k bases long window of each read as an integer
+
+        :param bases: the reads, one per row, zero padded
+        :type bases: numpy.ndarray
+
+        :param k: the window length, at most 31
+        :type k: int
+
+        :returns: the code of the window starting at each position, and
+            whether the window holds only A, C, G and T
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+
+        positions = max(0, bases.shape[1] - k + 1)
+        values = _BASE_CODES[bases]
+
+        codes = np.zeros((bases.shape[0], positions), np.int64)
+        valid = np.ones((bases.shape[0], positions), bool)
+
+        for offset in xrange(k):
+            window = values[:, offset:offset + positions]
+            codes = (codes << 2) | (window & 3)
+            valid &= window >= 0
+
+        return codes, valid
+
+    def quality_bounds(self, quals, ends):
+        """Find the first and last bases of good quality in each read
+
+        :param quals: the quality strings, one per row, zero padded
+        :type quals: numpy.ndarray
+
+        :param ends: the number of bases of each read still kept
+        :type ends: numpy.ndarray
+
+        :returns: the start and end of the bases to keep from each read
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+
+        columns = np.arange(quals.shape[1])
+        good = (quals >= self.phred + self.quality) & \
+            (columns < ends[:, None])
+
+        any_good = good.any(1)
+        starts = np.where(any_good, good.argmax(1), 0)
+        stops = np.where(any_good,
+                         quals.shape[1] - good[:, ::-1].argmax(1), 0)
+
+        if self.max_length:
+            stops = np.minimum(stops, starts + self.max_length)
+
+        return starts, stops
+
+    def trim_batch(self, bases, quals, lengths):
+        """Decide how to trim a batch of reads
+
+        :param bases: the bases of each read, one per row, zero padded
+        :type bases: numpy.ndarray
+
+        :param quals: the quality characters of each read, the same shape as
+            bases
+        :type quals: numpy.ndarray
+
+        :param lengths: the length of each read
+        :type lengths: numpy.ndarray
+
+        :returns: the start and end of the bases kept from each read,
+            whether each read is long enough to keep, and whether each read
+            was clipped for an adapter
+        :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray,
+            numpy.ndarray)
+        """
+
+        cut = self.clip_points(bases, lengths)
+        starts, stops = self.quality_bounds(quals, cut)
+
+        return starts, stops, stops - starts >= self.min_length, cut < lengths
+
+    def trim_files(self, infiles, outfiles, batch_size=20000, workers=1,
+                   qc=False):
+        """Trim one file, or a pair of files in step
+
+        :param infiles: one FASTQ file, or the two files of a pair, each a
+            path or a (path, start, end) byte range holding whole records
+        :type infiles: list(str, tuple(str, int, int))
+
+        :param outfiles: the trimmed file for each input
+        :type outfiles: list(str)
+
+        :param batch_size: the number of reads trimmed at once
+        :type batch_size: int
+
+        :param workers: the number of blocks of a .gz output to compress at
+            once
+        :type workers: int
+
+        :param qc: also compute the quality control statistics of each
+            trimmed file from the batches as they are written
+        :type qc: bool
+
+        :returns: the number of reads (or pairs) read, and kept, and the
+            number of reads clipped for an adapter, and with qc, a
+            qc.QualityStats of each output under 'qc'
+        :rtype: dict
+
+        :raises ValueError: if an input is not valid FASTQ, or the files of
+            a pair hold different numbers of reads
+        """
+
+        stats = {'reads': 0, 'kept': 0, 'clipped': 0}
+        if qc:
+            stats['qc'] = [QualityStats(self.phred) for _ in outfiles]
+
+        inputs = [fastq_batches(f, batch_size, workers=1) for f in infiles]
+        outputs = [_open(f, 'wb', workers) for f in outfiles]
+
+        try:
+            for batches in itertools.izip_longest(*inputs):
+                if None in batches or \
+                        len(set(len(b) for b in batches)) != 1:
+                    raise ValueError('The files of a pair hold different '
+                                     'numbers of reads: {0}'.format(
+                                         ', '.join(map(str, infiles))))
+
+                keep = None
+                trims = []
+
+                for batch in batches:
+                    bases, quals = batch.sequences(), batch.qualities()
+                    starts, stops, passed, clipped = self.trim_batch(
+                        bases, quals, batch.lengths)
+
+                    stats['clipped'] += int(clipped.sum())
+
+                    keep = passed if keep is None else keep & passed
+                    trims.append((batch, bases, quals, starts, stops))
+
+                stats['reads'] += len(batches[0])
+                stats['kept'] += int(keep.sum())
+
+                for i, (batch, bases, quals, starts, stops) in \
+                        enumerate(trims):
+                    batch.write(outputs[i], keep, starts, stops)
+                    if qc:
+                        stats['qc'][i].add_trimmed(bases, quals, starts,
+                                                   stops, keep)
+        finally:
+            for f in inputs + outputs:
+                f.close()
+
+        return stats
+
+
+def trim_job(trimmer, infiles, outfiles, workers=1, qc=False):
+    """Call trimmer.trim_files; a module function, so that a process pool can
+    run it"""
+
+    return trimmer.trim_files(infiles, outfiles, workers=workers, qc=qc)
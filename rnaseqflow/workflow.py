@@ -20,43 +20,134 @@ You should have received a copy of the GNU General Public License along with
 RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
 """
 
+import collections
+import contextlib
 import logging
+import multiprocessing
 import subprocess
 import os
-import fnmatch
-import re
+import sys
+import threading
+import time
+import Queue
 import shutil
 from abc import ABCMeta, abstractmethod, abstractproperty
+from multiprocessing.pool import ThreadPool
 
 from cliutils import all_subclasses, firstline
 from cliutils import ArgFiller
+from fileutils import parse_filename, walk_files, file_size, remember_size
+from fileutils import forget_files
+from fileutils import FileIndex, FifoFeeder, FifoCompressor, append_file
+from fileutils import write_file_at
+from fastqio import split_fastq
+from cache import TrimCache
+from gziputils import check_gzip, verify_gzip, BgzfWriter
+from scheduler import parallel_map, largest_first, available_cpus
+from scheduler import JobScheduler, MakespanTimer, combine_usage, Executor
+from scheduler import DiskSpaceGate
+import qc
+import trimming
+
+
+WorkflowNode = collections.namedtuple('WorkflowNode',
+                                      ['name', 'stage', 'inputs'])
+"""A stage of a Workflow, its name, and the names of the stages whose
+outputs it reads"""
 
 
 class Workflow(object):
     """
-    Execute a simple series of steps used to preprocess RNAseq files
+    Execute a graph of steps used to preprocess RNAseq files
+
+    Each stage has a name, by default its specifier, and reads the outputs of
+    the stages named as its inputs, combined.  A stage added with append
+    reads the output of the stage before it, so a Workflow built with append
+    alone is a simple series, while add can give a stage any inputs: two
+    stages may read the output of one, and run at the same time.
     """
     logger = logging.getLogger('rnaseqflow.Workflow')
     """log4j-style class logger"""
 
-    def __init__(self):
+    POLL_SECONDS = 0.1
+    """How often a streaming stage waiting on a queue checks whether another
+    stage has failed"""
+
+    _DONE = object()
+    """Put into a queue by a stage that has finished producing items"""
+
+    def __init__(self, stream=False, buffersize=4, manifest=None,
+                 report=None, workers=1, threads=None, min_free=0,
+                 delete_intermediates=False):
         """
         Initialize an empty workflow with no stages
+
+        :param stream: if True, chain the stages with run_stream so that each
+            stage can begin work on an item as soon as the stages it reads
+            produce it
+        :type stream: bool
+
+        :param buffersize: in streaming mode, the number of finished items a
+            stage may get ahead of each stage consuming its output
+        :type buffersize: int
+
+        :param manifest: a record of completed work, shared with every stage
+            so that work finished by an earlier run can be skipped
+        :type manifest: checkpoint.Manifest, None
+
+        :param report: a report in which the time and resources used by each
+            stage and each unit of work are recorded
+        :type report: report.RunReport, None
+
+        :param workers: the number of stages whose inputs are ready to run at
+            once, when not streaming
+        :type workers: int
+
+        :param threads: the number of threads in the scheduler.Executor that
+            the stages share for each run, by default the number of CPUs this
+            process may run on
+        :type threads: int, None
+
+        :param min_free: the number of bytes to keep free on the filesystem
+            of every output; jobs wait for space in a shared
+            scheduler.DiskSpaceGate
+        :type min_free: int
+
+        :param delete_intermediates: delete the files written by a stage once
+            every stage reading them has finished without a failed unit,
+            unless it is the last stage
+        :type delete_intermediates: bool
         """
 
         self.items = []
+        self.names = []
+        self.inputs = {}
+        self.stream = stream
+        self.buffersize = buffersize
+        self.manifest = manifest
+        self.report = report
+        self.workers = workers
+        self.threads = threads
+        self.min_free = min_free
+        self.delete_intermediates = delete_intermediates
+
+        self._readers = {}
+        self._finished_names = set()
+        self._finished_lock = threading.Lock()
 
     def append(self, item):
-        """Add a WorkflowStage to the workflow
+        """Add a WorkflowStage to the workflow, reading the output of the
+        stage before it
 
         :param item: the WorkflowStage to insert
         :type item: WorkflowStage
         """
 
-        self.items.append(item)
+        self.add(item)
 
     def insert(self, idx, item):
-        """Insert a WorkflowStage into the workflow
+        """Insert a WorkflowStage into the workflow, reading the output of
+        the stage before it
 
         :param idx: list index for insertion
         :type idx: int
@@ -65,7 +156,88 @@ class Workflow(object):
         :type item: WorkflowStage
         """
 
-        self.items.insert(idx, item)
+        self.add(item, index=idx)
+
+    def add(self, item, inputs=None, name=None, index=None):
+        """Add a WorkflowStage that reads the outputs of named stages
+
+        :param item: the WorkflowStage to add
+        :type item: WorkflowStage
+
+        :param inputs: the names of the stages whose outputs are combined
+            into the input of item, or None to read the stage before it
+        :type inputs: list(str), None
+
+        :param name: the stage's name, by default its specifier, followed by
+            a number if that name is taken
+        :type name: str, None
+
+        :param index: where to put the stage in the list of stages, by
+            default at the end
+        :type index: int, None
+
+        :returns: the stage's name
+        :rtype: str
+
+        :raises ValueError: if the name is taken
+        """
+
+        if name is None:
+            name = item.spec
+            number = 1
+            while name in self.names:
+                number += 1
+                name = '{0}#{1:d}'.format(item.spec, number)
+        elif name in self.names:
+            raise ValueError('A stage is already named {0}'.format(name))
+
+        if index is None:
+            index = len(self.items)
+
+        self.items.insert(index, item)
+        self.names.insert(index, name)
+        self.inputs[name] = list(inputs) if inputs is not None else None
+
+        return name
+
+    def graph(self):
+        """List the stages in an order in which they can be run, each after
+        the stages it reads
+
+        :returns: the stages
+        :rtype: list(WorkflowNode)
+
+        :raises ValueError: if a stage reads a stage that does not exist, or
+            the stages read each other in a cycle
+        """
+
+        nodes = []
+        for i, (name, item) in enumerate(zip(self.names, self.items)):
+            inputs = self.inputs[name]
+            if inputs is None:
+                inputs = self.names[i - 1:i]
+
+            missing = [n for n in inputs if n not in self.inputs]
+            if missing:
+                raise ValueError('Stage {0} reads {1}, which is not a '
+                                 'stage'.format(name, ', '.join(missing)))
+
+            nodes.append(WorkflowNode(name, item, inputs))
+
+        ordered = []
+        placed = set()
+        while nodes:
+            ready = [n for n in nodes if placed.issuperset(n.inputs)]
+            if not ready:
+                raise ValueError('The inputs of stages {0} form a '
+                                 'cycle'.format(', '.join(n.name
+                                                          for n in nodes)))
+            for node in ready:
+                nodes.remove(node)
+                placed.add(node.name)
+            ordered.extend(ready)
+
+        return ordered
 
     def run(self):
         """Allows the user to select a directory and processes all files within
@@ -73,12 +245,385 @@ class Workflow(object):
 
         This function is the primary function of the Workflow class.  All other
         functions are written as support for this function, at the moment
+
+        Every stage is given one scheduler.Executor, whose threads and
+        processes are started once and stopped when the run is over, the
+        processes before any stage runs, and one scheduler.DiskSpaceGate,
+        which holds back jobs until there is room for their outputs.  The
+        file names and sizes remembered by fileutils are forgotten at the
+        start and end of the run
+
+        :returns: the output of the last stage
         """
 
-        current_input = None
+        forget_files()
+
+        graph = self.graph()
+        executor = Executor(self.threads)
+        space = DiskSpaceGate(self.min_free)
+
+        # fork the processes now, before any thread holds a lock they would
+        # inherit
+        executor.process_pool()
+
+        self._readers = dict((node.name, []) for node in graph)
+        self._finished_names = set()
+        for node in graph:
+            for name in node.inputs:
+                self._readers[name].append(node.name)
+
         for item in self.items:
-            next_input = item.run(current_input)
-            current_input = next_input
+            item.manifest = self.manifest
+            item.report = self.report
+            item.executor = executor
+            item.space = space
+            item.failed_units = 0
+
+        try:
+            return self._run_graph(graph)
+        finally:
+            executor.close()
+            for item in self.items:
+                item.executor = None
+                item.space = None
+            forget_files()
+
+    def _run_graph(self, graph):
+        """Run the stages, one after another, several at once, or streaming
+
+        :param graph: the stages, from graph
+        :type graph: list(WorkflowNode)
+
+        :returns: the output of the last stage
+        """
+
+        if self.stream:
+            return self._run_stream(graph)
+
+        outputs = {}
+
+        if self.workers <= 1:
+            for node in graph:
+                outputs[node.name] = self._run_stage(
+                    node, self._combine(node, outputs))
+                self._finished(node, outputs)
+        else:
+            self._run_parallel(graph, outputs)
+
+        return outputs[self.names[-1]] if self.names else None
+
+    def _run_stage(self, node, stage_input):
+        """Run one stage, recording it in the report
+
+        :param node: the stage
+        :type node: WorkflowNode
+
+        :param stage_input: the combined outputs of the stages it reads
+        :type stage_input: object
+
+        :returns: the stage's output
+        """
+
+        if self.report is not None:
+            entry = self.report.begin(node.stage)
+
+        stage_output = node.stage.run(stage_input)
+
+        if self.report is not None:
+            self.report.finish(entry, stage_input, stage_output)
+
+        return stage_output
+
+    def _run_parallel(self, graph, outputs):
+        """Run each stage as soon as the stages it reads have finished, up to
+        self.workers stages at once
+
+        :param graph: the stages, from graph
+        :type graph: list(WorkflowNode)
+
+        :param outputs: filled with the output of each stage by name
+        :type outputs: dict
+        """
+
+        waiting = list(graph)
+        running = 0
+        finished = Queue.Queue()
+        pool = ThreadPool(self.workers)
+
+        def run_node(node, stage_input):
+            try:
+                finished.put((node, self._run_stage(node, stage_input), None))
+            except Exception:
+                finished.put((node, None, sys.exc_info()))
+
+        try:
+            while waiting or running:
+                for node in [n for n in waiting
+                             if all(i in outputs for i in n.inputs)]:
+                    waiting.remove(node)
+                    running += 1
+                    self.logger.debug('Starting stage %s', node.name)
+                    pool.apply_async(run_node, (node, self._combine(
+                        node, outputs)))
+
+                node, stage_output, exc_info = finished.get()
+                running -= 1
+
+                if exc_info:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+
+                outputs[node.name] = stage_output
+                self._finished(node, outputs)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _finished(self, node, outputs):
+        """Note that a stage has finished reading its inputs, and with
+        delete_intermediates delete the files of each stage it read that no
+        unfinished stage reads
+
+        Only files in a stage's outdir are deleted, so the files found by a
+        stage like FindFiles are never touched.  Nothing a stage wrote is
+        deleted if one of the stages reading it had a failed unit, or if it
+        is the last stage.
+
+        :param node: the finished stage
+        :type node: WorkflowNode
+
+        :param outputs: the output of each finished stage by name
+        :type outputs: dict
+        """
+
+        if not self.delete_intermediates:
+            return
+
+        with self._finished_lock:
+            self._finished_names.add(node.name)
+            retired = [name for name in node.inputs
+                       if self._finished_names.issuperset(self._readers[name])]
+
+        stages = dict(zip(self.names, self.items))
+
+        for name in retired:
+            if name == self.names[-1] or any(
+                    stages[reader].failed_units
+                    for reader in self._readers[name]):
+                continue
+
+            self._delete(name, stages[name], outputs[name])
+
+    def _delete(self, name, stage, stage_output):
+        """Delete the files a stage wrote into its outdir
+
+        :param name: the stage's name
+        :type name: str
+
+        :param stage: the stage
+        :type stage: WorkflowStage
+
+        :param stage_output: the stage's output
+        :type stage_output: iterable
+        """
+
+        outdir = getattr(stage, 'outdir', None)
+        if outdir is None:
+            return
+
+        outdir = os.path.join(os.path.realpath(outdir), '')
+        count = 0
+        freed = 0
+
+        for path in stage_output or ():
+            if not (isinstance(path, basestring) and os.path.isfile(path) and
+                    os.path.realpath(path).startswith(outdir)):
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning('Cannot delete {0}: {1}'.format(path, e))
+                continue
+            count += 1
+            freed += size
+
+        if count:
+            self.logger.info(
+                'Deleted {0:d} files of stage {1} that every stage reading '
+                'them has finished with, freeing {2:.1f} MB'.format(
+                    count, name, freed / 1e6))
+
+    @staticmethod
+    def _combine(node, outputs):
+        """Combine the outputs of the stages a stage reads into its input
+
+        :param node: the stage
+        :type node: WorkflowNode
+
+        :param outputs: the output of each finished stage by name
+        :type outputs: dict
+
+        :returns: None for a stage that reads nothing, the output of the one
+            stage it reads, or the union of the outputs of several
+        :rtype: object
+        """
+
+        if not node.inputs:
+            return None
+
+        if len(node.inputs) == 1:
+            return outputs[node.inputs[0]]
+
+        combined = set()
+        for name in node.inputs:
+            combined.update(outputs[name] or ())
+
+        return combined
+
+    def _run_stream(self, graph):
+        """Run every stage at once, passing items along as they are finished
+
+        Each stage's run_stream generator is drained by its own thread, which
+        puts each item into a bounded queue for every stage that reads it.  A
+        stage reading several stages has one queue, which they all fill, so
+        it takes items in whatever order they arrive.  A slow stage therefore
+        does not stop the stages before it from working ahead, up to
+        self.buffersize items.  If a stage fails, the others stop and the
+        exception is raised here.
+
+        :param graph: the stages, from graph
+        :type graph: list(WorkflowNode)
+
+        :returns: the output of the last stage
+        :rtype: set
+        """
+
+        failed = threading.Event()
+        queues = {}
+        readers = dict((node.name, []) for node in graph)
+
+        for node in graph:
+            if node.inputs:
+                queues[node.name] = Queue.Queue(max(self.buffersize, 1))
+                for name in node.inputs:
+                    readers[name].append(queues[node.name])
+
+        results = dict((node.name, []) for node in graph)
+        errors = []
+        threads = []
+
+        for node in graph:
+            stage_input = None
+            if node.inputs:
+                stage_input = self._consume(queues[node.name],
+                                            len(node.inputs), failed)
+
+            if self.report is not None:
+                stage_output = self.report.stream(node.stage, stage_input)
+            else:
+                stage_output = node.stage.run_stream(stage_input)
+
+            thread = threading.Thread(target=self._produce, args=(
+                stage_output, readers[node.name], results[node.name],
+                failed, errors, node, results))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            exc_info = errors[0]
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        return set(results[self.names[-1]]) if self.names else None
+
+    def _produce(self, stage_output, queues, results, failed, errors,
+                 node=None, outputs=None):
+        """Drain one stage's output into the queues of the stages reading it
+
+        :param stage_output: the stage's output
+        :type stage_output: iterable
+
+        :param queues: the input queue of each stage reading it
+        :type queues: list(Queue.Queue)
+
+        :param results: filled with the stage's output
+        :type results: list
+
+        :param failed: set when any stage fails
+        :type failed: threading.Event
+
+        :param errors: filled with the exc_info of a failure
+        :type errors: list
+
+        :param node: the stage, passed to _finished once it is done
+        :type node: WorkflowNode, None
+
+        :param outputs: the results of every stage by name, for _finished
+        :type outputs: dict
+        """
+
+        try:
+            for item in stage_output:
+                results.append(item)
+                for queue in queues:
+                    self._put(queue, item, failed)
+
+            for queue in queues:
+                self._put(queue, self._DONE, failed)
+
+            if node is not None:
+                self._finished(node, outputs)
+        except Exception:
+            errors.append(sys.exc_info())
+            failed.set()
+
+    def _put(self, queue, item, failed):
+        """Put an item into a queue, unless a stage fails while it is full
+
+        :raises RuntimeError: if a stage has failed
+        """
+
+        while True:
+            try:
+                queue.put(item, timeout=self.POLL_SECONDS)
+                return
+            except Queue.Full:
+                if failed.is_set():
+                    raise RuntimeError('Stopped because another stage failed')
+
+    def _consume(self, queue, producers, failed):
+        """Yield the items put into a stage's queue until every stage it
+        reads has finished
+
+        :param queue: the stage's input queue
+        :type queue: Queue.Queue
+
+        :param producers: the number of stages it reads
+        :type producers: int
+
+        :param failed: set when any stage fails
+        :type failed: threading.Event
+
+        :rtype: generator
+
+        :raises RuntimeError: if a stage fails
+        """
+
+        while producers:
+            try:
+                item = queue.get(timeout=self.POLL_SECONDS)
+            except Queue.Empty:
+                if failed.is_set():
+                    raise RuntimeError('Stopped because another stage failed')
+                continue
+
+            if item is self._DONE:
+                producers -= 1
+            else:
+                yield item
 
 
 class WorkflowStage(object):
@@ -96,6 +641,29 @@ class WorkflowStage(object):
     logger = logging.getLogger('rnaseqflow.WorkflowStage')
     """log4j-style class logger"""
 
+    manifest = None
+    """A checkpoint.Manifest of completed work, set by the Workflow"""
+
+    report = None
+    """A report.RunReport of the work done, set by the Workflow"""
+
+    executor = None
+    """A scheduler.Executor shared by the stages of a run, set by the
+    Workflow"""
+
+    space = None
+    """A scheduler.DiskSpaceGate shared by the stages of a run, set by the
+    Workflow"""
+
+    failed_units = 0
+    """The number of units of work recorded with a non-zero status"""
+
+    GZIP_EXPANSION = 4
+    """About how many times larger a FASTQ file is than the same file
+    gzipped, for estimating the size of outputs"""
+
+    _record_lock = threading.Lock()
+
     @abstractmethod
     def run(self, stage_input):
         """Attempt to process the provided input according to the rules of the
@@ -110,6 +678,168 @@ class WorkflowStage(object):
         """
         pass
 
+    def run_stream(self, stage_input):
+        """Process the provided input lazily, yielding results one at a time
+
+        The default implementation collects all of stage_input, passes it to
+        run, and yields the results, so any stage can be part of a streaming
+        Workflow.  Subclasses that can start work before their whole input is
+        available should override this.
+
+        :param stage_input: an iterable of inputs, or None for stages that
+                take no input
+        :type stage_input: iterable, None
+
+        :returns: the results of the subclass's processing
+        :rtype: generator
+        """
+
+        if stage_input is not None:
+            stage_input = set(stage_input)
+
+        for result in self.run(stage_input):
+            yield result
+
+    def _map(self, func, items, workers):
+        """Apply func to every item, running up to workers calls at once in
+        the threads of the Workflow's executor, or in threads of its own if
+        the stage is run alone
+
+        :param func: a function of one argument
+        :type func: callable
+
+        :param items: the arguments to call func with
+        :type items: iterable
+
+        :param workers: the maximum number of calls to run at once
+        :type workers: int
+
+        :returns: the results of func, in the order the calls finish
+        :rtype: generator
+        """
+
+        if self.executor is not None:
+            return self.executor.map(func, items, workers)
+
+        return parallel_map(func, items, workers)
+
+    @contextlib.contextmanager
+    def _admitted(self, inputs, outputs, copies=1):
+        """Wait until the filesystem of outputs has room for them, and hold
+        the space while the unit writes them
+
+        The outputs are estimated to be as large as the inputs, or
+        GZIP_EXPANSION times as large for gzipped inputs if the outputs are
+        not gzipped.  Without a Workflow, the unit is started at once.
+
+        :param inputs: the files the unit reads
+        :type inputs: list(str)
+
+        :param outputs: the files the unit writes
+        :type outputs: list(str)
+
+        :param copies: the number of copies of its outputs the unit holds at
+            once, such as 2 when shards are trimmed and then joined
+        :type copies: int
+        """
+
+        if self.space is None:
+            yield
+            return
+
+        compressed = all(f.endswith('.gz') for f in outputs)
+        size = sum(file_size(f) * (
+            self.GZIP_EXPANSION if f.endswith('.gz') and not compressed
+            else 1) for f in inputs)
+
+        with self.space.admit(outputs, size * copies):
+            yield
+
+    def _start_pool(self, processes):
+        """Get a pool of processes for work that needs cores of its own
+
+        :param processes: the number of processes to start if the stage is
+            run alone; otherwise the Workflow executor's processes are used
+        :type processes: int
+
+        :returns: the executor, or a new pool; either runs func(*args) in a
+            process with apply(func, args)
+        :rtype: scheduler.Executor, multiprocessing.pool.Pool
+        """
+
+        if self.executor is not None:
+            return self.executor
+
+        return multiprocessing.Pool(processes)
+
+    def _stop_pool(self, pool):
+        """Stop a pool from _start_pool, unless it is the executor
+
+        :param pool: the pool
+        :type pool: scheduler.Executor, multiprocessing.pool.Pool
+        """
+
+        if pool is not self.executor:
+            pool.close()
+            pool.join()
+
+    def _completed(self, inputs, outputs, args):
+        """Check the manifest for a unit of work finished by an earlier run
+
+        :param inputs: the files the unit reads
+        :type inputs: list(str)
+
+        :param outputs: the files the unit writes
+        :type outputs: list(str)
+
+        :param args: the arguments that determine the unit's output
+        :type args: list(str)
+
+        :returns: True if the unit need not be done again
+        :rtype: bool
+        """
+
+        if self.manifest is None:
+            return False
+
+        return self.manifest.completed(self.spec, inputs, outputs, args)
+
+    def _record(self, inputs, outputs, args, status, seconds=None,
+                usage=None):
+        """Record a finished unit of work in the manifest and the report, if
+        there are any
+
+        :param inputs: the files the unit read
+        :type inputs: list(str)
+
+        :param outputs: the files the unit wrote
+        :type outputs: list(str)
+
+        :param args: the arguments that determine the unit's output
+        :type args: list(str)
+
+        :param status: the exit status of the unit, 0 for success
+        :type status: int
+
+        :param seconds: the wall time of the unit
+        :type seconds: float, None
+
+        :param usage: the resources used by the child process that did the
+            work, if there was one
+        :type usage: resource.struct_rusage, None
+        """
+
+        if status:
+            with self._record_lock:
+                self.failed_units += 1
+
+        if self.manifest is not None:
+            self.manifest.record(self.spec, inputs, outputs, args, status)
+
+        if self.report is not None:
+            self.report.unit(self.spec, inputs, outputs, status, seconds,
+                             usage)
+
     @abstractproperty
     def spec(self):
         """Abstract class property, override with @classmethod
@@ -166,6 +896,8 @@ class FindFiles(WorkflowStage):
     Args used:
         * --root: the folder in which to start the search
         * --ext: the file extention to search for
+        * --find-workers: the number of directories to list at once
+        * --reindex: ignore the saved index of the root folder's contents
     """
 
     logger = logging.getLogger('rnaseqflow.WorkflowStage.FindFiles')
@@ -185,10 +917,12 @@ class FindFiles(WorkflowStage):
         """
 
         argfiller = ArgFiller(args)
-        argfiller.fill(['root', 'ext'])
+        argfiller.fill(['root', 'ext', 'find_workers', 'reindex'])
 
         self.root = args.root
         self.ext = args.ext
+        self.workers = args.find_workers
+        self.reindex = args.reindex
 
     def run(self, stage_input):
         """Run the recursive file finding stage
@@ -202,17 +936,50 @@ class FindFiles(WorkflowStage):
 
         self.logger.info('Beginning file find operations')
 
-        outfiles = set()
-        for root, _, files in os.walk(self.root):
-            for basename in files:
-                if fnmatch.fnmatch(basename, "*" + self.ext):
-                    filename = os.path.join(root, basename)
-                    outfiles.add(filename)
+        outfiles = set(self._walk())
 
         self.logger.info('Found {0} files'.format(len(outfiles)))
 
         return outfiles
 
+    def run_stream(self, stage_input):
+        """Yield each file with the correct extension as soon as it is found
+
+        :param stage_input: not used, only for the interface
+        :type stage_input: object, None
+
+        :returns: files found with the correct extension
+        :rtype: generator
+        """
+
+        self.logger.info('Beginning file find operations')
+
+        count = 0
+        for filename in self._walk():
+            count += 1
+            yield filename
+
+        self.logger.info('Found {0} files'.format(count))
+
+    def _walk(self):
+        """Recursively search self.root for files ending in self.ext
+
+        The sizes of the files are recorded for later stages by
+        fileutils.walk_files.  Directories that have not changed since the
+        last search are not listed again, unless --reindex is given
+
+        :returns: paths of the matching files
+        :rtype: generator
+        """
+
+        index = FileIndex(self.root, (self.ext,), self.reindex)
+
+        for path, _ in walk_files(
+                self.root, (self.ext,), self.workers, index, self.executor):
+            yield path
+
+        index.save()
+
 
 class MergeSplitFiles(WorkflowStage):
     """Merge files by the identifying sequence and direction
@@ -225,6 +992,14 @@ class MergeSplitFiles(WorkflowStage):
        * --root: the folder where merged files will be placed
        * --ext: the file extention to be used for the output files
        * --blocksize: number of kilobytes to use as a copy block size
+       * --merge-workers: number of merged files to build at once
+       * --gzip-merge: how to merge gzipped parts: 'copy' them as they are,
+         'check' their structure, 'verify' their CRC32 and size, or
+         decompress them and write the merged file as 'bgzf'
+       * --compress: write merged files of uncompressed parts as BGZF, with
+         .gz added to their names
+       * --merge-lanes: merge the parts of every lane into one file, ordered
+         by lane and then by part, reading the lanes in parallel
     """
 
     logger = logging.getLogger('rnaseqflow.WorkflowStage.MergeSplitFiles')
@@ -243,11 +1018,23 @@ class MergeSplitFiles(WorkflowStage):
         """
 
         argfiller = ArgFiller(args)
-        argfiller.fill(['root', 'ext', 'blocksize'])
+        argfiller.fill(['root', 'ext', 'blocksize', 'merge_workers',
+                        'gzip_merge', 'compress', 'merge_lanes'])
 
         self.root = args.root
         self.blocksize = args.blocksize
         self.ext = args.ext
+        self.workers = args.merge_workers
+        self.gzip_merge = args.gzip_merge
+        self.compress = args.compress and not self.ext.endswith('.gz')
+        self.lanes = args.merge_lanes
+
+        if self.gzip_merge != 'copy' and not self.ext.endswith('.gz'):
+            self.logger.warning(
+                '--gzip-merge {0} only applies to gzipped files, but the '
+                'extension is {1}; parts will be copied as they '
+                'are'.format(self.gzip_merge, self.ext))
+            self.gzip_merge = 'copy'
 
         self.outdir = os.path.join(self.root, 'merged')
         try:
@@ -267,7 +1054,9 @@ class MergeSplitFiles(WorkflowStage):
 
         Files are grouped and ordered by searching the file basename for a
         sequence identifier like AACTAG, a direction like R1, and a part number
-        formatted 001
+        formatted 001.  With --merge-lanes, parts are ordered by a lane like
+        L001 and then by part number.  The groups with the most input bytes
+        are built first
 
         :param stage_input: file names to be organized and merged
         :type stage_input: iterable(str)
@@ -277,158 +1066,691 @@ class MergeSplitFiles(WorkflowStage):
         """
         self.logger.info('Beginning file merge operations')
 
-        organized = self._organize_files(stage_input)
+        organized = self._organize_files(stage_input, self.lanes)
+        jobs, timer = self._jobs(organized)
 
-        merged_files = set()
+        merged_files = set(self._map(
+            timer.timed(self._build), jobs, self.workers))
 
-        for i, (fileid, files) in enumerate(organized.iteritems()):
-            outfile_name = 'merged_' + \
-                fileid[0] + '_' + fileid[1] + self.ext
-            outfile_path = os.path.join(self.outdir, outfile_name)
+        timer.log(self.logger)
+        self.logger.info('Created {0} merged files'.format(len(merged_files)))
 
-            self.logger.info(
-                'Building file {0:d} of {1:d}: {2}'.format(
-                    i + 1, len(organized), outfile_path))
+        return merged_files
 
-            with open(outfile_path, 'wb') as outfile:
-                for j, infile in enumerate(files):
-                    if j + 1 != self._get_part_num(infile):
-                        self.logger.error(
-                            '{0} is not file {1} of {2}.  Files must be out of'
-                            ' order, or there are extra files in the root '
-                            'folder that the merger cannot process.  '
-                            'Construction of file {2} is '
-                            'terminated'.format(infile, j+1, outfile_path))
-                        break
+    def run_stream(self, stage_input):
+        """Run the merge files operation, yielding each merged file when done
 
-                    self.logger.debug(
-                        'Merging file %d of %d: %s', j, len(files),
-                        infile)
+        Grouping needs every input file, so no merging begins until
+        stage_input is exhausted, but each merged file is passed on as soon
+        as it has been built
 
-                    shutil.copyfileobj(
-                        open(infile, 'rb'), outfile, 1024 * self.blocksize)
+        :param stage_input: file names to be organized and merged
+        :type stage_input: iterable(str)
 
-            merged_files.add(outfile_path)
+        :returns: merged file names
+        :rtype: generator
+        """
+        self.logger.info('Beginning file merge operations')
 
-        self.logger.info('Created {0} merged files'.format(len(merged_files)))
+        organized = self._organize_files(stage_input, self.lanes)
+        jobs, timer = self._jobs(organized)
 
-        return merged_files
+        for outfile_path in self._map(
+                timer.timed(self._build), jobs, self.workers):
+            yield outfile_path
 
-    def _organize_files(self, files):
-        """Organizes a list of paths by sequence_id, part number, and direction
+        timer.log(self.logger)
+        self.logger.info('Created {0} merged files'.format(len(organized)))
 
-        Uses regular expressions to find the six-character sequence ID, the
-        three character integer part number, and the direction (R1 or R2)
+    def _jobs(self, organized):
+        """List one merge job for each group of parts, largest group first
 
-        :param files: filenames to be organized
-        :type files: iterable(str)
+        :param organized: the output of _organize_files
+        :type organized: dict(tuple:list)
 
-        :returns: organized files in a dictionary mapping the sequence ID and
-            direction to the files that have that ID, sorted in ascending part
-            number
-        :rtype: dict(tuple:list)
+        :returns: (job number, job count, output path, ordered parts) tuples,
+            and a timer to compare the makespan with its prediction
+        :rtype: tuple(list(tuple), MakespanTimer)
         """
 
-        mapping = {}
+        groups = organized.items()
+        sizes = [sum(file_size(f) for f in files) for _, files in groups]
+        groups, ordered_sizes = largest_first(groups, sizes)
 
-        for path in files:
-            sequence_id = self._get_sequence_id(os.path.basename(path))
-            direction = self._get_direction_id(os.path.basename(path))
+        jobs = [(i + 1, len(groups), self._outfile_path(fileid), files)
+                for i, (fileid, files) in enumerate(groups)]
 
-            if not (sequence_id and direction):
-                self.logger.warning('Discarding file {0} - could not find '
-                                    'sequence ID and direction using '
-                                    'regular expressions'.format(
-                                        os.path.basename(path)))
-                continue
+        return jobs, MakespanTimer(ordered_sizes, self.workers, sizes)
 
-            try:
-                mapping[(sequence_id, direction)].append(path)
-            except KeyError:
-                mapping[(sequence_id, direction)] = [path]
+    def _build(self, job):
+        """Build one merged file, logging its progress
 
-        for key, lst in mapping.iteritems():
-            mapping[key] = sorted(lst, key=self._get_part_num)
+        Groups write to separate files, so any number of jobs may be built
+        at once
 
-        return mapping
+        :param job: an entry from _jobs
+        :type job: tuple
 
-    @staticmethod
-    def _get_sequence_id(filename):
-        """Gets the six-letter RNA sequence that identifies the RNAseq file
+        :returns: the path of the merged file
+        :rtype: str
+        """
+
+        start = time.time()
+        num, total, outfile_path, files = job
+        args = [] if self.gzip_merge == 'copy' else [self.gzip_merge]
+        if self.compress:
+            args.append('compress')
+        if self.lanes:
+            args.append('lanes')
+
+        if self._completed(files, [outfile_path], args):
+            self.logger.info(
+                'Skipping file {0:d} of {1:d}, already built: {2}'.format(
+                    num, total, outfile_path))
+            return outfile_path
+
+        self.logger.info(
+            'Building file {0:d} of {1:d}: {2}'.format(
+                num, total, outfile_path))
+
+        with self._admitted(files, [outfile_path]):
+            complete = self._merge(outfile_path, files)
+
+        self._record(files, [outfile_path], args, 0 if complete else 1,
+                     time.time() - start)
 
-        Returns a six character string that is the ID, or an empty string if no
-        identifying sequence is found.
+        return outfile_path
 
-        :param filename: the base filename to be processed
-        :type filename: str
+    def _outfile_path(self, fileid):
+        """Build the path of the merged file for one group of parts
 
-        :returns: the file's sequence ID, six characters of ACTG
-        :rtype: string
+        :param fileid: the sequence ID and direction of the group
+        :type fileid: tuple(str, str)
+
+        :returns: the path of the merged file
+        :rtype: str
         """
 
-        p = re.compile('.*[ACTG]{6}')
+        outfile_name = 'merged_' + \
+            fileid[0] + '_' + fileid[1] + self.ext
+        if self.compress:
+            outfile_name += '.gz'
+        return os.path.join(self.outdir, outfile_name)
 
-        m = p.search(filename)
-        if m is None:
-            return ''
-        else:
-            return m.group()
+    def _merge(self, outfile_path, files):
+        """Concatenate the ordered parts of one file into outfile_path
 
-    @staticmethod
-    def _get_direction_id(filename):
-        """Gets the direction identifier from an RNAseq filename
+        With --merge-lanes, part numbers start again at 1 in each lane.
+        Unless the merged file is compressed, so that the size of each lane's
+        share of it is known, several lanes are merged at once by _merge_lanes
 
-        A direction identifier is either R1 or R2, indicating a forward or a
-        backwards read, respectively.
+        :param outfile_path: the merged file to be written
+        :type outfile_path: str
 
-        :param filename: the base filename to be processed
-        :type filename: str
+        :param files: the parts to be concatenated, in ascending part number,
+            or in ascending lane and part number with --merge-lanes
+        :type files: list(str)
 
-        :returns: the file's direction ID, R1 or R2
-        :rtype: string
+        :returns: False if construction was stopped by a missing part
+        :rtype: bool
         """
 
-        p = re.compile('R\d{1}')
+        compressed = self.gzip_merge == 'bgzf' or self.compress
 
-        m = p.search(filename)
-        if m is None:
-            return ''
-        else:
-            return m.group()
+        if self.lanes and not compressed:
+            lanes = collections.OrderedDict()
+            for infile in files:
+                lanes.setdefault(parse_filename(infile).lane, []).append(
+                    infile)
 
-    @staticmethod
-    def _get_part_num(filename):
-        """Returns an integer indicating the file part number of the selected
-        RNAseq file
+            if len(lanes) > 1:
+                return self._merge_lanes(outfile_path, lanes.values())
 
-        RNAseq files, due to their size, are split into many smaller files,
-        each of which is given a three digit file part number (e.g. 001, 010).
-        This method returns that part number as an integer.
+        complete = True
+        counts = collections.Counter()
 
-        This requires that there only be one sequence of three digits in the
-        filename
+        with open(outfile_path, 'wb') as outfile:
+            bgzf = None
+            if compressed:
+                bgzf = BgzfWriter(outfile, workers=available_cpus(),
+                                  executor=self.executor)
 
-        :param filename: the base filename to be processed
-        :type filename: str
+            for j, infile in enumerate(files):
+                lane = parse_filename(infile).lane if self.lanes else None
+                counts[lane] += 1
 
-        :returns: the file's part number
-        :rtype: int
-        """
+                if counts[lane] != parse_filename(infile).part:
+                    self._log_misordered(infile, counts[lane], outfile_path)
+                    complete = False
+                    break
 
-        p = re.compile('_\d{3}')
+                try:
+                    method = self._append(outfile, bgzf, infile)
+                except IOError as e:
+                    self.logger.error(
+                        '{0} is not a valid gzip file: {1}.  Construction of '
+                        'file {2} is terminated'.format(infile, e,
+                                                        outfile_path))
+                    complete = False
+                    break
 
-        m = p.search(filename)
-        if m is None:
-            return 0
-        else:
-            text = m.group()
-            return int(text[1:])
+                self.logger.debug(
+                    'Merged file %d of %d with %s: %s', j + 1, len(files),
+                    method, infile)
 
+            if bgzf is not None:
+                bgzf.close()
 
-class FastQMCFTrimSolo(WorkflowStage):
-    """Trim adapter sequences from files using fastq-mcf one file at a time
+            remember_size(outfile_path, outfile.tell())
 
-    Input:
+        return complete
+
+    def _merge_lanes(self, outfile_path, lanes):
+        """Fill outfile_path with several lanes at once
+
+        Every part is measured with fstat, rather than trusting a size
+        remembered when it was found, so the offset at which each lane
+        begins in the merged file is known.  The file is made its full size,
+        then each lane's parts are copied in order by a thread of its own,
+        through its own open file, into the lane's region; no part is copied
+        past the size it was measured at.
+
+        :param outfile_path: the merged file to be written
+        :type outfile_path: str
+
+        :param lanes: the parts of each lane, in ascending part number, with
+            the lanes in ascending order
+        :type lanes: list(list(str))
+
+        :returns: False if construction was stopped by a missing part
+        :rtype: bool
+        """
+
+        sizes = []
+        for parts in lanes:
+            sizes.append([])
+            for infile in parts:
+                with open(infile, 'rb') as part:
+                    sizes[-1].append(os.fstat(part.fileno()).st_size)
+
+        offsets = [0]
+        for lane_sizes in sizes:
+            offsets.append(offsets[-1] + sum(lane_sizes))
+
+        with open(outfile_path, 'wb') as outfile:
+            outfile.truncate(offsets[-1])
+
+        def merge_lane(job):
+            return self._merge_lane(outfile_path, *job)
+
+        complete = all(list(self._map(
+            merge_lane, zip(lanes, sizes, offsets), len(lanes))))
+
+        remember_size(outfile_path, offsets[-1])
+
+        return complete
+
+    def _merge_lane(self, outfile_path, parts, sizes, offset):
+        """Copy the ordered parts of one lane into a merged file at offset
+
+        :param outfile_path: the merged file, already its full size
+        :type outfile_path: str
+
+        :param parts: the parts of the lane, in ascending part number
+        :type parts: list(str)
+
+        :param sizes: the size of each part when the lanes were laid out
+        :type sizes: list(int)
+
+        :param offset: the position in the merged file where the lane begins
+        :type offset: int
+
+        :returns: False if the lane was stopped by a missing or changed part
+        :rtype: bool
+        """
+
+        with open(outfile_path, 'r+b') as outfile:
+            for j, (infile, size) in enumerate(zip(parts, sizes)):
+                if j + 1 != parse_filename(infile).part:
+                    self._log_misordered(infile, j + 1, outfile_path)
+                    return False
+
+                try:
+                    method, now = self._append(outfile, None, infile, offset,
+                                               size)
+                except IOError as e:
+                    self.logger.error(
+                        '{0} is not a valid gzip file: {1}.  Construction of '
+                        'file {2} is terminated'.format(infile, e,
+                                                        outfile_path))
+                    return False
+
+                written = outfile.tell() - offset
+                if written != size or now != size:
+                    self.logger.error(
+                        '{0} was {1:d} bytes when the lanes were laid out and '
+                        'is {2:d} now.  Construction of file {3} is '
+                        'terminated'.format(infile, size, now, outfile_path))
+                    return False
+
+                offset += written
+
+                self.logger.debug(
+                    'Merged part %d of %d of lane %d with %s: %s', j + 1,
+                    len(parts), parse_filename(infile).lane, method, infile)
+
+        return True
+
+    def _log_misordered(self, infile, part, outfile_path):
+        """Log that a merged file is stopped by a part out of order
+
+        :param infile: the part found
+        :type infile: str
+
+        :param part: the part number expected
+        :type part: int
+
+        :param outfile_path: the merged file
+        :type outfile_path: str
+        """
+
+        hint = ''
+        if not self.lanes and parse_filename(infile).lane:
+            hint = ('  If the parts come from several lanes, use '
+                    '--merge-lanes.')
+
+        self.logger.error(
+            '{0} is not file {1} of {2}.  Files must be out of'
+            ' order, or there are extra files in the root '
+            'folder that the merger cannot process.  '
+            'Construction of file {2} is '
+            'terminated.{3}'.format(infile, part, outfile_path, hint))
+
+    def _append(self, outfile, bgzf, infile, offset=None, limit=None):
+        """Append one part to a merged file, checking it as --gzip-merge asks,
+        or compressing it with --compress
+
+        :param outfile: the merged file, opened for binary writing
+        :type outfile: file
+
+        :param bgzf: the BGZF writer wrapping outfile in 'bgzf' mode or with
+            --compress
+        :type bgzf: gziputils.BgzfWriter, None
+
+        :param infile: the part to append
+        :type infile: str
+
+        :param offset: write the part at this position of outfile instead of
+            at its end
+        :type offset: int, None
+
+        :param limit: with offset, the most bytes of the part to write
+        :type limit: int, None
+
+        :returns: the name of the method used, and with offset, the size of
+            the part when it was copied
+        :rtype: str, tuple(str, int)
+
+        :raises IOError: if the part is not a valid gzip file
+        """
+
+        blocksize = 1024 * self.blocksize
+
+        if self.compress:
+            with open(infile, 'rb') as part:
+                for data in iter(lambda: part.read(blocksize), ''):
+                    bgzf.write(data)
+            return 'compress'
+
+        if bgzf is not None:
+            verify_gzip(infile, bgzf.write, blocksize)
+            return 'bgzf'
+
+        if self.gzip_merge == 'check':
+            check_gzip(infile)
+        elif self.gzip_merge == 'verify':
+            verify_gzip(infile, blocksize=blocksize)
+
+        if offset is not None:
+            return write_file_at(outfile, offset, infile, blocksize, limit)
+
+        return append_file(outfile, infile, blocksize)
+
+    @classmethod
+    def _organize_files(cls, files, lanes=False):
+        """Organizes a list of paths by sequence_id, part number, and direction
+
+        Uses fileutils.parse_filename to find the six-character sequence ID,
+        the three character integer part number, and the direction (R1 or R2)
+
+        :param files: filenames to be organized
+        :type files: iterable(str)
+
+        :param lanes: sort each group by lane number, then part number
+        :type lanes: bool
+
+        :returns: organized files in a dictionary mapping the sequence ID and
+            direction to the files that have that ID, sorted in ascending part
+            number, or lane and part number
+        :rtype: dict(tuple:list)
+        """
+
+        mapping = {}
+
+        for path in files:
+            name = parse_filename(path)
+            sequence_id = name.sequence_id
+            direction = name.direction
+
+            if not (sequence_id and direction):
+                cls.logger.warning('Discarding file {0} - could not find '
+                                   'sequence ID and direction using '
+                                   'regular expressions'.format(
+                                       os.path.basename(path)))
+                continue
+
+            try:
+                mapping[(sequence_id, direction)].append(path)
+            except KeyError:
+                mapping[(sequence_id, direction)] = [path]
+
+        if lanes:
+            def order(f):
+                name = parse_filename(f)
+                return name.lane, name.part
+        else:
+            def order(f):
+                return parse_filename(f).part
+
+        for key, lst in mapping.iteritems():
+            mapping[key] = sorted(lst, key=order)
+
+        return mapping
+
+
+class ShardedTrim(object):
+    """Trim one large file, or pair of files, as several shards at once
+
+    Mixed into a trim WorkflowStage, this lets a single deep sample use more
+    than one core.  With --shards above 1, an input is split at record
+    boundaries into up to that many byte ranges of at least MIN_SHARD_BYTES,
+    and the mate of a pair is split after the same records.  The boundaries
+    come from the record index of each file, which is saved next to it (see
+    fastqio.FastqReader).  A gzipped input is split in the same way, by the
+    offsets of its decompressed data, and each shard decompresses only its
+    own range, starting from a checkpoint of the file's gziputils.GzipIndex.
+    Each shard is trimmed on its own, its byte ranges streamed through named
+    pipes, and the trimmed shards are joined in order with append_file.
+
+    Trimming reads independently of each other gives the same output as
+    trimming the whole file.  fastq-mcf chooses some settings, such as the
+    minimum clip length, from a sample of its input, so give those settings
+    in --fastq_args to be sure its shards are trimmed alike.
+
+    With --compress, the trimmed files are written as BGZF with .gz added
+    to their names.  fastq-mcf writes into a named pipe in place of each
+    trimmed file, and a FifoCompressor compresses what it writes on several
+    threads.
+    """
+
+    MIN_SHARD_BYTES = 64 * 1024 ** 2
+    """The smallest shard a file is split into"""
+
+    def _prepare_shards(self, args):
+        """Read --shards and --compress and make a folder for the shards and
+        the pipes of the compressed outputs
+
+        :param args: an object with settable and gettable attributes
+        :type args: Namespace, SimpleNamespace, etc.
+        """
+
+        argfiller = ArgFiller(args)
+        argfiller.fill(['shards', 'compress'])
+
+        self.shards = args.shards
+        self.compress = args.compress
+        self.sharddir = os.path.join(self.outdir, '.shards')
+
+        if self.shards > 1 or self.compress:
+            if os.path.isdir(self.sharddir):
+                shutil.rmtree(self.sharddir)
+            os.makedirs(self.sharddir)
+
+    def _copies(self):
+        """Count the copies of its trimmed files a unit holds at once
+
+        :returns: 2 if the files may be trimmed in shards, which are then
+            joined, otherwise 1
+        :rtype: int
+        """
+
+        return 2 if self.shards > 1 else 1
+
+    def _trim(self, cmd, fnames, outfiles):
+        """Trim fnames into outfiles, in shards if they are large enough
+
+        :param cmd: the command that trims the whole of fnames
+        :type cmd: list(str)
+
+        :param fnames: the files passed to the command
+        :type fnames: list(str)
+
+        :param outfiles: the trimmed files written by the command
+        :type outfiles: list(str)
+
+        :returns: the exit code, non-zero if any shard failed, and the
+            resources used, or None if they are not known
+        :rtype: tuple(int, resource.struct_rusage)
+        """
+
+        shards = []
+        if self.shards > 1 and all(os.path.isfile(f) for f in fnames):
+            try:
+                shards = split_fastq(fnames, self.shards,
+                                     self.MIN_SHARD_BYTES, self.executor)
+            except (IOError, OSError, ValueError) as e:
+                self.logger.warning('Cannot split {0}, so it is trimmed whole: '
+                                    '{1}'.format(' and '.join(fnames), e))
+
+        if len(shards) <= 1:
+            return self._call_compressed(
+                lambda piped: (self._call(piped, fnames),
+                               self.scheduler.last_usage()),
+                cmd, outfiles)
+
+        self.logger.info('Trimming {0} in {1} shards'.format(
+            ' and '.join(os.path.basename(f) for f in fnames), len(shards)))
+
+        def trim_shard(shard):
+            number, ranges = shard
+            parts = self._shard_paths(number, outfiles)
+            renamed = dict(zip(outfiles, parts))
+
+            returncode, usage = self._call_compressed(
+                lambda piped: self._call_shard(piped, ranges, parts),
+                [renamed.get(word, word) for word in cmd], parts)
+
+            return number, returncode, usage, parts
+
+        results = sorted(self._map(trim_shard, list(enumerate(shards)),
+                                   len(shards)))
+        returncode = next((code for _, code, _, _ in results if code), 0)
+
+        try:
+            if not returncode:
+                for i, outfile_path in enumerate(outfiles):
+                    with open(outfile_path, 'wb') as outfile:
+                        for _, _, _, parts in results:
+                            append_file(outfile, parts[i])
+        except (IOError, OSError) as e:
+            self.logger.error('Could not join the shards of {0}: {1}'.format(
+                ' and '.join(outfiles), e))
+            returncode = 1
+        finally:
+            for _, _, _, parts in results:
+                for part in parts:
+                    if os.path.lexists(part):
+                        os.remove(part)
+
+        return returncode, combine_usage(
+            [usage for _, _, usage, _ in results if usage is not None])
+
+    def _shard_paths(self, number, outfiles):
+        """Name the trimmed pieces of outfiles written by one shard
+
+        :param number: the shard, counting from 0
+        :type number: int
+
+        :param outfiles: the trimmed files the shards are joined into
+        :type outfiles: list(str)
+
+        :returns: the path of the shard's piece of each trimmed file
+        :rtype: list(str)
+        """
+
+        return [os.path.join(self.sharddir, '{0}.{1}'.format(
+            number, os.path.basename(f))) for f in outfiles]
+
+    def _compressed_path(self, path):
+        """Name the trimmed file written for path, adding .gz to it if
+        --compress is given
+
+        :param path: the path of the uncompressed trimmed file
+        :type path: str
+
+        :rtype: str
+        """
+
+        if self.compress and not path.endswith('.gz'):
+            return path + '.gz'
+
+        return path
+
+    def _cache_args(self):
+        """List the arguments that change the trimmed files, for the cache
+
+        :rtype: list(str)
+        """
+
+        return self.fastq_args.split() + (['--compress'] if self.compress
+                                          else [])
+
+    def _call_compressed(self, call, cmd, outfiles):
+        """Run a command, with --compress through a named pipe in place of
+        each output, compressing what it writes into the output
+
+        :param call: a function running the command it is passed, returning
+            the exit code and the resources used
+        :type call: callable
+
+        :param cmd: the command, naming outfiles
+        :type cmd: list(str)
+
+        :param outfiles: the files written by the command
+        :type outfiles: list(str)
+
+        :returns: the result of call, with an exit code of 1 if an output
+            could not be compressed
+        :rtype: tuple(int, resource.struct_rusage)
+        """
+
+        if not self.compress:
+            return call(cmd)
+
+        compressors = [FifoCompressor(
+            os.path.join(self.sharddir, os.path.basename(f)[:-len('.gz')]),
+            f, available_cpus(), executor=self.executor) for f in outfiles]
+        piped = dict((f, c.path) for f, c in zip(outfiles, compressors))
+
+        try:
+            for compressor in compressors:
+                compressor.start()
+            returncode, usage = call([piped.get(word, word) for word in cmd])
+        finally:
+            for compressor in compressors:
+                compressor.stop()
+
+        for compressor in compressors:
+            if not (returncode or compressor.complete):
+                self.logger.error('Could not compress {0}: {1}'.format(
+                    compressor.outfile_path, compressor.error))
+                returncode = 1
+
+        return returncode, usage
+
+    def _call_shard(self, cmd, ranges, outfiles):
+        """Run the command for one shard, streaming each byte range into a
+        named pipe in place of the file it is cut from
+
+        :param cmd: the command, writing the trimmed shards
+        :type cmd: list(str)
+
+        :param ranges: the (path, start, end) byte range of each input file
+        :type ranges: list(tuple(str, int, int))
+
+        :param outfiles: the trimmed shards written by the command
+        :type outfiles: list(str)
+
+        :returns: the exit code and the resources used, or None if they are
+            not known
+        :rtype: tuple(int, resource.struct_rusage)
+        """
+
+        feeders = []
+        for (path, start, end), outfile_path in zip(ranges, outfiles):
+            name = os.path.basename(path)
+            if name.endswith('.gz'):
+                name = name[:-len('.gz')]
+            pipe = os.path.join(self.sharddir, '{0}.in.{1}'.format(
+                os.path.basename(outfile_path), name))
+            feeders.append(FifoFeeder(pipe, [(path, start, end)]))
+
+        piped = dict((path, feeder.path)
+                     for (path, _, _), feeder in zip(ranges, feeders))
+
+        returncode = self._call_feeding(
+            [piped.get(word, word) for word in cmd], feeders)
+
+        return returncode, self.scheduler.last_usage()
+
+    def _call_feeding(self, cmd, feeders):
+        """Run a command while FifoFeeders write into the pipes it reads
+
+        :param cmd: the command and its arguments
+        :type cmd: list(str)
+
+        :param feeders: the feeders of the pipes named in cmd
+        :type feeders: list(FifoFeeder)
+
+        :returns: the command's exit code, or 1 if it exited without reading
+            all of a pipe
+        :rtype: int
+        """
+
+        try:
+            for feeder in feeders:
+                feeder.start()
+            returncode = self.scheduler.call(cmd)
+        finally:
+            for feeder in feeders:
+                feeder.stop()
+
+        for feeder in feeders:
+            if not (returncode or feeder.complete):
+                self.logger.error(
+                    '{0} did not read all of {1}: {2}'.format(
+                        os.path.basename(cmd[0]),
+                        os.path.basename(feeder.path),
+                        feeder.error or 'the pipe was never opened'))
+                returncode = 1
+
+        return returncode
+
+
+class FastQMCFTrimSolo(ShardedTrim, WorkflowStage):
+    """Trim adapter sequences from files using fastq-mcf one file at a time
+
+    Input:
         A flat set of files to be passed into fastq-mcf file-by-file
     Output:
         A flat set of trimmed file names
@@ -438,7 +1760,12 @@ class FastQMCFTrimSolo(WorkflowStage):
        * --fastq: the location of the fastq-mcf executable
        * --fastq_args: a string of arguments to pass directly to fastq-mcf
        * --quiet: silence fastq-mcf's output if given
-
+       * --jobs: the number of fastq-mcf processes to run at once
+       * --shards: the number of shards to split a large file into
+       * --compress: write the trimmed files as BGZF, with .gz added to
+         their names
+       * --cache: the trim cache directory, if any
+       * --cache-size: the size cap of the trim cache, in GB
     """
 
     logger = logging.getLogger('rnaseqflow.WorkflowStage.FastQMCFTrimSolo')
@@ -458,13 +1785,17 @@ class FastQMCFTrimSolo(WorkflowStage):
         :type args: Namespace, SimpleNamespace, etc.
         """
         argfiller = ArgFiller(args)
-        argfiller.fill(['root', 'adapters', 'fastq', 'fastq_args', 'quiet'])
+        argfiller.fill(['root', 'adapters', 'fastq', 'fastq_args', 'quiet',
+                        'jobs', 'cache', 'cache_size'])
 
         self.root = args.root
         self.adapters = args.adapters
         self.fastq_args = args.fastq_args
         self.executable = args.fastq
         self.quiet = args.quiet
+        self.scheduler = JobScheduler(args.jobs, self.quiet)
+        self.cache = TrimCache(args.cache, args.cache_size * 1024 ** 3) \
+            if args.cache else None
 
         self.outdir = os.path.join(self.root, 'trimmed')
         try:
@@ -483,8 +1814,12 @@ class FastQMCFTrimSolo(WorkflowStage):
         else:
             self.logger.info('fastq-mcf found')
 
+        self._prepare_shards(args)
+
     def run(self, stage_input):
-        """Trim files one at a time using fastq-mcf
+        """Trim files using fastq-mcf, running up to --jobs files at once
+
+        The largest files are started first
 
         :param stage_input: filenames to be processed
         :type stage_input: iterable(str)
@@ -494,34 +1829,165 @@ class FastQMCFTrimSolo(WorkflowStage):
         """
 
         self.logger.info('Beginning file trim operation')
-        trimmed_files = set()
 
-        for i, fname in enumerate(stage_input):
-            outfile_name = 'trimmed_' + os.path.basename(fname)
-            outfile_path = os.path.join(self.outdir, outfile_name)
-            cmd = [self.executable, self.adapters, fname] + \
-                self.fastq_args.split() + ['-o', outfile_path]
+        files = list(stage_input)
+        sizes = [file_size(fname) for fname in files]
+        files, ordered_sizes = largest_first(files, sizes)
 
-            self.logger.info(
-                'Building file {0:d} of {1:d}: {2}'.format(
-                    i + 1, len(stage_input), outfile_path))
+        jobs = [(i + 1, len(files), fname, self._outfile_path(fname))
+                for i, fname in enumerate(files)]
 
-            self.logger.debug('Calling %s', str(cmd))
+        timer = MakespanTimer(ordered_sizes, self.scheduler.jobs, sizes)
+        trimmed_files = set(self._map(
+            timer.timed(self._build), jobs, self.scheduler.jobs))
 
-            if self.quiet:
-                with open(os.devnull, 'w') as nullfile:
-                    subprocess.call(cmd, stdout=nullfile, stderr=nullfile)
-            else:
-                subprocess.call(cmd)
+        timer.log(self.logger)
+        self._log_finished(len(trimmed_files))
+
+        return trimmed_files
 
-            trimmed_files.add(outfile_path)
+    def run_stream(self, stage_input):
+        """Trim each file with fastq-mcf as soon as it arrives
 
-        self.logger.info('Trimmed {0} files'.format(len(trimmed_files)))
+        :param stage_input: filenames to be processed
+        :type stage_input: iterable(str)
 
-        return trimmed_files
+        :returns: filenames holding the processed files
+        :rtype: generator
+        """
+
+        self.logger.info('Beginning file trim operation')
+
+        jobs = ((i + 1, None, fname, self._outfile_path(fname))
+                for i, fname in enumerate(stage_input))
+
+        count = 0
+        for outfile_path in self._map(self._build, jobs,
+                                      self.scheduler.jobs):
+            count += 1
+            yield outfile_path
+
+        self._log_finished(count)
+
+    def _outfile_path(self, fname):
+        """Build the path of the trimmed version of fname
+
+        :param fname: the file to be trimmed
+        :type fname: str
+
+        :returns: the path of the trimmed file
+        :rtype: str
+        """
+
+        outfile_name = 'trimmed_' + os.path.basename(fname)
+        return self._compressed_path(os.path.join(self.outdir, outfile_name))
+
+    def _build(self, job):
+        """Call fastq-mcf on a single file, logging its progress
+
+        :param job: the job number, the job count (None if not known yet), the
+            file to be trimmed and the trimmed file path
+        :type job: tuple
+
+        :returns: the path of the trimmed file
+        :rtype: str
+        """
+
+        start = time.time()
+        num, total, fname, outfile_path = job
+        progress = '{0:d} of {1:d}'.format(num, total) if total else str(num)
+
+        cmd = [self.executable, self.adapters, fname] + \
+            self.fastq_args.split() + ['-o', outfile_path]
+        inputs = self._inputs([fname]) + [self.adapters]
+
+        if self._completed(inputs, [outfile_path], cmd):
+            self.logger.info('Skipping file {0}, already built: {1}'.format(
+                progress, outfile_path))
+            return outfile_path
+
+        if self.cache:
+            key = self.cache.key([self.adapters] + self._inputs([fname]),
+                                 self.executable, self._cache_args())
+            if self.cache.fetch(key, [outfile_path]):
+                self.logger.info(
+                    'Restored file {0} from the trim cache: {1}'.format(
+                        progress, outfile_path))
+                self._record(inputs, [outfile_path], cmd, 0,
+                             time.time() - start)
+                return outfile_path
+
+        self.logger.info(
+            'Building file {0}: {1}'.format(progress, outfile_path))
+
+        self.logger.debug('Calling %s', str(cmd))
+
+        # an old output may be a hard link into the trim cache, so it is
+        # removed rather than written through
+        if os.path.lexists(outfile_path):
+            os.remove(outfile_path)
+
+        with self._admitted(inputs, [outfile_path], self._copies()):
+            returncode, usage = self._trim(cmd, [fname], [outfile_path])
+
+        if self.cache and not returncode:
+            self.cache.store(key, [outfile_path])
+
+        self._record(inputs, [outfile_path], cmd, returncode,
+                     time.time() - start, usage)
+
+        return outfile_path
+
+    def _inputs(self, fnames):
+        """List the files read when fastq-mcf is given fnames
 
+        :param fnames: the files passed to fastq-mcf
+        :type fnames: list(str)
 
-class FastQMCFTrimPairs(WorkflowStage):
+        :returns: the files whose contents determine the trimmed files
+        :rtype: list(str)
+        """
+
+        return list(fnames)
+
+    def _call(self, cmd, fnames):
+        """Run one fastq-mcf command
+
+        :param cmd: the command and its arguments
+        :type cmd: list(str)
+
+        :param fnames: the files passed to fastq-mcf in cmd
+        :type fnames: list(str)
+
+        :returns: the command's exit code
+        :rtype: int
+        """
+
+        return self.scheduler.call(cmd)
+
+    def _log_finished(self, count):
+        """Log the number of files trimmed and any failed fastq-mcf calls
+
+        :param count: the number of trimmed files
+        :type count: int
+        """
+
+        self.logger.info('Trimmed {0} files'.format(count))
+
+        if self.cache:
+            self.logger.info(
+                '{0} of {1} fastq-mcf calls were restored from the trim '
+                'cache'.format(self.cache.hits,
+                               self.cache.hits + self.cache.misses))
+
+        if self.scheduler.failures():
+            self.logger.error(
+                '{0} of {1} fastq-mcf calls failed'.format(
+                    self.scheduler.failures(),
+                    len(self.scheduler.exit_codes)))
+
+
+class FastQMCFTrimPairs(ShardedTrim, WorkflowStage):
     """Trim adapter sequences from files using fastq-mcf in paired-end mode
 
     Input:
@@ -534,6 +2000,12 @@ class FastQMCFTrimPairs(WorkflowStage):
        * --fastq: the location of the fastq-mcf executable
        * --fastq_args: a string of arguments to pass directly to fastq-mcf
        * --quiet: silence fastq-mcf's output if given
+       * --jobs: the number of fastq-mcf processes to run at once
+       * --shards: the number of shards to split a large pair into
+       * --compress: write the trimmed files as BGZF, with .gz added to
+         their names
+       * --cache: the trim cache directory, if any
+       * --cache-size: the size cap of the trim cache, in GB
     """
 
     logger = logging.getLogger('rnaseqflow.WorkflowStage.FastQMCFTrimPairs')
@@ -553,13 +2025,17 @@ class FastQMCFTrimPairs(WorkflowStage):
         :type args: Namespace, SimpleNamespace, etc.
         """
         argfiller = ArgFiller(args)
-        argfiller.fill(['root', 'adapters', 'fastq', 'fastq_args', 'quiet'])
+        argfiller.fill(['root', 'adapters', 'fastq', 'fastq_args', 'quiet',
+                        'jobs', 'cache', 'cache_size'])
 
         self.root = args.root
         self.adapters = args.adapters
         self.fastq_args = args.fastq_args
         self.executable = args.fastq
         self.quiet = args.quiet
+        self.scheduler = JobScheduler(args.jobs, self.quiet)
+        self.cache = TrimCache(args.cache, args.cache_size * 1024 ** 3) \
+            if args.cache else None
 
         self.outdir = os.path.join(self.root, 'trimmed')
         try:
@@ -578,8 +2054,13 @@ class FastQMCFTrimPairs(WorkflowStage):
         else:
             self.logger.info('fastq-mcf found')
 
+        self._prepare_shards(args)
+
     def run(self, stage_input):
-        """Trim files one at a time using fastq-mcf
+        """Trim pairs of files using fastq-mcf, running up to --jobs pairs at
+        once
+
+        The pairs with the most input bytes are started first
 
         :param stage_input: filenames to be processed
         :type stage_input: iterable(str)
@@ -590,100 +2071,957 @@ class FastQMCFTrimPairs(WorkflowStage):
 
         self.logger.info('Beginning file trim operation')
 
-        pairs = self._find_file_pairs(stage_input)
+        pairs = list(self._find_file_pairs(stage_input))
+        sizes = [sum(file_size(f) for f in pair if f) for pair in pairs]
+        pairs, ordered_sizes = largest_first(pairs, sizes)
 
-        trimmed_files = set()
+        jobs = []
         prog_count = 0
 
         for f1, f2 in pairs:
-            outfile_name_1 = 'trimmed_' + os.path.basename(f1)
-            outfile_path_1 = os.path.join(self.outdir, outfile_name_1)
-            prog_count += 1
+            prog_count += 2 if f2 else 1
+            jobs.append((prog_count, len(stage_input), f1, f2,
+                         self._outfile_paths(f1, f2)))
 
-            if f2:
-                prog_count += 1
-                outfile_name_2 = 'trimmed_' + os.path.basename(f2)
-                outfile_path_2 = os.path.join(self.outdir, outfile_name_2)
+        timer = MakespanTimer(ordered_sizes, self.scheduler.jobs, sizes)
 
-                cmd = [self.executable, self.adapters, f1, f2] + \
-                    self.fastq_args.split() + \
-                    ['-o', outfile_path_1, '-o', outfile_path_2]
+        trimmed_files = set()
+        for outfiles in self._map(timer.timed(self._build), jobs,
+                                  self.scheduler.jobs):
+            trimmed_files.update(outfiles)
 
-                self.logger.info(
-                    'Building files {0:d} and {1:d} of {2:d}: {3} and {4}'.format(
-                        prog_count - 1, prog_count, len(stage_input), outfile_path_1, outfile_path_2))
+        timer.log(self.logger)
+        self._log_finished(len(trimmed_files))
 
-                self.logger.debug('Calling %s', str(cmd))
+        return trimmed_files
 
-                trimmed_files.add(outfile_path_1)
-                trimmed_files.add(outfile_path_2)
-            else:
-                cmd = [self.executable, self.adapters, f1] + \
-                    self.fastq_args.split() + ['-o', outfile_path_1]
+    def run_stream(self, stage_input):
+        """Trim each pair of files with fastq-mcf as soon as both mates arrive
 
-                self.logger.info(
-                    'Building file {0:d} of {1:d}: {2}'.format(
-                        prog_count, len(stage_input), outfile_path_1))
+        Files whose mate never arrives are trimmed alone once stage_input is
+        exhausted
 
-                trimmed_files.add(outfile_path_1)
+        :param stage_input: filenames to be processed
+        :type stage_input: iterable(str)
 
-            self.logger.debug('Calling %s', str(cmd))
+        :returns: filenames holding the processed files
+        :rtype: generator
+        """
 
-            if self.quiet:
-                with open(os.devnull, 'w') as nullfile:
-                    subprocess.call(cmd, stdout=nullfile, stderr=nullfile)
-            else:
-                subprocess.call(cmd)
+        self.logger.info('Beginning file trim operation')
 
-        self.logger.info('Trimmed {0} files'.format(len(trimmed_files)))
+        count = 0
+        for outfiles in self._map(self._build, self._stream_jobs(stage_input),
+                                  self.scheduler.jobs):
+            count += len(outfiles)
+            for outfile_path in outfiles:
+                yield outfile_path
 
-        return trimmed_files
+        self._log_finished(count)
 
-    def _find_file_pairs(self, files):
-        """Finds pairs of forward and backward read files
+    def _stream_jobs(self, files):
+        """Pair files as they arrive and generate a job for each pair
 
         :param files: filenames to be paired and trimmed
         :type files: iterable(str)
 
-
-        :returns: pairs (f1, f2) that are paired files, forward and backward
-            If a file f1 does not have a mate, f2 will be None, and the file
-            will be trimmed without a mate
-        :rtype: set(tuple(str, str))
+        :returns: jobs in the format taken by _build
+        :rtype: generator
         """
 
-        pairs = set()
+        waiting = {}
+        prog_count = 0
 
         for f in files:
-            try:
-                pair = next(f2 for f2 in files if (
-                    self._get_sequence_id(f2) == self._get_sequence_id(f) and
-                    f2 != f))
-            except StopIteration as e:
-                pairs.add((f, None))
-            else:
-                pairs.add(tuple(fn for fn in sorted([f, pair])))
+            key = self._pairing_key(f)
+            mate = waiting.pop(key, None) if key else None
 
-        return pairs
+            if mate is None:
+                waiting[key or f] = f
+                continue
 
-    @staticmethod
-    def _get_sequence_id(filename):
-        """Gets the six-letter RNA sequence that identifies the RNAseq file
+            f1, f2 = sorted([mate, f])
+            prog_count += 2
+            yield (prog_count, None, f1, f2, self._outfile_paths(f1, f2))
 
-        Returns a six character string that is the ID, or an empty string if no
-        identifying sequence is found.
+        for f in sorted(waiting.itervalues()):
+            prog_count += 1
+            yield (prog_count, None, f, None, self._outfile_paths(f, None))
+
+    def _outfile_paths(self, f1, f2):
+        """Build the paths of the trimmed versions of a pair of files
 
-        :param filename: the base filename to be processed
-        :type filename: str
+        :param f1: the first file of the pair
+        :type f1: str
 
-        :returns: the file's sequence ID, six characters of ACTG
-        :rtype: string
+        :param f2: the second file of the pair, or None if f1 has no mate
+        :type f2: str, None
+
+        :returns: the trimmed file paths, one for each file given
+        :rtype: list(str)
         """
 
-        p = re.compile('.*[ACTG]{6}')
+        return [self._compressed_path(
+            os.path.join(self.outdir, 'trimmed_' + os.path.basename(f)))
+            for f in (f1, f2) if f]
 
-        m = p.search(filename)
-        if m is None:
-            return ''
+    def _build(self, job):
+        """Call fastq-mcf on a pair of files, or on a single file without a
+        mate, logging its progress
+
+        :param job: the progress count after this job, the total file count
+            (None if not known yet), the two files (the second may be None) and
+            the trimmed file paths
+        :type job: tuple
+
+        :returns: the paths of the trimmed files
+        :rtype: list(str)
+        """
+
+        start = time.time()
+        prog_count, total, f1, f2, outfiles = job
+        of_total = ' of {0:d}'.format(total) if total else ''
+
+        infiles = [f for f in (f1, f2) if f]
+        cmd = [self.executable, self.adapters] + infiles + \
+            self.fastq_args.split()
+        for outfile_path in outfiles:
+            cmd += ['-o', outfile_path]
+        inputs = self._inputs(infiles) + [self.adapters]
+
+        if self._completed(inputs, outfiles, cmd):
+            self.logger.info('Skipping {0}{1}, already built: {2}'.format(
+                prog_count, of_total, ' and '.join(outfiles)))
+            return outfiles
+
+        if self.cache:
+            key = self.cache.key([self.adapters] + self._inputs(infiles),
+                                 self.executable, self._cache_args())
+            if self.cache.fetch(key, outfiles):
+                self.logger.info(
+                    'Restored {0}{1} from the trim cache: {2}'.format(
+                        prog_count, of_total, ' and '.join(outfiles)))
+                self._record(inputs, outfiles, cmd, 0, time.time() - start)
+                return outfiles
+
+        if f2:
+            self.logger.info(
+                'Building files {0:d} and {1:d}{2}: {3} and {4}'.format(
+                    prog_count - 1, prog_count, of_total,
+                    outfiles[0], outfiles[1]))
         else:
-            return m.group()
+            self.logger.info(
+                'Building file {0:d}{1}: {2}'.format(
+                    prog_count, of_total, outfiles[0]))
+
+        self.logger.debug('Calling %s', str(cmd))
+
+        # an old output may be a hard link into the trim cache, so it is
+        # removed rather than written through
+        for outfile_path in outfiles:
+            if os.path.lexists(outfile_path):
+                os.remove(outfile_path)
+
+        with self._admitted(inputs, outfiles, self._copies()):
+            returncode, usage = self._trim(cmd, infiles, outfiles)
+
+        if self.cache and not returncode:
+            self.cache.store(key, outfiles)
+
+        self._record(inputs, outfiles, cmd, returncode,
+                     time.time() - start, usage)
+
+        return outfiles
+
+    def _inputs(self, fnames):
+        """List the files read when fastq-mcf is given fnames
+
+        :param fnames: the files passed to fastq-mcf
+        :type fnames: list(str)
+
+        :returns: the files whose contents determine the trimmed files
+        :rtype: list(str)
+        """
+
+        return list(fnames)
+
+    def _call(self, cmd, fnames):
+        """Run one fastq-mcf command
+
+        :param cmd: the command and its arguments
+        :type cmd: list(str)
+
+        :param fnames: the files passed to fastq-mcf in cmd
+        :type fnames: list(str)
+
+        :returns: the command's exit code
+        :rtype: int
+        """
+
+        return self.scheduler.call(cmd)
+
+    def _log_finished(self, count):
+        """Log the number of files trimmed and any failed fastq-mcf calls
+
+        :param count: the number of trimmed files
+        :type count: int
+        """
+
+        self.logger.info('Trimmed {0} files'.format(count))
+
+        if self.cache:
+            self.logger.info(
+                '{0} of {1} fastq-mcf calls were restored from the trim '
+                'cache'.format(self.cache.hits,
+                               self.cache.hits + self.cache.misses))
+
+        if self.scheduler.failures():
+            self.logger.error(
+                '{0} of {1} fastq-mcf calls failed'.format(
+                    self.scheduler.failures(),
+                    len(self.scheduler.exit_codes)))
+
+    def _find_file_pairs(self, files):
+        """Finds pairs of forward and backward read files
+
+        Files are bucketed by sequence ID in a single pass.  A file with no
+        sequence ID, or whose sequence ID is shared by more than two files, is
+        trimmed without a mate
+
+        :param files: filenames to be paired and trimmed
+        :type files: iterable(str)
+
+
+        :returns: pairs (f1, f2) that are paired files, forward and backward
+            If a file f1 does not have a mate, f2 will be None, and the file
+            will be trimmed without a mate
+        :rtype: set(tuple(str, str))
+        """
+
+        mapping = {}
+
+        for f in files:
+            sequence_id = self._pairing_key(f)
+
+            try:
+                mapping[sequence_id].append(f)
+            except KeyError:
+                mapping[sequence_id] = [f]
+
+        pairs = set()
+
+        for sequence_id, mates in mapping.iteritems():
+            if sequence_id and len(mates) == 2:
+                pairs.add(tuple(sorted(mates)))
+                continue
+
+            if sequence_id and len(mates) > 2:
+                self.logger.warning(
+                    '{0} files share the sequence ID {1}, so they cannot be '
+                    'paired and will be trimmed without mates: {2}'.format(
+                        len(mates), os.path.basename(sequence_id),
+                        ', '.join(sorted(mates))))
+
+            pairs.update((f, None) for f in mates)
+
+        return pairs
+
+    @staticmethod
+    def _pairing_key(path):
+        """Gets the directory and sequence ID shared by a pair of files
+
+        :param path: the path of the file to be paired
+        :type path: str
+
+        :returns: the file's directory joined to its sequence ID, or an empty
+            string if the file has no sequence ID
+        :rtype: str
+        """
+
+        sequence_id = parse_filename(path).sequence_id
+
+        if not sequence_id:
+            return ''
+
+        return os.path.join(os.path.dirname(path), sequence_id)
+
+
+class NumpyTrimPairs(FastQMCFTrimPairs):
+    """Trim adapters and low quality bases with NumPy, in pairs where possible
+
+    A replacement for fastq-mcf that needs no external program.  Reads are
+    decoded in batches into NumPy arrays and every read in a batch is
+    searched for every adapter at once.  Files, or pairs of files, are
+    trimmed in separate processes, so --jobs of them use that many cores.
+
+    Only the fastq-mcf options -q, -l, -L, -m, -p and -P are understood from
+    --fastq_args; others are logged and ignored.  See trimming.Trimmer
+
+    With --trim-qc, the QualityControl report of each trimmed file is
+    computed from the trimmed batches as they are written, in the same pass,
+    and written to the qc folder.  The shards of a file are added together.
+    A file that is not trimmed, because it is already built or restored from
+    the trim cache, is read again if it has no report.
+
+    Input:
+        A flat set of files to be trimmed in pairs
+    Output:
+        A flat set of trimmed file names
+    Args used:
+       * --root: the folder where trimmed and qc files will be placed
+       * --adapters: the filepath of the fasta adapters file
+       * --fastq_args: a string of fastq-mcf arguments setting the trim
+       * --quiet: silence the trim statistics if given
+       * --jobs: the number of files or pairs to trim at once
+       * --shards: the number of shards to split a large pair into
+       * --compress: write the trimmed files as BGZF, with .gz added to
+         their names
+       * --cache: the trim cache directory, if any
+       * --cache-size: the size cap of the trim cache, in GB
+       * --trim-qc: also write the quality control report of each trimmed
+         file
+       * --qc-format: write each report as 'json' or 'npz'
+    """
+
+    logger = logging.getLogger('rnaseqflow.WorkflowStage.NumpyTrimPairs')
+    """log4j-style class-logger"""
+
+    spec = '3.2'
+    """NumpyTrimPairs uses '3.2' as its specifier"""
+
+    def __init__(self, args):
+        """Run all checks needed to create a NumpyTrimPairs object
+
+        Check that NumPy can be imported
+        Read the fasta adapter file and the trim arguments
+        Create the output folder
+
+        :param args: an object with settable and gettable attributes
+        :type args: Namespace, SimpleNamespace, etc.
+        """
+        argfiller = ArgFiller(args)
+        argfiller.fill(['root', 'adapters', 'fastq_args', 'quiet', 'jobs',
+                        'cache', 'cache_size', 'trim_qc', 'qc_format'])
+
+        if trimming.np is None:
+            self.logger.error('numpy not found, cannot use NumpyTrimPairs')
+            raise ImportError('No module named numpy')
+
+        self.root = args.root
+        self.adapters = args.adapters
+        self.fastq_args = args.fastq_args
+        self.executable = 'rnaseqflow-trim'
+        self.quiet = args.quiet
+        self.scheduler = JobScheduler(args.jobs, self.quiet)
+        self.cache = TrimCache(args.cache, args.cache_size * 1024 ** 3) \
+            if args.cache else None
+        if self.cache:
+            self.cache.set_version(self.executable, trimming.VERSION)
+
+        self.trimmer = trimming.Trimmer.from_args(
+            trimming.read_adapters(self.adapters), self.fastq_args)
+        self._pool = None
+
+        # the trimming processes share the cores for compression
+        self.compress_workers = max(
+            1, available_cpus() // self.scheduler.jobs)
+
+        self.qc = args.trim_qc
+        self.qc_format = args.qc_format
+        self._qc_stats = {}
+
+        self.outdir = os.path.join(self.root, 'trimmed')
+        self.qcdir = os.path.join(self.root, 'qc')
+        for folder in [self.outdir] + ([self.qcdir] if self.qc else []):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                if not os.path.isdir(folder):
+                    raise
+
+        self._prepare_shards(args)
+
+    def run(self, stage_input):
+        """Trim pairs of files, running up to --jobs pairs at once
+
+        :param stage_input: filenames to be processed
+        :type stage_input: iterable(str)
+
+        :returns: a set of filenames holding the processed files
+        :rtype: set(str)
+        """
+
+        self._pool = self._start_pool(self.scheduler.jobs)
+        try:
+            return super(NumpyTrimPairs, self).run(stage_input)
+        finally:
+            self._close_pool()
+
+    def run_stream(self, stage_input):
+        """Trim each pair of files as soon as both mates arrive
+
+        :param stage_input: filenames to be processed
+        :type stage_input: iterable(str)
+
+        :returns: filenames holding the processed files
+        :rtype: generator
+        """
+
+        self._pool = self._start_pool(self.scheduler.jobs)
+        try:
+            for outfile_path in super(NumpyTrimPairs, self).run_stream(
+                    stage_input):
+                yield outfile_path
+        finally:
+            self._close_pool()
+
+    def _build(self, job):
+        """Trim a pair of files, or a single file without a mate, and with
+        --trim-qc write the report of each trimmed file
+
+        :param job: the job, as taken by FastQMCFTrimPairs._build
+        :type job: tuple
+
+        :returns: the paths of the trimmed files
+        :rtype: list(str)
+        """
+
+        outfiles = super(NumpyTrimPairs, self)._build(job)
+
+        if self.qc:
+            self._write_qc(outfiles)
+
+        return outfiles
+
+    def _write_qc(self, outfiles):
+        """Write the report of each trimmed file from the statistics of the
+        trim, or of its shards, or by reading it if it was not trimmed
+
+        :param outfiles: the trimmed files
+        :type outfiles: list(str)
+        """
+
+        pieces = [self._shard_paths(n, outfiles) for n in range(self.shards)]
+
+        for i, outfile_path in enumerate(outfiles):
+            found = [self._qc_stats.pop(p) for p in
+                     [outfile_path] + [paths[i] for paths in pieces]
+                     if p in self._qc_stats]
+            report = os.path.join(self.qcdir, qc.report_name(
+                outfile_path, self.qc_format))
+
+            if not os.path.isfile(outfile_path):
+                continue
+
+            if not found:
+                if os.path.isfile(report):
+                    continue
+                try:
+                    self._pool.apply(qc.qc_job, (outfile_path, report,
+                                                 self.qc_format,
+                                                 self.compress_workers))
+                except (IOError, OSError, ValueError) as e:
+                    self.logger.error('Could not check {0}: {1}'.format(
+                        outfile_path, e))
+                continue
+
+            stats = found[0]
+            for other in found[1:]:
+                stats.update(other)
+            stats.write(report, self.qc_format)
+
+    def _call(self, cmd, fnames):
+        """Trim one file or pair in the process pool
+
+        :param cmd: the equivalent fastq-mcf command, which names the
+            trimmed files after each -o
+        :type cmd: list(str)
+
+        :param fnames: the files to trim
+        :type fnames: list(str)
+
+        :returns: 0 if the files were trimmed, otherwise 1
+        :rtype: int
+        """
+
+        outfiles = [cmd[i + 1] for i, word in enumerate(cmd) if word == '-o']
+
+        return self._trim_in_pool(fnames, outfiles, logging.INFO)
+
+    def _call_shard(self, cmd, ranges, outfiles):
+        """Trim one shard in the process pool, reading its byte ranges
+        directly
+
+        :param cmd: the equivalent fastq-mcf command
+        :type cmd: list(str)
+
+        :param ranges: the (path, start, end) byte range of each input file
+        :type ranges: list(tuple(str, int, int))
+
+        :param outfiles: the trimmed shards
+        :type outfiles: list(str)
+
+        :returns: 0 if the shard was trimmed, otherwise 1, and None for the
+            resources used
+        :rtype: tuple(int, None)
+        """
+
+        return self._trim_in_pool(ranges, outfiles, logging.DEBUG), None
+
+    def _call_compressed(self, call, cmd, outfiles):
+        """Run call, which writes .gz outputs as BGZF itself
+
+        :returns: the result of call
+        :rtype: tuple(int, None)
+        """
+
+        return call(cmd)
+
+    def _trim_in_pool(self, infiles, outfiles, level):
+        """Trim files or byte ranges in the process pool and log the result
+
+        :param infiles: the files, or (path, start, end) byte ranges, to trim
+        :type infiles: list
+
+        :param outfiles: the trimmed file for each input
+        :type outfiles: list(str)
+
+        :param level: the logging level of the trim statistics
+        :type level: int
+
+        :returns: 0 if the files were trimmed, otherwise 1
+        :rtype: int
+        """
+
+        names = ' and '.join(os.path.basename(f) for f in outfiles)
+
+        try:
+            stats = self._pool.apply(trimming.trim_job,
+                                     (self.trimmer, infiles, outfiles,
+                                      self.compress_workers, self.qc))
+        except (IOError, OSError, ValueError) as e:
+            self.logger.error('Could not trim {0}: {1}'.format(names, e))
+            returncode = 1
+        else:
+            if self.qc:
+                self._qc_stats.update(zip(outfiles, stats['qc']))
+            if not self.quiet:
+                self.logger.log(
+                    level, '{0}: {1} of {2} reads kept, {3} clipped'.format(
+                        names, stats['kept'], stats['reads'],
+                        stats['clipped']))
+            returncode = 0
+
+        self.scheduler.exit_codes.append(returncode)
+
+        return returncode
+
+    def _close_pool(self):
+        """Stop the trimming processes"""
+
+        if self._pool is not None:
+            self._stop_pool(self._pool)
+            self._pool = None
+
+
+class MergedInputs(object):
+    """Feed fastq-mcf the merged files of MergeSplitFiles without writing them
+
+    Mixed into a fastq-mcf WorkflowStage, this groups and orders parts the
+    way MergeSplitFiles does, and gives fastq-mcf a named pipe in place of
+    each merged file.  The parts are written into the pipe while fastq-mcf
+    reads it, so the merged file never reaches the disk.  The trimmed files
+    have the same names as those of MergeSplitFiles followed by the trim.
+
+    fastq-mcf must read each input once, from start to end.  If it tries to
+    open a pipe a second time, it fails and the failure is logged.
+    """
+
+    def _prepare_pipes(self, args):
+        """Check that named pipes can be used and make a folder for them
+
+        Pipes left behind by an earlier run are removed, so that they are not
+        found by FindFiles in this one
+
+        :param args: an object with settable and gettable attributes
+        :type args: Namespace, SimpleNamespace, etc.
+        """
+
+        argfiller = ArgFiller(args)
+        argfiller.fill(['ext', 'blocksize'])
+
+        self.ext = args.ext
+        self.blocksize = args.blocksize
+        self._parts = {}
+
+        if not hasattr(os, 'mkfifo'):
+            self.logger.error('Named pipes are not supported on this system, '
+                              'cannot use {0}'.format(type(self).__name__))
+            raise OSError('os.mkfifo is not available')
+
+        self.pipedir = os.path.join(self.outdir, '.pipes')
+        if os.path.isdir(self.pipedir):
+            shutil.rmtree(self.pipedir)
+        os.makedirs(self.pipedir)
+
+    def _organize_pipes(self, files):
+        """Group and order parts into one named pipe path per merged file
+
+        :param files: filenames to be organized
+        :type files: iterable(str)
+
+        :returns: the pipe paths, each named like the merged file it stands
+            for
+        :rtype: list(str)
+        """
+
+        organized = MergeSplitFiles._organize_files(files)
+
+        for (sequence_id, direction), parts in organized.iteritems():
+            pipe = os.path.join(self.pipedir, 'merged_' + sequence_id +
+                                '_' + direction + self.ext)
+
+            numbers = [parse_filename(f).part for f in parts]
+            if numbers != range(1, len(parts) + 1):
+                self.logger.error(
+                    'The parts of {0} are numbered {1}.  Files must be '
+                    'missing, or there are extra files in the root folder '
+                    'that the merger cannot process.  It will not be '
+                    'trimmed'.format(os.path.basename(pipe), numbers))
+                continue
+
+            # only for scheduling; FifoFeeder streams each part to its end,
+            # whatever its size is by then
+            self._parts[pipe] = parts
+            remember_size(pipe, sum(file_size(f) for f in parts))
+
+        return sorted(self._parts)
+
+    def _inputs(self, fnames):
+        """List the parts streamed into the pipes fnames
+
+        :param fnames: the pipes passed to fastq-mcf
+        :type fnames: list(str)
+
+        :returns: the parts, in the order they are streamed
+        :rtype: list(str)
+        """
+
+        return [part for pipe in fnames for part in self._parts[pipe]]
+
+    def _call(self, cmd, fnames):
+        """Run one fastq-mcf command while streaming parts into its pipes
+
+        :param cmd: the command and its arguments
+        :type cmd: list(str)
+
+        :param fnames: the pipes passed to fastq-mcf in cmd
+        :type fnames: list(str)
+
+        :returns: the command's exit code, or 1 if fastq-mcf exited without
+            reading every part
+        :rtype: int
+        """
+
+        feeders = [FifoFeeder(pipe, self._parts[pipe], 1024 * self.blocksize)
+                   for pipe in fnames]
+
+        return self._call_feeding(cmd, feeders)
+
+
+class MergeTrimSolo(MergedInputs, FastQMCFTrimSolo):
+    """Merge files into fastq-mcf through named pipes one file at a time
+
+    The merged files are never written to disk.  See MergedInputs
+
+    Input:
+        An iterable of file names to be grouped, merged and trimmed
+    Output:
+        A flat set of trimmed file names
+    Args used:
+       * --root: the folder where trimmed files will be placed
+       * --ext: the file extention of the files to be merged
+       * --blocksize: number of kilobytes to write into a pipe at a time
+       * --adapters: the filepath of the fasta adapters file
+       * --fastq: the location of the fastq-mcf executable
+       * --fastq_args: a string of arguments to pass directly to fastq-mcf
+       * --quiet: silence fastq-mcf's output if given
+       * --jobs: the number of fastq-mcf processes to run at once
+       * --compress: write the trimmed files as BGZF, with .gz added to
+         their names
+       * --cache: the trim cache directory, if any
+       * --cache-size: the size cap of the trim cache, in GB
+    """
+
+    logger = logging.getLogger('rnaseqflow.WorkflowStage.MergeTrimSolo')
+    """log4j-style class-logger"""
+
+    spec = '4.0'
+    """MergeTrimSolo uses '4.0' as its specifier"""
+
+    def __init__(self, args):
+        """Run all checks needed to create a MergeTrimSolo object
+
+        :param args: an object with settable and gettable attributes
+        :type args: Namespace, SimpleNamespace, etc.
+        """
+
+        super(MergeTrimSolo, self).__init__(args)
+        self._prepare_pipes(args)
+
+    def run(self, stage_input):
+        """Merge and trim files, running up to --jobs files at once
+
+        :param stage_input: file names to be organized, merged and trimmed
+        :type stage_input: iterable(str)
+
+        :returns: a set of filenames holding the processed files
+        :rtype: set(str)
+        """
+
+        return super(MergeTrimSolo, self).run(
+            self._organize_pipes(stage_input))
+
+    def run_stream(self, stage_input):
+        """Merge and trim files, yielding each trimmed file when done
+
+        Grouping needs every input file, so no work begins until stage_input
+        is exhausted
+
+        :param stage_input: file names to be organized, merged and trimmed
+        :type stage_input: iterable(str)
+
+        :returns: filenames holding the processed files
+        :rtype: generator
+        """
+
+        for outfile_path in super(MergeTrimSolo, self).run_stream(
+                self._organize_pipes(stage_input)):
+            yield outfile_path
+
+
+class MergeTrimPairs(MergedInputs, FastQMCFTrimPairs):
+    """Merge files into fastq-mcf through named pipes in paired-end mode
+
+    The merged files are never written to disk.  See MergedInputs
+
+    Input:
+        An iterable of file names to be grouped, merged and trimmed in pairs
+    Output:
+        A flat set of trimmed file names
+    Args used:
+       * --root: the folder where trimmed files will be placed
+       * --ext: the file extention of the files to be merged
+       * --blocksize: number of kilobytes to write into a pipe at a time
+       * --adapters: the filepath of the fasta adapters file
+       * --fastq: the location of the fastq-mcf executable
+       * --fastq_args: a string of arguments to pass directly to fastq-mcf
+       * --quiet: silence fastq-mcf's output if given
+       * --jobs: the number of fastq-mcf processes to run at once
+       * --compress: write the trimmed files as BGZF, with .gz added to
+         their names
+       * --cache: the trim cache directory, if any
+       * --cache-size: the size cap of the trim cache, in GB
+    """
+
+    logger = logging.getLogger('rnaseqflow.WorkflowStage.MergeTrimPairs')
+    """log4j-style class-logger"""
+
+    spec = '4.1'
+    """MergeTrimPairs uses '4.1' as its specifier"""
+
+    def __init__(self, args):
+        """Run all checks needed to create a MergeTrimPairs object
+
+        :param args: an object with settable and gettable attributes
+        :type args: Namespace, SimpleNamespace, etc.
+        """
+
+        super(MergeTrimPairs, self).__init__(args)
+        self._prepare_pipes(args)
+
+    def run(self, stage_input):
+        """Merge and trim pairs of files, running up to --jobs pairs at once
+
+        :param stage_input: file names to be organized, merged and trimmed
+        :type stage_input: iterable(str)
+
+        :returns: a set of filenames holding the processed files
+        :rtype: set(str)
+        """
+
+        return super(MergeTrimPairs, self).run(
+            self._organize_pipes(stage_input))
+
+    def run_stream(self, stage_input):
+        """Merge and trim pairs of files, yielding trimmed files when done
+
+        Grouping needs every input file, so no work begins until stage_input
+        is exhausted
+
+        :param stage_input: file names to be organized, merged and trimmed
+        :type stage_input: iterable(str)
+
+        :returns: filenames holding the processed files
+        :rtype: generator
+        """
+
+        for outfile_path in super(MergeTrimPairs, self).run_stream(
+                self._organize_pipes(stage_input)):
+            yield outfile_path
+
+
+class QualityControl(WorkflowStage):
+    """Compute quality control statistics of each file with NumPy
+
+    For each file, the mean quality, base composition and N rate at each
+    position, the GC content and the read length distribution are written
+    to a report named after it in a qc folder.  Reads are parsed in large
+    batches into matrices of bytes, and files are read in separate
+    processes, so --jobs of them use that many cores.  See qc.QualityStats
+
+    Every file is read again for its report.  Read the files of another
+    stage with --stages, such as 5@2 to check the merged files alongside
+    their trim rather than after it; with --stream each file is checked as
+    soon as it is written, while it is still in the page cache.  To compute
+    the reports of trimmed files without reading them again, give --trim-qc
+    to NumpyTrimPairs (3.2) instead.  The stage's output is the reports.
+
+    Input:
+        A flat set of FASTQ files, which may be gzipped
+    Output:
+        A flat set of report file names
+    Args used:
+       * --root: the folder where the reports will be placed
+       * --jobs: the number of files to read at once
+       * --qc-format: write each report as 'json' or 'npz'
+    """
+
+    logger = logging.getLogger('rnaseqflow.WorkflowStage.QualityControl')
+    """log4j-style class-logger"""
+
+    spec = '5'
+    """QualityControl uses '5' as its specifier"""
+
+    def __init__(self, args):
+        """Run all checks needed to create a QualityControl object
+
+        Check that NumPy can be imported
+        Create the output folder
+
+        :param args: an object with settable and gettable attributes
+        :type args: Namespace, SimpleNamespace, etc.
+        """
+
+        argfiller = ArgFiller(args)
+        argfiller.fill(['root', 'jobs', 'qc_format', 'quiet'])
+
+        if qc.np is None:
+            self.logger.error('numpy not found, cannot use QualityControl')
+            raise ImportError('No module named numpy')
+
+        self.root = args.root
+        self.jobs = args.jobs
+        self.fmt = args.qc_format
+        self.quiet = args.quiet
+        self._pool = None
+
+        # the checking processes share the cores for decompression
+        self.read_workers = max(1, available_cpus() // self.jobs)
+
+        self.outdir = os.path.join(self.root, 'qc')
+        try:
+            os.makedirs(self.outdir)
+        except OSError:
+            if not os.path.isdir(self.outdir):
+                raise
+
+    def run(self, stage_input):
+        """Compute the statistics of files, up to --jobs files at once
+
+        :param stage_input: filenames to be checked
+        :type stage_input: iterable(str)
+
+        :returns: a set of report filenames
+        :rtype: set(str)
+        """
+
+        return set(self.run_stream(stage_input))
+
+    def run_stream(self, stage_input):
+        """Compute the statistics of each file as soon as it arrives
+
+        :param stage_input: filenames to be checked
+        :type stage_input: iterable(str)
+
+        :returns: report filenames
+        :rtype: generator
+        """
+
+        self.logger.info('Beginning quality control')
+
+        self._pool = self._start_pool(self.jobs)
+        count = 0
+
+        try:
+            for outfile_path in self._map(self._build, stage_input,
+                                          self.jobs):
+                if outfile_path is not None:
+                    count += 1
+                    yield outfile_path
+        finally:
+            self._stop_pool(self._pool)
+            self._pool = None
+
+        self.logger.info('Wrote {0} quality control reports'.format(count))
+
+    def _outfile_path(self, fname):
+        """Build the path of the report of fname
+
+        :param fname: the file to be checked
+        :type fname: str
+
+        :returns: the path of the report
+        :rtype: str
+        """
+
+        return os.path.join(self.outdir, qc.report_name(fname, self.fmt))
+
+    def _build(self, fname):
+        """Compute and write the statistics of one file in the process pool
+
+        :param fname: the file to be checked
+        :type fname: str
+
+        :returns: the path of the report, or None if the file could not be
+            read
+        :rtype: str, None
+        """
+
+        start = time.time()
+        outfile_path = self._outfile_path(fname)
+        args = ['qc', self.fmt]
+
+        if self._completed([fname], [outfile_path], args):
+            self.logger.info('Skipping {0}, already checked: {1}'.format(
+                fname, outfile_path))
+            return outfile_path
+
+        try:
+            summary = self._pool.apply(qc.qc_job,
+                                       (fname, outfile_path, self.fmt,
+                                        self.read_workers))
+        except (IOError, OSError, ValueError) as e:
+            self.logger.error('Could not check {0}: {1}'.format(fname, e))
+            self._record([fname], [], args, 1, time.time() - start)
+            return None
+
+        if not self.quiet:
+            self.logger.info(
+                '{0}: {1} reads, GC {2:.1%}, N rate {3:.3%}'.format(
+                    os.path.basename(fname), summary['reads'],
+                    summary['gc_content'], summary['n_rate']))
+
+        self._record([fname], [outfile_path], args, 0, time.time() - start)
+
+        return outfile_path
@@ -95,6 +95,170 @@ class ArgFillerTest(unittest.TestCase):
 
         self.assertTrue(self.empty_args.quiet)
 
+    def test_fill_find_workers(self):
+        self.af.fill(['find_workers'])
+
+        self.assertEqual(self.empty_args.find_workers, 8)
+
+        self.empty_args.find_workers = 2
+        self.af.fill(['find_workers'])
+
+        self.assertEqual(self.empty_args.find_workers, 2)
+
+    def test_fill_merge_workers(self):
+        self.af.fill(['merge_workers'])
+
+        self.assertEqual(self.empty_args.merge_workers, 1)
+
+        self.empty_args.merge_workers = 4
+        self.af.fill(['merge_workers'])
+
+        self.assertEqual(self.empty_args.merge_workers, 4)
+
+    def test_fill_jobs(self):
+        self.af.fill(['jobs'])
+
+        self.assertGreaterEqual(self.empty_args.jobs, 1)
+
+        self.empty_args.jobs = 3
+        self.af.fill(['jobs'])
+
+        self.assertEqual(self.empty_args.jobs, 3)
+
+    def test_fill_shards(self):
+        self.af.fill(['shards'])
+
+        self.assertEqual(self.empty_args.shards, 1)
+
+        self.empty_args.shards = 8
+        self.af.fill(['shards'])
+
+        self.assertEqual(self.empty_args.shards, 8)
+
+    def test_fill_stage_workers(self):
+        self.af.fill(['stage_workers'])
+
+        self.assertEqual(self.empty_args.stage_workers, 1)
+
+        self.empty_args.stage_workers = 0
+        self.af.fill(['stage_workers'])
+
+        self.assertEqual(self.empty_args.stage_workers, 1)
+
+    def test_fill_compress(self):
+        self.af.fill(['compress'])
+
+        self.assertFalse(self.empty_args.compress)
+
+        self.empty_args.compress = True
+        self.af.fill(['compress'])
+
+        self.assertTrue(self.empty_args.compress)
+
+    def test_fill_merge_lanes(self):
+        self.af.fill(['merge_lanes'])
+
+        self.assertFalse(self.empty_args.merge_lanes)
+
+        self.empty_args.merge_lanes = True
+        self.af.fill(['merge_lanes'])
+
+        self.assertTrue(self.empty_args.merge_lanes)
+
+    def test_fill_trim_qc(self):
+        self.af.fill(['trim_qc'])
+
+        self.assertFalse(self.empty_args.trim_qc)
+
+        self.empty_args.trim_qc = True
+        self.af.fill(['trim_qc'])
+
+        self.assertTrue(self.empty_args.trim_qc)
+
+    def test_fill_min_free(self):
+        self.af.fill(['min_free'])
+
+        self.assertEqual(self.empty_args.min_free, 0)
+
+        self.empty_args.min_free = 2.5
+        self.af.fill(['min_free'])
+
+        self.assertEqual(self.empty_args.min_free, 2.5)
+
+    def test_fill_delete_intermediates(self):
+        self.af.fill(['delete_intermediates'])
+
+        self.assertFalse(self.empty_args.delete_intermediates)
+
+        self.empty_args.delete_intermediates = True
+        self.af.fill(['delete_intermediates'])
+
+        self.assertTrue(self.empty_args.delete_intermediates)
+
+    def test_fill_qc_format(self):
+        self.af.fill(['qc_format'])
+
+        self.assertEqual(self.empty_args.qc_format, 'json')
+
+        self.empty_args.qc_format = 'npz'
+        self.af.fill(['qc_format'])
+
+        self.assertEqual(self.empty_args.qc_format, 'npz')
+
+    def test_fill_gzip_merge(self):
+        self.af.fill(['gzip_merge'])
+
+        self.assertEqual(self.empty_args.gzip_merge, 'copy')
+
+        self.empty_args.gzip_merge = 'bgzf'
+        self.af.fill(['gzip_merge'])
+
+        self.assertEqual(self.empty_args.gzip_merge, 'bgzf')
+
+    def test_fill_cache(self):
+        self.af.fill(['cache', 'cache_size'])
+
+        self.assertIsNone(self.empty_args.cache)
+        self.assertEqual(self.empty_args.cache_size, 100)
+
+        self.empty_args.cache = 'cachedir'
+        self.empty_args.cache_size = 5
+        self.af.fill(['cache', 'cache_size'])
+
+        self.assertEqual(self.empty_args.cache, 'cachedir')
+        self.assertEqual(self.empty_args.cache_size, 5)
+
+    def test_fill_reindex(self):
+        self.af.fill(['reindex'])
+
+        self.assertFalse(self.empty_args.reindex)
+
+        self.empty_args.reindex = True
+        self.af.fill(['reindex'])
+
+        self.assertTrue(self.empty_args.reindex)
+
+    def test_fill_report(self):
+        self.empty_args.root = '/'
+        self.af.fill(['report'])
+
+        self.assertEqual(self.empty_args.report, '/rnaseqflow_report.json')
+
+        self.empty_args.report = 'run.json'
+        self.af.fill(['report'])
+
+        self.assertEqual(self.empty_args.report, 'run.json')
+
+    def test_fill_resume(self):
+        self.af.fill(['resume'])
+
+        self.assertFalse(self.empty_args.resume)
+
+        self.empty_args.resume = True
+        self.af.fill(['resume'])
+
+        self.assertTrue(self.empty_args.resume)
+
     def test_trim(self):
         correct_docstring = "Tests for functions and classes in " \
             "rnaseqflow.cliutils\n\n" \
@@ -0,0 +1,96 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import gzip
+import json
+import shutil
+import tempfile
+from argparse import Namespace
+
+from rnaseqflow.bench import generate_tree, write_stub, run_benchmark
+from rnaseqflow.fileutils import parse_filename
+
+
+class BenchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'root')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_generate_tree(self):
+        files = generate_tree(self.root, samples=2, parts=3, reads=10,
+                              read_length=50, compress=True)
+
+        self.assertEqual(len(files), 2 * 2 * 3)
+
+        names = [parse_filename(f) for f in files]
+        self.assertEqual(len({(n.sequence_id, n.direction) for n in names}),
+                         4)
+        self.assertEqual({n.part for n in names}, {1, 2, 3})
+
+        lines = gzip.open(files[0]).read().splitlines()
+        self.assertEqual(len(lines), 40)
+        self.assertEqual(len(lines[1]), 50)
+        self.assertEqual(len(lines[3]), 50)
+
+        again = generate_tree(os.path.join(self.tmpdir, 'again'),
+                              samples=2, parts=3, reads=10, read_length=50,
+                              compress=True)
+        self.assertEqual(gzip.open(again[0]).read(),
+                         gzip.open(files[0]).read())
+
+    def test_run_benchmark(self):
+        generate_tree(self.root, samples=2, parts=2, reads=10)
+
+        adapters = os.path.join(self.tmpdir, 'adapters.fasta')
+        with open(adapters, 'w') as fasta:
+            fasta.write('>a\nAGATCGGAAGAGC\n')
+
+        args = Namespace(
+            root=self.root, ext='.fastq', blocksize=64, merge_workers=2,
+            find_workers=2, reindex=True, gzip_merge='copy',
+            adapters=adapters,
+            fastq=write_stub(os.path.join(self.tmpdir, 'fastq-mcf')),
+            fastq_args='-q 30', quiet=True, jobs=2, cache=None,
+            cache_size=1)
+
+        results = run_benchmark(args, ['1', '2', '3.1'], repeat=2)
+
+        self.assertEqual(results['1']['files_out'], 8)
+        self.assertEqual(results['2']['files_out'], 4)
+        self.assertEqual(results['3.1']['files_out'], 4)
+        self.assertEqual(results['3.1']['bytes_out'],
+                         results['2']['bytes_out'])
+        self.assertEqual(len(results['3.1']['seconds']), 2)
+
+        json.dumps(results)
+
+        self.assertEqual(sorted(os.listdir(self.root)),
+                         ['Sample_1', 'Sample_2'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import shutil
+import tempfile
+
+import mock
+
+from rnaseqflow.cache import TrimCache
+
+
+class TrimCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = TrimCache(os.path.join(self.tmpdir, 'cache'), 100)
+
+        self.infile = self._write('in.fastq', 'ACGT')
+        self.adapters = self._write('adapters.fa', '>a\nAGATC\n')
+
+        patcher = mock.patch.object(
+            TrimCache, 'program_version', return_value='1.04')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        return path
+
+    def _key(self, args='-q 30'):
+        return self.cache.key([self.adapters, self.infile], 'fastq-mcf',
+                              args.split())
+
+    def test_key(self):
+        key = self._key()
+
+        self.assertEqual(key, self._key(' -q   30 '))
+        self.assertNotEqual(key, self._key('-q 20'))
+
+        self._write('in.fastq', 'TGCA')
+        os.utime(self.infile, (1, 1))
+        self.assertNotEqual(key, self._key())
+
+        TrimCache.program_version.return_value = '1.05'
+        self.assertNotEqual(key, self._key())
+
+    def test_store_fetch(self):
+        key = self._key()
+        outfile = self._write('out.fastq', 'AC')
+        restored = os.path.join(self.tmpdir, 'restored.fastq')
+
+        self.assertFalse(self.cache.fetch(key, [restored]))
+
+        self.cache.store(key, [outfile])
+        os.remove(outfile)
+
+        self.assertTrue(self.cache.fetch(key, [restored]))
+        with open(restored, 'rb') as fh:
+            self.assertEqual(fh.read(), 'AC')
+
+        self.assertFalse(self.cache.fetch(key, [restored, outfile]))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_evict(self):
+        outfile = self._write('out.fastq', 'A' * 40)
+        self.cache.max_bytes = 1000
+
+        for i, key in enumerate(['old', 'used', 'new']):
+            self.cache.store(key, [outfile])
+            os.utime(os.path.join(self.cache.path, key), (i, i))
+
+        os.utime(os.path.join(self.cache.path, 'used'), None)
+        self.cache.max_bytes = 120
+        self.assertEqual(self.cache.evict(), 1)
+
+        self.assertEqual(sorted(os.listdir(self.cache.path)),
+                         ['new', 'used'])
@@ -0,0 +1,90 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import shutil
+import tempfile
+
+from rnaseqflow.checkpoint import Manifest
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, Manifest.FILENAME)
+
+        self.infile = os.path.join(self.tmpdir, 'in.fastq')
+        self.outfile = os.path.join(self.tmpdir, 'out.fastq')
+
+        for f in (self.infile, self.outfile):
+            with open(f, 'wb') as fh:
+                fh.write('@read\nACGT\n+\nIIII\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_resume(self):
+        manifest = Manifest(self.path)
+        manifest.record('2', [self.infile], [self.outfile], ['-q'], 0)
+
+        self.assertFalse(
+            manifest.completed('2', [self.infile], [self.outfile], ['-q']))
+
+        with open(self.path, 'a') as fh:
+            fh.write('{"stage": "2", "inp')
+
+        manifest = Manifest(self.path, resume=True)
+
+        self.assertTrue(
+            manifest.completed('2', [self.infile], [self.outfile], ['-q']))
+        self.assertFalse(
+            manifest.completed('3.0', [self.infile], [self.outfile], ['-q']))
+        self.assertFalse(
+            manifest.completed('2', [self.infile], [self.outfile], ['-l']))
+        self.assertEqual(manifest.skipped, 1)
+
+        with open(self.outfile, 'ab') as fh:
+            fh.write('@trunc')
+
+        self.assertFalse(
+            manifest.completed('2', [self.infile], [self.outfile], ['-q']))
+
+        manifest.record('2', [self.infile], [self.outfile], ['-q'], 0)
+        os.utime(self.infile, (1e9, 1e9))
+
+        self.assertFalse(
+            manifest.completed('2', [self.infile], [self.outfile], ['-q']))
+
+        manifest.record('2', [self.infile], [self.outfile], ['-q'], 1)
+
+        self.assertFalse(
+            Manifest(self.path, resume=True).completed(
+                '2', [self.infile], [self.outfile], ['-q']))
+
+        self.assertFalse(
+            Manifest(self.path).completed(
+                '2', [self.infile], [self.outfile], ['-q']))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import gzip
+import shutil
+import tempfile
+import mock
+
+import numpy as np
+
+from rnaseqflow import fastqio
+from rnaseqflow.fastqio import FastqReader, fastq_batches, split_fastq
+
+
+class FastqIOTest(unittest.TestCase):
+
+    FASTQ = os.path.join(os.path.dirname(__file__), 'fixtures',
+                         'output_samples', 'MergeSplitTest',
+                         'merged_NIK1-2_TGACCA_R1.fastq')
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'reads.fastq')
+        shutil.copy(self.FASTQ, self.path)
+
+        with open(self.FASTQ) as fastq:
+            lines = fastq.read().split('\n')[:-1]
+        self.records = zip([l[1:] for l in lines[::4]], lines[1::4],
+                           lines[3::4])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_FastqReader(self):
+        with FastqReader(self.path) as reader:
+            self.assertEqual([tuple(map(str, r)) for r in reader],
+                             self.records)
+            self.assertEqual(len(reader), len(self.records))
+            self.assertEqual(tuple(map(str, reader[7])), self.records[7])
+            self.assertEqual(tuple(map(str, reader[-1])), self.records[-1])
+            self.assertRaises(IndexError, reader.__getitem__, len(reader))
+            self.assertEqual([str(r.name) for r in reader.records(3, 5)],
+                             [r[0] for r in self.records[3:5]])
+
+            offset = reader.offset(10)
+            self.assertEqual(reader.record_at(offset), 10)
+            self.assertEqual(reader.record_at(offset + 1), 11)
+            self.assertEqual(reader.offset(len(reader)),
+                             os.path.getsize(self.path))
+
+            cuts = reader.split(4)
+            self.assertEqual(len(cuts), 5)
+            self.assertEqual((cuts[0], cuts[-1]), (0, len(reader)))
+
+            offsets = reader.offsets
+
+        self.assertTrue(os.path.isfile(self.path + '.fqi'))
+
+        with mock.patch.object(FastqReader, '_build_index') as build:
+            with FastqReader(self.path) as reader:
+                self.assertEqual(reader.offsets, offsets)
+            self.assertFalse(build.called)
+
+        with open(self.path, 'a') as fastq:
+            fastq.write('@new\nACGT\n+\nIIII')
+
+        with mock.patch.object(fastqio, 'np', None):
+            with FastqReader(self.path) as reader:
+                self.assertEqual(len(reader), len(self.records) + 1)
+                self.assertEqual(str(reader[-1].quality), 'IIII')
+
+    def test_FastqReader_invalid(self):
+        with open(self.path, 'a') as fastq:
+            fastq.write('@truncated\nACGT\n')
+
+        with FastqReader(self.path) as reader:
+            self.assertRaises(ValueError, len, reader)
+
+        with open(self.path, 'w') as fastq:
+            fastq.write('>a\nACGT\n+\nIIII\n')
+
+        with FastqReader(self.path, persist=False) as reader:
+            self.assertRaises(ValueError, len, reader)
+            self.assertRaises(ValueError, list, reader)
+
+        self.assertFalse(os.path.exists(self.path + '.fqi'))
+
+    def test_FastqReader_gzip(self):
+        path = self.path + '.gz'
+        with open(self.FASTQ, 'rb') as fastq, gzip.open(path, 'wb') as gz:
+            gz.write(fastq.read())
+
+        with mock.patch.object(FastqReader, 'SCAN_BYTES', 1000):
+            with FastqReader(path) as reader:
+                self.assertEqual(reader.size, os.path.getsize(self.FASTQ))
+                self.assertEqual([tuple(map(str, r)) for r in reader],
+                                 self.records)
+                self.assertEqual(tuple(map(str, reader[7])), self.records[7])
+                self.assertEqual([str(r.name) for r in reader.records(3, 5)],
+                                 [r[0] for r in self.records[3:5]])
+
+                with FastqReader(self.path) as plain:
+                    self.assertEqual(reader.offsets, plain.offsets)
+
+        self.assertTrue(os.path.isfile(path + '.fqi'))
+        self.assertTrue(os.path.isfile(path + '.zidx'))
+
+    def test_split_fastq(self):
+        r1, r2 = [os.path.join(self.tmpdir, name)
+                  for name in ('r1.fq', 'r2.fq')]
+        with open(r1, 'w') as f1, open(r2, 'w') as f2:
+            for i in range(50):
+                f1.write('@r{0}\n{1}\n+\n{1}\n'.format(i, 'A' * (i % 7 + 1)))
+                f2.write('@r{0}\n{1}\n+\n{1}\n'.format(i, 'C' * (40 - i)))
+
+        for shards in (1, 4, 500):
+            split = split_fastq([r1, r2], shards)
+
+            self.assertLessEqual(len(split), shards)
+            self.assertEqual(split[0][0][1], 0)
+            self.assertEqual(split[-1][1][2], os.path.getsize(r2))
+
+            for ranges in split:
+                records = []
+                for path, start, end in ranges:
+                    with open(path) as fastq:
+                        fastq.seek(start)
+                        lines = fastq.read(end - start).split('\n')[:-1]
+                    self.assertEqual(len(lines) % 4, 0)
+                    records.append(lines[::4])
+
+                self.assertTrue(records[0])
+                self.assertEqual(records[0], records[1])
+
+        self.assertEqual(len(split_fastq([r1], 4, min_bytes=10 ** 6)), 1)
+
+        with open(r2, 'a') as f2:
+            f2.write('@extra\nA\n+\nI\n')
+        self.assertRaises(ValueError, split_fastq, [r1, r2], 4)
+
+    def test_fastq_batches(self):
+        with mock.patch.object(fastqio, 'CHUNK_BYTES', 1000):
+            batches = list(fastq_batches(self.path, 7))
+
+        self.assertEqual([len(b) for b in batches[:-1]],
+                         [7] * (len(batches) - 1))
+        self.assertEqual(
+            [tuple(map(str, r)) for b in batches for r in b.records()],
+            self.records)
+
+        with FastqReader(self.path) as reader:
+            start, end = reader.offset(3), reader.offset(9)
+        self.assertEqual(
+            [str(r.name) for b in fastq_batches((self.path, start, end))
+             for r in b.records()],
+            [r[0] for r in self.records[3:9]])
+
+        batch = batches[0]
+        out = os.path.join(self.tmpdir, 'out.fastq')
+        with open(out, 'wb') as outfile:
+            batch.write(outfile)
+            batch.write(outfile, np.arange(7) % 2 == 0,
+                        np.repeat(2, 7), np.repeat(5, 7))
+
+        lines = open(out).read().split('\n')[:-1]
+        self.assertEqual(lines[:28], open(self.path).read().split('\n')[:28])
+        self.assertEqual(lines[28::4], ['@' + r[0] for r in
+                                         self.records[0:7:2]])
+        self.assertEqual(lines[29::4], [r[1][2:5] for r in
+                                         self.records[0:7:2]])
+        self.assertEqual(set(lines[30::4]), set(['+']))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,282 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import gzip
+import fnmatch
+import shutil
+import tempfile
+import mock
+
+from rnaseqflow import fileutils
+from rnaseqflow.fileutils import (
+        parse_filename, walk_files, file_size, remember_size, forget_files,
+        FileIndex, FifoFeeder, FifoCompressor, append_file, write_file_at
+        )
+from rnaseqflow.scheduler import Executor
+
+
+class FileUtilsTest(unittest.TestCase):
+
+    FIXTURES = os.path.join(os.path.dirname(__file__),
+                            'fixtures')
+
+    def test_parse_filename(self):
+        name = parse_filename('/data/Sample_NIK1/NIK1-2_TGACCA_L001_R2_003.fastq')
+
+        self.assertEqual(name.sequence_id, 'NIK1-2_TGACCA')
+        self.assertEqual(name.sample, 'NIK1-2')
+        self.assertEqual(name.barcode, 'TGACCA')
+        self.assertEqual(name.lane, 1)
+        self.assertEqual(name.direction, 'R2')
+        self.assertEqual(name.part, 3)
+
+        self.assertIs(
+            parse_filename('/data/Sample_NIK1/NIK1-2_TGACCA_L001_R2_003.fastq'),
+            name)
+
+        name = parse_filename('merged_NIK4-7_ATCACG_R1.fastq.gz')
+
+        self.assertEqual(name.sequence_id, 'merged_NIK4-7_ATCACG')
+        self.assertEqual(name.lane, 0)
+        self.assertEqual(name.direction, 'R1')
+        self.assertEqual(name.part, 0)
+
+        name = parse_filename('Undetermined_L001_R1_001.fastq')
+
+        self.assertEqual(name.sequence_id, '')
+        self.assertEqual(name.direction, '')
+        self.assertEqual(name.part, 0)
+
+    def test_walk_files(self):
+        for ext in ('.fastq', '.fastq.gz'):
+            foundfiles = {}
+            for root, _, files in os.walk(self.FIXTURES):
+                for basename in files:
+                    if fnmatch.fnmatch(basename, '*' + ext):
+                        filename = os.path.join(root, basename)
+                        foundfiles[filename] = os.path.getsize(filename)
+
+            for workers in (1, 4):
+                self.assertDictEqual(
+                    dict(walk_files(self.FIXTURES, (ext,), workers)),
+                    foundfiles)
+
+            executor = Executor(threads=2)
+            self.addCleanup(executor.close)
+            self.assertDictEqual(
+                dict(walk_files(self.FIXTURES, (ext,), 4,
+                                executor=executor)),
+                foundfiles)
+
+            for filename, size in foundfiles.iteritems():
+                self.assertEqual(file_size(filename), size)
+
+            remember_size(filename, size + 1)
+            self.assertEqual(file_size(filename), size + 1)
+            forget_files()
+            self.assertEqual(file_size(filename), size)
+
+        self.assertListEqual(
+            list(walk_files(os.path.join(self.FIXTURES, 'missing'),
+                            ('.fastq',), 4)),
+            [])
+
+    def test_FileIndex(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+
+        def touch(*parts):
+            path = os.path.join(root, *parts)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write('@read\nACGT\n+\nIIII\n')
+            return path
+
+        ages = iter(xrange(1000000000, 2000000000, 1000))
+
+        def age(*dirs):
+            mtime = next(ages)
+            for d in dirs:
+                os.utime(os.path.join(root, d), (mtime, mtime))
+
+        def search(reindex=False):
+            index = FileIndex(root, ('.fastq',), reindex)
+            found = set(path for path, _ in walk_files(
+                root, ('.fastq',), 2, index))
+            index.save()
+            return found, index
+
+        expected = {touch('a', 'x_R1_001.fastq'), touch('b', 'y_R1_001.fastq')}
+        touch('b', 'notes.txt')
+        age('', 'a', 'b')
+
+        found, index = search()
+        self.assertSetEqual(found, expected)
+        self.assertEqual(index.hits, 0)
+
+        os.utime(root, (1e9, 1e9))
+        found, index = search()
+        self.assertSetEqual(found, expected)
+        self.assertEqual(index.hits, 3)
+
+        expected.add(touch('b', 'y_R1_002.fastq'))
+        age('b')
+        os.utime(root, (1e9, 1e9))
+
+        found, index = search()
+        self.assertSetEqual(found, expected)
+        self.assertEqual(index.hits, 2)
+        self.assertEqual(index.misses, 1)
+
+        found, index = search(reindex=True)
+        self.assertSetEqual(found, expected)
+        self.assertEqual(index.hits, 0)
+
+    def test_append_file(self):
+        parts = sorted(os.path.join(self.FIXTURES, 'input_samples', f)
+                       for f in os.listdir(
+                           os.path.join(self.FIXTURES, 'input_samples'))
+                       if f.startswith('NIK1-2_TGACCA_L001_R1'))
+        expected = ''.join(open(part, 'rb').read() for part in parts)
+
+        outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outdir)
+
+        engines = [fileutils._kernel_copies[i:]
+                   for i in range(len(fileutils._kernel_copies))] + [[]]
+
+        for engine in engines:
+            outpath = os.path.join(outdir, 'merged.fastq')
+
+            with mock.patch.object(fileutils, '_kernel_copies', engine):
+                with mock.patch.object(fileutils, '_reflink',
+                                       return_value=False):
+                    with open(outpath, 'wb') as outfile:
+                        methods = [append_file(outfile, part, 1024)
+                                   for part in parts]
+                        self.assertEqual(outfile.tell(), len(expected))
+
+            self.assertEqual(open(outpath, 'rb').read(), expected)
+            self.assertEqual(set(methods),
+                             {engine[0][0] if engine else 'buffered'})
+
+    def test_write_file_at(self):
+        parts = sorted(os.path.join(self.FIXTURES, 'input_samples', f)
+                       for f in os.listdir(
+                           os.path.join(self.FIXTURES, 'input_samples'))
+                       if f.startswith('NIK1-2_TGACCA_L001_R1') and
+                       f.endswith('.fastq'))
+        expected = ''.join(open(part, 'rb').read() for part in parts)
+
+        outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outdir)
+
+        engines = [fileutils._kernel_copies[i:]
+                   for i in range(len(fileutils._kernel_copies))] + [[]]
+
+        for engine in engines:
+            outpath = os.path.join(outdir, 'merged.fastq')
+            with open(outpath, 'wb') as outfile:
+                outfile.truncate(len(expected))
+
+            offset = len(expected)
+            with mock.patch.object(fileutils, '_kernel_copies', engine):
+                with open(outpath, 'r+b') as outfile:
+                    for part in reversed(parts):
+                        offset -= os.path.getsize(part)
+                        method, size = write_file_at(outfile, offset, part,
+                                                     1024)
+                        self.assertEqual(size, os.path.getsize(part))
+                        self.assertEqual(outfile.tell(), offset + size)
+
+            self.assertEqual(open(outpath, 'rb').read(), expected)
+            self.assertEqual(method,
+                             engine[0][0] if engine else 'buffered')
+
+            # a part larger than its region is cut short, not overrun
+            with mock.patch.object(fileutils, '_kernel_copies', engine):
+                with open(outpath, 'r+b') as outfile:
+                    method, size = write_file_at(outfile, 0, parts[-1],
+                                                 1024, 10)
+                    self.assertEqual(size, os.path.getsize(parts[-1]))
+                    self.assertEqual(outfile.tell(), 10)
+
+            self.assertEqual(open(outpath, 'rb').read(),
+                             open(parts[-1], 'rb').read(10) + expected[10:])
+
+    def test_FifoFeeder(self):
+        parts = sorted(os.path.join(self.FIXTURES, 'input_samples', f)
+                       for f in os.listdir(
+                           os.path.join(self.FIXTURES, 'input_samples'))
+                       if f.startswith('NIK1-2_TGACCA_L001_R1'))
+        expected = ''.join(open(part, 'rb').read() for part in parts)
+
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'merged.fastq')
+
+        with FifoFeeder(path, parts, 1024) as feeder:
+            with open(path, 'rb') as pipe:
+                self.assertEqual(pipe.read(), expected)
+            self.assertFalse(os.path.exists(path))
+
+        self.assertTrue(feeder.complete)
+
+        with FifoFeeder(path, parts) as feeder:
+            pass
+
+        self.assertFalse(feeder.complete)
+        self.assertIsNone(feeder.error)
+        self.assertFalse(os.path.exists(path))
+
+        with FifoFeeder(path, [(parts[0], 10, 30), parts[1]]) as feeder:
+            with open(path, 'rb') as pipe:
+                self.assertEqual(pipe.read(), open(parts[0]).read()[10:30] +
+                                 open(parts[1]).read())
+
+    def test_FifoCompressor(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'trimmed.fastq')
+        outfile_path = path + '.gz'
+        data = open(os.path.join(self.FIXTURES, 'test_adapters.fasta')).read()
+
+        with FifoCompressor(path, outfile_path, 2, 7) as compressor:
+            with open(path, 'wb') as pipe:
+                for _ in range(200):
+                    pipe.write(data)
+
+        self.assertTrue(compressor.complete)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(gzip.open(outfile_path).read(), data * 200)
+
+        with FifoCompressor(path, outfile_path) as compressor:
+            pass
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(gzip.open(outfile_path).read(), '')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import gzip
+import random
+import shutil
+import tempfile
+import threading
+import mock
+
+from rnaseqflow.gziputils import (
+        check_gzip, verify_gzip, BgzfWriter, BGZF_EOF, GzipIndex, GzipReader
+        )
+from rnaseqflow.scheduler import Executor
+
+
+class GzipUtilsTest(unittest.TestCase):
+
+    FIXTURES = os.path.join(os.path.dirname(__file__),
+                            'fixtures')
+
+    PART = os.path.join(FIXTURES, 'input_samples',
+                        'NIK1-2_TGACCA_L001_R1_001.fastq.gz')
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.data = gzip.open(self.PART).read()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        return path
+
+    def test_verify_gzip(self):
+        raw = open(self.PART, 'rb').read()
+
+        self.assertEqual(verify_gzip(self.PART, blocksize=7),
+                         (1, len(self.data)))
+
+        two = self._write('two.gz', raw + raw + '\x00' * 4)
+        pieces = []
+        self.assertEqual(verify_gzip(two, pieces.append),
+                         (2, 2 * len(self.data)))
+        self.assertEqual(''.join(pieces), self.data * 2)
+
+        corrupt = self._write('corrupt.gz', raw[:-8] + '\x00' + raw[-7:])
+        self.assertRaises(IOError, verify_gzip, corrupt)
+
+        truncated = self._write('truncated.gz', raw[:-3])
+        self.assertRaises(IOError, verify_gzip, truncated)
+
+        self.assertRaises(IOError, verify_gzip,
+                          self._write('plain.fastq', self.data))
+
+    def test_BgzfWriter(self):
+        path = os.path.join(self.tmpdir, 'out.gz')
+        data = self.data * 20
+
+        with open(path, 'wb') as fh:
+            with BgzfWriter(fh) as bgzf:
+                for start in range(0, len(data), 1000):
+                    bgzf.write(data[start:start + 1000])
+
+        self.assertEqual(gzip.open(path).read(), data)
+        self.assertEqual(open(path, 'rb').read()[-len(BGZF_EOF):], BGZF_EOF)
+
+        serial = open(path, 'rb').read()
+        with BgzfWriter.open(path, workers=3) as bgzf:
+            for start in range(0, len(data), 1000):
+                bgzf.write(data[start:start + 1000])
+
+        self.assertTrue(bgzf.fileobj.closed)
+        self.assertEqual(open(path, 'rb').read(), serial)
+
+        # a shared executor's threads are used, and no others are started
+        executor = Executor(threads=2)
+        self.addCleanup(executor.close)
+        threads = threading.active_count()
+        with BgzfWriter.open(path, workers=8, executor=executor) as bgzf:
+            for start in range(0, len(data), 1000):
+                bgzf.write(data[start:start + 1000])
+
+        self.assertEqual(open(path, 'rb').read(), serial)
+        self.assertLessEqual(threading.active_count(), threads + 2)
+        self.assertListEqual(sorted(executor.map(abs, range(5), 2)),
+                             range(5))
+
+        self.assertEqual(check_gzip(path), bgzf.blocks + 1)
+        self.assertEqual(verify_gzip(path), (bgzf.blocks + 1, len(data)))
+
+        raw = open(path, 'rb').read()
+        self.assertRaises(IOError, check_gzip,
+                          self._write('truncated.gz', raw[:-100]))
+
+    def test_check_gzip(self):
+        self.assertIsNone(check_gzip(self.PART))
+
+        self.assertRaises(IOError, check_gzip,
+                          self._write('plain.fastq', self.data))
+        self.assertRaises(IOError, check_gzip,
+                          self._write('short.gz', open(self.PART).read(12)))
+
+    def test_GzipReader(self):
+        bases = random.Random(1)
+        data = ''.join(bases.choice('ACGT\n') for _ in range(300000))
+        whole = os.path.join(self.tmpdir, 'whole.gz')
+        with gzip.open(whole, 'wb') as fh:
+            fh.write(data)
+
+        blocks = os.path.join(self.tmpdir, 'blocks.gz')
+        with open(blocks, 'wb') as fh:
+            with BgzfWriter(fh) as bgzf:
+                bgzf.write(data)
+
+        for path in (whole, blocks):
+            reader = GzipReader(path, span=16384, workers=3)
+
+            self.assertEqual(reader.size, len(data))
+            self.assertGreater(len(reader.index.points), 2)
+            self.assertEqual(reader.read(), data)
+            for start, end in ((0, 1), (1000, 70000), (len(data) - 5, None),
+                               (33333, 33333)):
+                self.assertEqual(reader.read(start, end), data[start:end])
+
+            executor = Executor(threads=2)
+            self.addCleanup(executor.close)
+            shared = GzipReader(path, executor=executor)
+            self.assertEqual(shared.workers, 2)
+            self.assertEqual(shared.read(1000, 70000), data[1000:70000])
+
+            self.assertTrue(os.path.isfile(path + '.zidx'))
+            with mock.patch.object(GzipIndex, 'build') as build:
+                again = GzipReader(path, workers=1)
+                self.assertEqual(again.read(20000, 90000),
+                                 data[20000:90000])
+                self.assertFalse(build.called)
+
+        raw = open(whole, 'rb').read()
+        self.assertRaises(IOError, GzipReader(
+            self._write('truncated.gz', raw[:-100])).read)
+        self.assertRaises(IOError, GzipReader,
+                          self._write('plain.fastq', self.data))
+
+    def test_GzipReader_first_pass(self):
+        bases = random.Random(2)
+        data = ''.join(bases.choice('ACGT\n') for _ in range(300000))
+        path = os.path.join(self.tmpdir, 'reads.gz')
+        with gzip.open(path, 'wb') as fh:
+            fh.write(data)
+
+        # without an index, one pass both reads the file and indexes it
+        with mock.patch.object(GzipReader, '_inflate') as inflate:
+            reader = GzipReader(path, span=16384)
+            self.assertIsNone(reader.index)
+            self.assertEqual(''.join(reader.chunks(100, 200000)),
+                             data[100:200000])
+            self.assertIsNone(reader.index)
+            self.assertEqual(reader.read(), data)
+            self.assertFalse(inflate.called)
+
+        self.assertEqual(reader.size, len(data))
+        self.assertGreater(len(reader.index.points), 2)
+        self.assertTrue(os.path.isfile(path + '.zidx'))
+
+        with mock.patch.object(GzipIndex, 'scan') as scan:
+            again = GzipReader(path)
+            self.assertEqual(again.read(5000, 250000), data[5000:250000])
+            self.assertFalse(scan.called)
+
+    def test_GzipReader_members(self):
+        bases = random.Random(2)
+        data = ''.join(bases.choice('ACGT\n') for _ in range(3 * 1024 ** 2))
+
+        # far more than two members in each piece of the default span
+        blocks = self._write('blocks.gz', '')
+        with open(blocks, 'wb') as fh:
+            with BgzfWriter(fh) as bgzf:
+                bgzf.write(data)
+
+        size = len(data) // 20 + 1
+        parts = self._write('parts.gz', '')
+        with open(parts, 'wb') as fh:
+            for i in range(0, len(data), size):
+                with gzip.GzipFile(fileobj=fh, mode='wb') as gz:
+                    gz.write(data[i:i + size])
+
+        for path in (blocks, parts):
+            reader = GzipReader(path, workers=2, persist=False)
+
+            self.assertEqual(reader.size, len(data))
+            self.assertEqual(reader.read(), data)
+            self.assertEqual(reader.read(100000, 2500000),
+                             data[100000:2500000])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import mock
+
+import numpy as np
+
+from rnaseqflow import fastqio
+from rnaseqflow.fastqio import fastq_batches
+from rnaseqflow.qc import QualityStats, qc_file
+
+
+class QCTest(unittest.TestCase):
+
+    FASTQ = os.path.join(os.path.dirname(__file__), 'fixtures',
+                         'output_samples', 'MergeSplitTest',
+                         'merged_NIK1-2_TGACCA_R1.fastq')
+
+    READS = [('ACGTN', 'IIII#'), ('GGCC', '!!II'), ('AT', 'II'),
+             ('acgg', 'IIII')]
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, reads, newline='\n'):
+        path = os.path.join(self.tmpdir, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wb') as fastq:
+            for i, (sequence, quality) in enumerate(reads):
+                fastq.write(newline.join(['@r{0}'.format(i), sequence, '+',
+                                          quality]) + newline)
+        return path
+
+    def test_QualityStats(self):
+        summary = qc_file(self._write('reads.fastq', self.READS)).summary()
+
+        self.assertEqual(summary['reads'], 4)
+        self.assertEqual(summary['bases'], 15)
+        self.assertEqual(summary['mean_quality'],
+                         [30.0, 30.0, 40.0, 40.0, 2.0])
+        self.assertEqual(summary['composition']['G'],
+                         [0.25, 0.25, 0.6667, 0.3333, 0.0])
+        self.assertEqual(summary['composition']['N'][4], 1.0)
+        self.assertAlmostEqual(summary['n_rate'], 1 / 15.0)
+        self.assertAlmostEqual(summary['gc_content'], 9 / 14.0)
+        self.assertEqual(summary['length_histogram'],
+                         {'2': 1, '4': 2, '5': 1})
+        self.assertEqual(summary['gc_histogram'][0], 1)
+        self.assertEqual(summary['gc_histogram'][40], 1)
+        self.assertEqual(summary['gc_histogram'][75], 1)
+        self.assertEqual(summary['gc_histogram'][100], 1)
+
+        combined = QualityStats()
+        combined.update(qc_file(self._write('a.fastq', self.READS[:1])))
+        combined.update(qc_file(self._write('b.fastq', self.READS[1:])))
+        self.assertEqual(combined.summary(), summary)
+
+    def test_fastq_batches(self):
+        with open(self.FASTQ) as fastq:
+            lines = fastq.read().split('\n')[:-1]
+
+        old_chunk = fastqio.CHUNK_BYTES
+        fastqio.CHUNK_BYTES = 1000
+        self.addCleanup(setattr, fastqio, 'CHUNK_BYTES', old_chunk)
+
+        sequences = []
+        for batch in fastq_batches(self.FASTQ):
+            sequences.extend(row[:n].tostring() for row, n in
+                             zip(batch.sequences(), batch.lengths))
+        self.assertEqual(sequences, lines[1::4])
+
+        reads = self.READS * 100
+        expected = qc_file(self._write('plain.fastq', reads)).summary()
+        for name, newline in (('reads.fastq.gz', '\n'),
+                              ('crlf.fastq', '\r\n')):
+            self.assertEqual(
+                qc_file(self._write(name, reads, newline)).summary(),
+                expected)
+
+        gzipped = self._write('reads.fastq.gz', reads)
+        with mock.patch.object(fastqio, 'GzipReader',
+                               side_effect=OSError('no zlib')):
+            self.assertEqual(qc_file(gzipped).summary(), expected)
+
+        def failing(start, end):
+            yield open(self._write('part.fastq', reads[:10])).read()
+            raise OSError('zlib error -3')
+
+        with mock.patch.object(fastqio, 'GzipReader') as reader:
+            reader.return_value.chunks.side_effect = failing
+            self.assertRaises(OSError, qc_file, gzipped)
+
+        with open(self._write('last.fastq', self.READS), 'rb+') as fastq:
+            fastq.seek(-1, os.SEEK_END)
+            fastq.truncate()
+        self.assertEqual(qc_file(fastq.name).summary()['reads'], 4)
+
+        invalid = os.path.join(self.tmpdir, 'reads.fasta')
+        with open(invalid, 'w') as fasta:
+            fasta.write('>r0\nACGT\n>r1\nACGT\n')
+        self.assertRaises(ValueError, qc_file, invalid)
+
+        with open(invalid, 'w') as fastq:
+            fastq.write('@r0\nACGT\n+\nIII\n')
+        self.assertRaises(ValueError, qc_file, invalid)
+
+    def test_write(self):
+        stats = qc_file(self._write('reads.fastq', self.READS))
+
+        path = os.path.join(self.tmpdir, 'reads.qc.json')
+        stats.write(path)
+        self.assertEqual(json.load(open(path)), json.loads(
+            json.dumps(stats.summary())))
+
+        path = os.path.join(self.tmpdir, 'reads.qc.npz')
+        stats.write(path, 'npz')
+        arrays = np.load(path)
+        self.assertEqual(int(arrays['reads']), 4)
+        self.assertTrue((arrays['base_counts'] == stats.base_counts).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import json
+import sys
+import tempfile
+from argparse import Namespace
+
+from rnaseqflow.report import RunReport
+from rnaseqflow.scheduler import JobScheduler
+from rnaseqflow.workflow import Workflow, FindFiles, MergeSplitFiles
+
+
+class RunReportTest(unittest.TestCase):
+
+    INPUTS = os.path.join(os.path.dirname(__file__),
+                          'fixtures', 'input_samples')
+
+    def _remove_merged(self):
+        merged = os.path.join(self.INPUTS, 'merged')
+        if os.path.isdir(merged):
+            for f in os.listdir(merged):
+                os.remove(os.path.join(merged, f))
+            os.rmdir(merged)
+
+    def test_Workflow(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024)
+
+        self.addCleanup(self._remove_merged)
+
+        for stream in (False, True):
+            self._remove_merged()
+
+            report = RunReport()
+            w = Workflow(stream=stream, report=report)
+            w.append(FindFiles(args))
+            w.append(MergeSplitFiles(args))
+
+            merged_files = w.run()
+
+            self.assertEqual([s['stage'] for s in report.stages],
+                             ['FindFiles', 'MergeSplitFiles'])
+
+            find, merge = report.stages
+            self.assertEqual(find['items_out'], merge['items_in'])
+            self.assertEqual(merge['items_out'], len(merged_files))
+            self.assertEqual(merge['bytes_in'], merge['bytes_out'])
+            self.assertEqual(merge['units'], len(merged_files))
+            self.assertEqual(len(report.units), len(merged_files))
+
+            self.assertIn('MergeSplitFiles', report.table())
+
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            report.write(path)
+            with open(path) as fh:
+                self.assertEqual(len(json.load(fh)['stages']), 2)
+        finally:
+            os.remove(path)
+
+    def test_unit_usage(self):
+        scheduler = JobScheduler(jobs=2, quiet=True)
+        scheduler.call([sys.executable, '-c', 'sum(range(10 ** 6))'])
+
+        usage = scheduler.last_usage()
+        self.assertIsNotNone(usage)
+        self.assertGreater(usage.ru_utime + usage.ru_stime, 0)
+
+        report = RunReport()
+        report.unit('3.0', [], [], 0, 1.0, usage)
+
+        self.assertGreater(report.units[0]['child_max_rss_mb'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import collections
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from rnaseqflow.scheduler import (
+        parallel_map, ordered_map, largest_first, predict_makespan,
+        combine_usage, available_cpus, _count_cpu_list, Executor,
+        DiskSpaceGate, JobScheduler
+        )
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_parallel_map(self):
+        items = range(20)
+
+        self.assertListEqual(list(parallel_map(abs, items, 1)), items)
+        self.assertListEqual(sorted(parallel_map(abs, items, 4)), items)
+
+    def test_ordered_map(self):
+        items = range(50)
+
+        self.assertListEqual(list(ordered_map(abs, items, 1)), items)
+        self.assertListEqual(list(ordered_map(abs, items, 4)), items)
+
+    def test_available_cpus(self):
+        self.assertGreaterEqual(available_cpus(), 1)
+
+        self.assertEqual(_count_cpu_list('0\n'), 1)
+        self.assertEqual(_count_cpu_list('0-3,8,10-11'), 7)
+        self.assertRaises(ValueError, _count_cpu_list, '')
+
+    def test_Executor(self):
+        executor = Executor(threads=1, processes=1)
+        self.addCleanup(executor.close)
+
+        # every call waits on calls of its own, with a single thread
+        def nested(x):
+            return sum(executor.map(lambda y: x * y, range(5), 3))
+
+        self.assertListEqual(sorted(executor.map(nested, range(6), 4)),
+                             [0, 10, 20, 30, 40, 50])
+        self.assertListEqual(
+            list(executor.imap(lambda x: sum(executor.imap(abs, range(x), 3)),
+                               range(8), 3)),
+            [0, 0, 1, 3, 6, 10, 15, 21])
+
+        def fail(x):
+            if x == 3:
+                raise KeyError(x)
+            return x
+
+        with self.assertRaises(KeyError):
+            list(executor.map(fail, range(6), 3))
+
+        pending = collections.deque(executor.submit(fail, x)
+                                    for x in range(5))
+        self.assertListEqual([executor.next_result(pending)
+                              for _ in range(3)], [0, 1, 2])
+        self.assertRaises(KeyError, executor.next_result, pending)
+        self.assertEqual(executor.next_result(pending), 4)
+
+        self.assertIsNone(executor.usage())
+        self.assertEqual(executor.apply(abs, (-3,)), 3)
+        self.assertGreaterEqual(executor.usage().ru_maxrss, 1)
+        self.assertIs(executor.process_pool(), executor.process_pool())
+
+        executor.close()
+        self.assertListEqual(sorted(executor.map(abs, range(20), 4)),
+                             range(20))
+
+    def test_largest_first(self):
+        items, sizes = largest_first(['a', 'b', 'c', 'd'], [2, 40, 5, 5])
+
+        self.assertListEqual(items, ['b', 'c', 'd', 'a'])
+        self.assertListEqual(sizes, [40, 5, 5, 2])
+
+    def test_predict_makespan(self):
+        self.assertEqual(predict_makespan([], 4), 0)
+        self.assertEqual(predict_makespan([3, 3, 2, 2, 2], 1), 12)
+        self.assertEqual(predict_makespan([3, 3, 2, 2, 2], 2), 7)
+        self.assertEqual(predict_makespan([1, 1, 1, 1, 4], 2), 6)
+        self.assertEqual(predict_makespan([4, 1, 1, 1, 1], 2), 4)
+        self.assertEqual(predict_makespan([1, 1, 40], 3), 40)
+
+    def test_combine_usage(self):
+        self.assertIsNone(combine_usage([]))
+
+        usage = combine_usage([range(16), [1] * 16])
+
+        self.assertEqual(usage.ru_utime, 1)
+        self.assertEqual(usage.ru_maxrss, 2)
+        self.assertEqual(usage.ru_nivcsw, 16)
+
+    def test_DiskSpaceGate(self):
+        outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outdir)
+        first, second = [os.path.join(outdir, name) for name in 'ab']
+
+        self.assertGreater(DiskSpaceGate.free_bytes(outdir), 0)
+
+        gate = DiskSpaceGate(reserve=10)
+        gate.POLL_SECONDS = 0.01
+
+        with mock.patch.object(gate, 'free_bytes', return_value=149):
+            reservation = gate.admit([first], 100)
+            with open(first, 'wb') as outfile:
+                outfile.write('x' * 60)
+            self.assertEqual(reservation.remaining(), 40)
+
+            # 40 + 100 + 10 bytes are needed for b, so it waits for a
+            admitted = threading.Event()
+
+            def admit_second():
+                with gate.admit([second], 100):
+                    admitted.set()
+
+            thread = threading.Thread(target=admit_second)
+            thread.start()
+            self.assertFalse(admitted.wait(0.1))
+
+            reservation.release()
+            thread.join()
+            self.assertTrue(admitted.is_set())
+
+            # with nothing running, waiting cannot help
+            with gate.admit([second], 1000):
+                pass
+
+    def test_JobScheduler(self):
+        scheduler = JobScheduler(jobs=3, quiet=True)
+
+        cmds = [[sys.executable, '-c', 'import sys; sys.exit({0})'.format(
+            code)] for code in (0, 1, 0, 2)]
+
+        codes = list(scheduler.map(scheduler.call, cmds))
+
+        self.assertListEqual(sorted(codes), [0, 0, 1, 2])
+        self.assertEqual(scheduler.failures(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
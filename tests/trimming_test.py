@@ -0,0 +1,162 @@
+'''
+Created on Oct 18, 2026
+
+@author: justinpalpant
+
+Copyright 2026 Justin Palpant
+
+This file is part of the Jarvis Lab RNAseq Workflow program.
+
+RNAseq Workflow is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by the Free
+Software Foundation, either version 3 of the License, or (at your option) any
+later version.
+
+RNAseq Workflow is distributed in the hope that it will be useful, but WITHOUT
+ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+RNAseq Workflow. If not, see http://www.gnu.org/licenses/.
+'''
+import unittest
+import os
+import gzip
+import shutil
+import tempfile
+
+import numpy as np
+
+from rnaseqflow.trimming import Trimmer, read_adapters, _encode
+from rnaseqflow.qc import qc_file
+
+ADAPTER = 'AGATCGGAAGAGCACACGTCTGAACTCCAGTCAC'
+
+
+class TrimmerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, records):
+        path = os.path.join(self.tmpdir, name)
+        with (gzip.open if name.endswith('.gz') else open)(path, 'wb') as fh:
+            for i, (seq, qual) in enumerate(records):
+                fh.write('@read{0}\n{1}\n+\n{2}\n'.format(i, seq, qual))
+        return path
+
+    def test_read_adapters(self):
+        path = os.path.join(self.tmpdir, 'adapters.fa')
+        with open(path, 'w') as fh:
+            fh.write('>one\nacgt\nAC\n\n>two\nTTTT\n')
+
+        self.assertEqual(read_adapters(path), ['ACGTAC', 'TTTT'])
+
+    def test_encode(self):
+        packed, lengths = _encode(['AC', 'GTA', ''])
+
+        self.assertEqual(lengths.tolist(), [2, 3, 0])
+        self.assertEqual(packed.tolist(),
+                         [[65, 67, 0], [71, 84, 65], [0, 0, 0]])
+
+    def test_clip_points(self):
+        trimmer = Trimmer([ADAPTER])
+        insert = 'TTGCAGCTTAGCCATTGGCA'
+        mismatched = ADAPTER[:15] + 'T' + ADAPTER[16:]
+
+        reads = [insert + ADAPTER + 'NNNN',
+                 insert + ADAPTER[:12],
+                 insert + mismatched,
+                 insert + ADAPTER[:5],
+                 insert + ADAPTER[:2],
+                 insert + 'A' * 12,
+                 insert + ADAPTER[:4] + 'T' + ADAPTER[5:8]]
+
+        bases, lengths = _encode(reads)
+
+        self.assertEqual(trimmer.clip_points(bases, lengths).tolist(),
+                         [20, 20, 20, 20, 22, 32, 28])
+
+        strict = Trimmer([ADAPTER], max_difference=0, min_clip=6)
+        self.assertEqual(strict.clip_points(bases, lengths).tolist(),
+                         [20, 20, 54, 25, 22, 32, 28])
+
+    def test_clip_points_min_clip(self):
+        trimmer = Trimmer([ADAPTER], quality=0, min_length=1, min_clip=15)
+        insert = 'TTGCAGCTTAGCCATTGGCAACGTTGCAGCTT'
+
+        bases, lengths = _encode([insert + ADAPTER[:11],
+                                  insert + ADAPTER[:15],
+                                  insert + ADAPTER])
+
+        self.assertEqual(trimmer.clip_points(bases, lengths).tolist(),
+                         [43, 32, 32])
+
+    def test_quality_bounds(self):
+        trimmer = Trimmer([], quality=20, max_length=4)
+        quals, _ = _encode(['##IIIIII#', 'IIIII', '###'])
+
+        starts, stops = trimmer.quality_bounds(quals, np.array([9, 3, 3]))
+
+        self.assertEqual(starts.tolist(), [2, 0, 0])
+        self.assertEqual(stops.tolist(), [6, 3, 0])
+
+    def test_from_args(self):
+        trimmer = Trimmer.from_args([ADAPTER], '-q 30 -l 50 -x 10 -m 4')
+
+        self.assertEqual((trimmer.quality, trimmer.min_length,
+                          trimmer.min_clip), (30, 50, 4))
+        self.assertRaises(ValueError, Trimmer.from_args, [ADAPTER], '-q')
+
+    def test_trim_files(self):
+        insert = 'TTGCAGCTTAGCCATTGGCAACGT'
+        r1 = self._write('r1.fastq.gz', [(insert + ADAPTER, 'I' * 58),
+                                         (insert, 'I' * 24),
+                                         (insert, 'I' * 20 + '####')])
+        r2 = self._write('r2.fastq', [(insert, 'I' * 24),
+                                      (insert[:10], 'I' * 10),
+                                      (insert, 'I' * 24)])
+        out1, out2 = [os.path.join(self.tmpdir, 'trimmed_' + f)
+                      for f in ('r1.fastq', 'r2.fastq')]
+
+        trimmer = Trimmer([ADAPTER], min_length=18)
+        stats = trimmer.trim_files([r1, r2], [out1, out2], batch_size=2)
+
+        self.assertEqual(stats, {'reads': 3, 'kept': 2, 'clipped': 1})
+        self.assertEqual(
+            open(out1).read(),
+            '@read0\n{0}\n+\n{1}\n@read2\n{2}\n+\n{3}\n'.format(
+                insert, 'I' * 24, insert[:20], 'I' * 20))
+        self.assertEqual(
+            open(out2).read(),
+            '@read0\n{0}\n+\n{1}\n@read2\n{0}\n+\n{1}\n'.format(
+                insert, 'I' * 24))
+
+        stats = trimmer.trim_files([r1, r2], [out1, out2], batch_size=2,
+                                   qc=True)
+        for outfile, report in zip([out1, out2], stats.pop('qc')):
+            self.assertEqual(report.summary(), qc_file(outfile).summary())
+        self.assertEqual(stats, {'reads': 3, 'kept': 2, 'clipped': 1})
+
+        lead = self._write('lead.fastq', [(insert, '##' + 'I' * 22),
+                                          (insert + ADAPTER, '#' + 'I' * 57),
+                                          (insert[:5], 'I' * 5)])
+        stats = trimmer.trim_files([lead], [out1], qc=True)
+        self.assertEqual(stats['qc'][0].summary(), qc_file(out1).summary())
+        self.assertEqual(stats['qc'][0].reads, 2)
+
+        short = self._write('short.fastq', [(insert, 'I' * 24)])
+        self.assertRaises(ValueError, trimmer.trim_files, [r2, short],
+                          [out1, out2])
+
+        fasta = os.path.join(self.tmpdir, 'reads.fa')
+        with open(fasta, 'w') as fh:
+            fh.write('>read0\n{0}\n>read1\n{0}\n'.format(insert))
+        self.assertRaises(ValueError, trimmer.trim_files, [fasta], [out1])
+
+
+if __name__ == "__main__":
+    unittest.main()
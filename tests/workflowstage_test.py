@@ -23,12 +23,22 @@ import unittest
 import os
 from argparse import Namespace
 import fnmatch
+import gzip
+import json
 import logging
+import mock
+import shutil
+import tempfile
 
 from rnaseqflow.workflow import (
         Workflow, FindFiles, MergeSplitFiles, FastQMCFTrimSolo,
-        FastQMCFTrimPairs
+        FastQMCFTrimPairs, NumpyTrimPairs, MergeTrimPairs, QualityControl
         )
+from rnaseqflow.checkpoint import Manifest
+from rnaseqflow import fileutils
+from rnaseqflow.scheduler import Executor
+from rnaseqflow.gziputils import check_gzip
+from rnaseqflow.qc import qc_file
 
 logging.basicConfig(
     level=logging.INFO,
@@ -64,6 +74,12 @@ class TestWorkflow(unittest.TestCase):
         for d in self.directories_to_remove:
             os.rmdir(d)
 
+    @staticmethod
+    def _remove_indexes(folder):
+        for f in os.listdir(folder):
+            if f.endswith('.fqi'):
+                os.remove(os.path.join(folder, f))
+
     def test_FindFiles(self):
         args = Namespace(root=self.INPUTS, ext='.fastq')
 
@@ -129,6 +145,99 @@ class TestWorkflow(unittest.TestCase):
             )
             )
 
+    def test_MergeSplitFiles_workers(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024,
+                         merge_workers=3)
+
+        merger = MergeSplitFiles(args)
+
+        foundfiles = set()
+        for root, _, files in os.walk(self.INPUTS):
+            for basename in files:
+                if fnmatch.fnmatch(basename, '*.fastq'):
+                    filename = os.path.join(root, basename)
+                    foundfiles.add(filename)
+
+        merged_files = merger.run(foundfiles)
+
+        self.files_to_remove.update(merged_files)
+
+        self.assertSetEqual(
+            {os.path.basename(f) for f in merged_files},
+            set(os.listdir(self.MERGE_FIXTURES)))
+
+        for f in merged_files:
+            other_f = os.path.join(self.MERGE_FIXTURES, os.path.basename(f))
+
+            self.assertEqual(open(f, 'rb').read(), open(other_f, 'rb').read(),
+                             'Files named {0} do not match'.format(
+                os.path.basename(f),
+            )
+            )
+
+    def test_MergeSplitFiles_compress(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024,
+                         compress=True)
+
+        merger = MergeSplitFiles(args)
+
+        foundfiles = set(os.path.join(self.INPUTS, f)
+                         for f in os.listdir(self.INPUTS)
+                         if f.endswith('.fastq'))
+
+        merged_files = merger.run(foundfiles)
+
+        self.files_to_remove.update(merged_files)
+
+        self.assertSetEqual(
+            {os.path.basename(f) for f in merged_files},
+            {f + '.gz' for f in os.listdir(self.MERGE_FIXTURES)})
+
+        for f in merged_files:
+            other_f = os.path.join(self.MERGE_FIXTURES,
+                                   os.path.basename(f)[:-len('.gz')])
+
+            self.assertIsNotNone(check_gzip(f))
+            self.assertEqual(gzip.open(f).read(), open(other_f, 'rb').read())
+
+    def test_MergeSplitFiles_lanes(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+
+        parts = sorted(f for f in os.listdir(self.INPUTS)
+                       if f.startswith('NIK1-2_TGACCA_L001_R1') and
+                       f.endswith('.fastq'))
+        lanes = []
+        for lane in (1, 2, 3):
+            lanes.append([])
+            for part in parts[:lane + 1]:
+                name = os.path.join(root, part.replace(
+                    'L001', 'L00{0:d}'.format(lane)))
+                shutil.copy(os.path.join(self.INPUTS, part), name)
+                lanes[-1].append(name)
+
+        expected = ''.join(open(f, 'rb').read() for lane in lanes
+                           for f in lane)
+        foundfiles = [f for lane in lanes for f in lane]
+
+        for compress in (False, True):
+            args = Namespace(root=root, ext='.fastq', blocksize=1,
+                             merge_lanes=True, compress=compress)
+            merger = MergeSplitFiles(args)
+
+            merged_files = merger.run(reversed(foundfiles))
+            self.assertEqual(len(merged_files), 1)
+
+            merged = merged_files.pop()
+            opener = gzip.open if compress else open
+            self.assertEqual(opener(merged, 'rb').read(), expected)
+
+        args = Namespace(root=root, ext='.fastq', blocksize=1)
+        merger = MergeSplitFiles(args)
+        with mock.patch.object(merger, '_record') as record:
+            merger.run(foundfiles)
+        self.assertEqual(record.call_args[0][3], 1)
+
     def test_FastQMCFTrimSolo(self):
         args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024,
                          adapters=self.ADAPTER_FILE, fastq_args='-q 30 -l 50',
@@ -209,6 +318,401 @@ class TestWorkflow(unittest.TestCase):
             )
             )
 
+    def test_Workflow_graph(self):
+        for stream, workers in ((False, 1), (False, 3), (True, 1)):
+            w = Workflow(stream=stream, buffersize=1, workers=workers)
+            w.append(_Suffix('a', start=['x', 'y']))
+            w.append(_Suffix('b'))
+            w.add(_Suffix('c'), inputs=['a'])
+            w.add(_Suffix('d'), inputs=['b', 'c'], name='join')
+
+            self.assertEqual(w.names, ['a', 'b', 'c', 'join'])
+            self.assertEqual([n.name for n in w.graph()],
+                             ['a', 'b', 'c', 'join'])
+            fileutils.remember_size('stale', 1)
+            self.assertSetEqual(w.run(), {'xabd', 'yabd', 'xacd', 'yacd'})
+            self.assertNotIn('stale', fileutils._sizes)
+
+            executors = {stage.seen for stage in w.items}
+            self.assertEqual(len(executors), 1)
+            self.assertIsInstance(executors.pop(), Executor)
+            self.assertTrue(all(stage.forked for stage in w.items))
+            self.assertTrue(all(stage.executor is None for stage in w.items))
+
+        w = Workflow()
+        w.append(_Suffix('a'))
+        w.insert(0, _Suffix('b', start=['x']))
+        w.append(_Suffix('a'))
+        self.assertEqual(w.names, ['b', 'a', 'a#2'])
+        self.assertSetEqual(w.run(), {'xbaa'})
+        self.assertRaises(ValueError, w.add, _Suffix('c'), name='a')
+
+        w.add(_Suffix('c'), inputs=['missing'])
+        self.assertRaises(ValueError, w.graph)
+
+        w = Workflow()
+        w.add(_Suffix('a'), inputs=['b'])
+        w.add(_Suffix('b'), inputs=['a'])
+        self.assertRaises(ValueError, w.graph)
+
+    def test_Workflow_delete_intermediates(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for f in os.listdir(self.INPUTS):
+            if f.endswith('.fastq'):
+                shutil.copy(os.path.join(self.INPUTS, f), root)
+        found = set(os.listdir(root))
+
+        args = Namespace(root=root, ext='.fastq', blocksize=1024, jobs=2,
+                         quiet=True)
+
+        w = Workflow(min_free=1, delete_intermediates=True)
+        w.append(FindFiles(args))
+        w.append(MergeSplitFiles(args))
+        w.append(QualityControl(args))
+        reports = w.run()
+
+        self.assertEqual(len(reports), len(os.listdir(self.MERGE_FIXTURES)))
+        self.assertTrue(all(os.path.isfile(f) for f in reports))
+        self.assertEqual(os.listdir(os.path.join(root, 'merged')), [])
+        self.assertTrue(found.issubset(os.listdir(root)))
+
+    def test_Workflow_graph_failure(self):
+        for stream, workers in ((False, 1), (False, 2), (True, 1)):
+            w = Workflow(stream=stream, buffersize=1, workers=workers)
+            w.append(_Suffix('a', start=[str(i) for i in range(20)]))
+            w.append(_Suffix('b', fail=True))
+            w.add(_Suffix('c'), inputs=['a'])
+
+            self.assertRaises(KeyError, w.run)
+
+    def test_Workflow_stream(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024)
+
+        w = Workflow(stream=True, buffersize=1)
+        w.append(FindFiles(args))
+        w.append(MergeSplitFiles(args))
+
+        merged_files = w.run()
+
+        self.files_to_remove.update(merged_files)
+
+        merge_fixtures = set()
+        for root, _, files in os.walk(self.MERGE_FIXTURES):
+            for basename in files:
+                if fnmatch.fnmatch(basename, '*.fastq'):
+                    filename = os.path.join(root, basename)
+                    merge_fixtures.add(filename)
+
+        self.assertSetEqual({os.path.basename(f) for f in merged_files},
+                            {os.path.basename(f) for f in merge_fixtures})
+
+        for f in merged_files:
+            other_f = next(
+                fn for fn in merge_fixtures if os.path.basename(fn) == os.path.basename(f))
+
+            self.assertEqual(open(f, 'rb').read(), open(other_f, 'rb').read(),
+                             'Files named {0} do not match'.format(
+                os.path.basename(f),
+            )
+            )
+
+    def test_MergeSplitFiles_resume(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024)
+
+        handle, manifest_path = tempfile.mkstemp()
+        os.close(handle)
+        self.files_to_remove.add(manifest_path)
+
+        found_files = FindFiles(args).run(None)
+
+        merger = MergeSplitFiles(args)
+        merger.manifest = Manifest(manifest_path)
+
+        merged_files = merger.run(found_files)
+        self.files_to_remove.update(merged_files)
+
+        merger.manifest = Manifest(manifest_path, resume=True)
+
+        with mock.patch('rnaseqflow.workflow.append_file') as append_file:
+            self.assertSetEqual(merger.run(found_files), merged_files)
+
+        self.assertFalse(append_file.called)
+        self.assertEqual(merger.manifest.skipped, len(merged_files))
+
+    def test_MergeSplitFiles_gzip_merge(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq.gz', blocksize=1,
+                         merge_workers=2)
+
+        found_files = FindFiles(args).run(None)
+
+        for mode in ('copy', 'check', 'verify', 'bgzf'):
+            args.gzip_merge = mode
+            merged_files = MergeSplitFiles(args).run(found_files)
+            self.files_to_remove.update(merged_files)
+
+            for f in merged_files:
+                expected = os.path.join(
+                    self.MERGE_FIXTURES, os.path.basename(f)[:-len('.gz')])
+                self.assertEqual(gzip.open(f).read(),
+                                 open(expected, 'rb').read())
+
+            if mode == 'bgzf':
+                for f in merged_files:
+                    self.assertIsNotNone(check_gzip(f))
+
+        self.directories_to_remove.add(os.path.join(self.INPUTS, 'merged'))
+
+    def test_FastQMCFTrimPairs_find_file_pairs(self):
+        args = Namespace(root=self.INPUTS, adapters=self.ADAPTER_FILE,
+                         fastq_args='-q 30 -l 50', quiet=True)
+
+        with mock.patch('subprocess.call'):
+            trimmer = FastQMCFTrimPairs(args)
+
+        files = ['/a/merged_NIK1-2_TGACCA_R1.fastq',
+                 '/a/merged_NIK1-2_TGACCA_R2.fastq',
+                 '/a/merged_NIK2-5_CAGATC_R2.fastq',
+                 '/a/merged_NIK2-5_CAGATC_R1.fastq',
+                 '/a/merged_NIK4-7_ATCACG_R1.fastq',
+                 '/b/merged_NIK4-7_ATCACG_R2.fastq',
+                 '/a/undetermined.fastq']
+
+        self.assertSetEqual(trimmer._find_file_pairs(files), {
+            ('/a/merged_NIK1-2_TGACCA_R1.fastq',
+             '/a/merged_NIK1-2_TGACCA_R2.fastq'),
+            ('/a/merged_NIK2-5_CAGATC_R1.fastq',
+             '/a/merged_NIK2-5_CAGATC_R2.fastq'),
+            ('/a/merged_NIK4-7_ATCACG_R1.fastq', None),
+            ('/b/merged_NIK4-7_ATCACG_R2.fastq', None),
+            ('/a/undetermined.fastq', None)})
+
+        files.append('/a/merged_NIK1-2_TGACCA_R3.fastq')
+
+        self.assertIn(('/a/merged_NIK1-2_TGACCA_R3.fastq', None),
+                      trimmer._find_file_pairs(files))
+    def test_MergeTrimPairs(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024,
+                         adapters=self.ADAPTER_FILE, fastq_args='-q 30',
+                         quiet=True, jobs=2)
+
+        with mock.patch('subprocess.call'):
+            trimmer = MergeTrimPairs(args)
+        self.addCleanup(shutil.rmtree, trimmer.outdir, True)
+
+        def fake_fastq_mcf(cmd):
+            infiles = [f for f in cmd if f.startswith(trimmer.pipedir)]
+            outfiles = [cmd[i + 1] for i, f in enumerate(cmd) if f == '-o']
+
+            for infile, outfile in zip(infiles, outfiles):
+                with open(infile, 'rb') as pipe:
+                    with open(outfile, 'wb') as trimmed:
+                        shutil.copyfileobj(pipe, trimmed)
+
+            return 0
+
+        found_files = FindFiles(args).run(None)
+
+        with mock.patch.object(trimmer.scheduler, 'call',
+                               side_effect=fake_fastq_mcf) as call:
+            trimmed_files = trimmer.run(found_files)
+
+        self.assertEqual(call.call_count, 3)
+        self.assertSetEqual(
+            {os.path.basename(f) for f in trimmed_files},
+            {'trimmed_' + f for f in os.listdir(self.MERGE_FIXTURES)})
+
+        for f in trimmed_files:
+            expected = os.path.join(
+                self.MERGE_FIXTURES, os.path.basename(f)[len('trimmed_'):])
+            with open(f, 'rb') as trimmed:
+                self.assertEqual(trimmed.read(), open(expected, 'rb').read())
+
+        self.assertEqual(os.listdir(trimmer.pipedir), [])
+
+    def test_NumpyTrimPairs(self):
+        args = Namespace(root=self.INPUTS, ext='.fastq', blocksize=1024,
+                         adapters=self.ADAPTER_FILE, fastq_args='-q 30 -l 50',
+                         quiet=True, jobs=2)
+
+        trimmer = NumpyTrimPairs(args)
+        self.addCleanup(shutil.rmtree, trimmer.outdir, True)
+
+        merged_files = set(os.path.join(self.MERGE_FIXTURES, f)
+                           for f in os.listdir(self.MERGE_FIXTURES))
+        trimmed_files = trimmer.run(merged_files)
+
+        self.assertEqual(trimmer.scheduler.failures(), 0)
+        self.assertSetEqual(
+            {os.path.basename(f) for f in trimmed_files},
+            {'trimmed_' + os.path.basename(f) for f in merged_files})
+
+        for f in trimmed_files:
+            merged = os.path.join(self.MERGE_FIXTURES,
+                                  os.path.basename(f)[len('trimmed_'):])
+            reads = dict(zip(*[iter(open(merged).read().split('\n'))] * 2))
+            lines = open(f).read().split('\n')[:-1]
+
+            self.assertTrue(lines)
+            for header, seq in zip(lines[::4], lines[1::4]):
+                self.assertIn(seq, reads[header])
+                self.assertGreaterEqual(len(seq), 50)
+
+        r1, r2 = sorted(f for f in trimmed_files if 'NIK1-2' in f)
+        self.assertEqual(open(r1).read().count('\n'),
+                         open(r2).read().count('\n'))
+
+    def test_FastQMCFTrimPairs_shards(self):
+        self.addCleanup(self._remove_indexes, self.MERGE_FIXTURES)
+        args = Namespace(root=self.INPUTS, adapters=self.ADAPTER_FILE,
+                         fastq_args='-q 30', quiet=True, jobs=2, shards=3)
+
+        with mock.patch('subprocess.call'):
+            trimmer = FastQMCFTrimPairs(args)
+        self.addCleanup(shutil.rmtree, trimmer.outdir, True)
+        trimmer.MIN_SHARD_BYTES = 1024
+
+        def fake_fastq_mcf(cmd):
+            infiles = [f for f in cmd if f.startswith(trimmer.sharddir)]
+            outfiles = [cmd[i + 1] for i, f in enumerate(cmd) if f == '-o']
+
+            for infile, outfile in zip(infiles, outfiles):
+                with open(infile, 'rb') as pipe:
+                    with open(outfile, 'wb') as trimmed:
+                        shutil.copyfileobj(pipe, trimmed)
+
+            return 0
+
+        merged_files = set(os.path.join(self.MERGE_FIXTURES, f)
+                           for f in os.listdir(self.MERGE_FIXTURES))
+
+        with mock.patch.object(trimmer.scheduler, 'call',
+                               side_effect=fake_fastq_mcf) as call:
+            trimmed_files = trimmer.run(merged_files)
+
+        self.assertEqual(call.call_count, 9)
+
+        for f in trimmed_files:
+            expected = os.path.join(
+                self.MERGE_FIXTURES, os.path.basename(f)[len('trimmed_'):])
+            with open(f, 'rb') as trimmed:
+                self.assertEqual(trimmed.read(), open(expected, 'rb').read())
+
+        self.assertEqual(os.listdir(trimmer.sharddir), [])
+
+    def test_NumpyTrimPairs_shards(self):
+        self.addCleanup(self._remove_indexes, self.MERGE_FIXTURES)
+        args = Namespace(root=self.INPUTS, adapters=self.ADAPTER_FILE,
+                         fastq_args='-q 30 -l 50', quiet=True, jobs=2)
+        merged_files = set(os.path.join(self.MERGE_FIXTURES, f)
+                           for f in os.listdir(self.MERGE_FIXTURES))
+
+        trimmer = NumpyTrimPairs(args)
+        self.addCleanup(shutil.rmtree, trimmer.outdir, True)
+        serial = dict((f, open(f, 'rb').read())
+                      for f in trimmer.run(merged_files))
+
+        args.shards = 4
+        trimmer = NumpyTrimPairs(args)
+        trimmer.MIN_SHARD_BYTES = 1024
+        sharded = dict((f, open(f, 'rb').read())
+                       for f in trimmer.run(merged_files))
+
+        self.assertEqual(trimmer.scheduler.failures(), 0)
+        self.assertEqual(len(trimmer.scheduler.exit_codes), 4 * 3)
+        self.assertDictEqual(sharded, serial)
+
+        args.trim_qc = True
+        trimmer = NumpyTrimPairs(args)
+        self.addCleanup(shutil.rmtree, trimmer.qcdir, True)
+        trimmer.MIN_SHARD_BYTES = 1024
+        with mock.patch('rnaseqflow.qc.qc_job') as qc_job:
+            trimmer.run(merged_files)
+        self.assertFalse(qc_job.called)
+        self.assertFalse(trimmer._qc_stats)
+        for f in serial:
+            report = os.path.join(trimmer.qcdir,
+                                  os.path.basename(f) + '.qc.json')
+            self.assertEqual(json.load(open(report)),
+                             json.loads(json.dumps(qc_file(f).summary())))
+        args.trim_qc = False
+
+        args.compress = True
+        trimmer = NumpyTrimPairs(args)
+        trimmer.MIN_SHARD_BYTES = 1024
+        compressed = dict((f[:-len('.gz')], gzip.open(f).read())
+                          for f in trimmer.run(merged_files))
+
+        self.assertEqual(trimmer.scheduler.failures(), 0)
+        self.assertDictEqual(compressed, serial)
+        for f in compressed:
+            self.assertIsNotNone(check_gzip(f + '.gz'))
+            os.remove(f + '.gz')
+
+        args.compress = False
+        gzdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, gzdir)
+        gzipped = []
+        for f in merged_files:
+            gzipped.append(os.path.join(gzdir, os.path.basename(f) + '.gz'))
+            with open(f, 'rb') as infile, gzip.open(gzipped[-1], 'wb') as gz:
+                gz.write(infile.read())
+
+        trimmer = NumpyTrimPairs(args)
+        trimmer.MIN_SHARD_BYTES = 1024
+        sharded = dict((f[:-len('.gz')], gzip.open(f).read())
+                       for f in trimmer.run(gzipped))
+
+        self.assertEqual(trimmer.scheduler.failures(), 0)
+        self.assertEqual(len(trimmer.scheduler.exit_codes), 4 * 3)
+        self.assertDictEqual(sharded, serial)
+
+    def test_QualityControl(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        args = Namespace(root=root, jobs=2, quiet=True)
+
+        checker = QualityControl(args)
+
+        merged_files = set(os.path.join(self.MERGE_FIXTURES, f)
+                           for f in os.listdir(self.MERGE_FIXTURES))
+        reports = checker.run(merged_files)
+
+        self.assertSetEqual(
+            {os.path.basename(f) for f in reports},
+            {os.path.basename(f) + '.qc.json' for f in merged_files})
+
+        for f in merged_files:
+            report = os.path.join(checker.outdir,
+                                  os.path.basename(f) + '.qc.json')
+            with open(report) as infile:
+                summary = json.load(infile)
+            self.assertEqual(summary['reads'],
+                             open(f).read().count('\n') // 4)
+            self.assertEqual(sum(summary['length_histogram'].values()),
+                             summary['reads'])
+
+
+class _Suffix(object):
+    """A stand-in stage that adds its specifier to the end of every input"""
+
+    def __init__(self, spec, start=None, fail=False):
+        self.spec = spec
+        self.start = start
+        self.fail = fail
+
+    def run(self, stage_input):
+        return set(self.run_stream(stage_input))
+
+    def run_stream(self, stage_input):
+        self.seen = self.executor
+        self.forked = self.executor._pool is not None
+        for item in stage_input if stage_input is not None else self.start:
+            if self.fail:
+                raise KeyError(item)
+            yield item + self.spec
+
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
 